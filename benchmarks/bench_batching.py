@@ -0,0 +1,64 @@
+"""
+Compares batched multi-job scoring with the one-job-per-call path on the configured backend.
+
+Reports estimated prompt tokens per job, wall-clock latency per job and how closely the
+batched scores agree with the single-job scores for the same postings.
+
+Usage:
+    python -m benchmarks.bench_batching -r resume.txt -c latest -n 20 -t 8000
+"""
+import argparse
+import logging
+from pathlib import Path
+import time
+
+import numpy as np
+
+from config import AI_BACKEND, SCORING_CONCURRENCY
+from run_history import load_jobs
+from scoring.backends import get_backend
+from scoring.engine import pack_batches, run_batched_scoring, run_scoring
+from scoring.tokens import estimate_message_tokens
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare batched and single-job scoring")
+    parser.add_argument("-r", "--resume_path", type=Path, required=True)
+    parser.add_argument("-c", "--cache_path", type=str, default="latest", help="The run to take postings from: a run_id, 'latest', or a jobs_*.json file")
+    parser.add_argument("-n", "--num_jobs", type=int, default=20)
+    parser.add_argument("-t", "--token_budget", type=int, default=8000)
+    args = parser.parse_args()
+    logging.getLogger("scoring").setLevel(logging.WARNING)
+
+    with open(args.resume_path) as f:
+        resume = f.read()
+    jobs = load_jobs(args.cache_path)[:args.num_jobs]
+    descriptions = [x.description for x in jobs]
+    n = len(descriptions)
+    backend = get_backend()
+
+    single_tokens = sum(estimate_message_tokens(backend._score_messages(resume, d)) for d in descriptions)
+    start = time.perf_counter()
+    single = run_scoring(resume, descriptions, backend.async_score_resume, SCORING_CONCURRENCY)
+    single_elapsed = time.perf_counter() - start
+
+    batches = pack_batches(resume, descriptions, args.token_budget)
+    batch_tokens = sum(
+        estimate_message_tokens(backend._batch_score_messages(resume, [descriptions[i] for i in b])) for b in batches
+    )
+    start = time.perf_counter()
+    batched = run_batched_scoring(
+        resume, descriptions, backend.async_score_resume_batch, backend.async_score_resume, args.token_budget, SCORING_CONCURRENCY
+    )
+    batch_elapsed = time.perf_counter() - start
+
+    ok = [i for i in range(n) if single[i].score >= 0 and batched[i].score >= 0]
+    a = np.array([single[i].score for i in ok])
+    b = np.array([batched[i].score for i in ok])
+    print(f"{n} jobs on {AI_BACKEND}, {len(batches)} batches with a {args.token_budget} token budget")
+    print(f"{'mode':>8} {'tokens/job':>11} {'s/job':>8}")
+    print(f"{'single':>8} {single_tokens / n:>11.0f} {single_elapsed / n:>8.2f}")
+    print(f"{'batched':>8} {batch_tokens / n:>11.0f} {batch_elapsed / n:>8.2f}")
+    if len(ok) > 1:
+        print(f"Score agreement on {len(ok)} jobs: mean |diff| {np.abs(a - b).mean():.2f}, "
+              f"within 1 point {np.mean(np.abs(a - b) <= 1):.0%}, pearson r {np.corrcoef(a, b)[0, 1]:.2f}")
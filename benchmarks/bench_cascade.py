@@ -0,0 +1,110 @@
+"""
+Measures the model cascade against an all-large-model baseline from eval_cache.
+
+Takes the jobs of an eval_results_*.json file scored with the large model (eval_cache --model),
+scores them through the cascade once, and reports the share of jobs escalated, the latency and
+estimated cost of each tier, and agreement with the baseline's mean scores. --sweep then scores
+every job once more with the small model alone and replays those scores against a grid of
+escalation bands, taking the baseline score for escalated jobs, to pick CASCADE_ESCALATE_MIN and
+CASCADE_ESCALATE_MAX without a large-model request per band.
+
+Usage:
+    python eval_cache.py -r resume.txt --model gpt-4.1-2025-04-14
+    python -m benchmarks.bench_cascade -r resume.txt --sweep
+"""
+import argparse
+import json
+import logging
+from pathlib import Path
+import sys
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+from config import CASCADE_ESCALATE_MAX, CASCADE_ESCALATE_MIN, CASCADE_LARGE_MODEL, CASCADE_SMALL_MODEL, SCORING_CONCURRENCY
+from datamodels.models import JobInfo
+import instrumentation
+from scoring.cascade import CascadeScorer, baseline_agreement, latest_baseline
+from scoring.engine import run_scoring
+
+
+def load_baseline(path: Path, large_model: str) -> Dict[str, Any]:
+    if path is None:
+        baseline = latest_baseline(large_model)
+        if baseline is None:
+            sys.exit(f"No eval_results_*.json scored with {large_model}, run eval_cache --model {large_model} first")
+        return baseline
+    with open(path) as f:
+        baseline = json.load(f)
+    baseline["path"] = str(path)
+    if baseline.get("model") != large_model:
+        logging.warning(f"{path} was scored with {baseline.get('model')}, not {large_model}")
+    return baseline
+
+
+def sweep(jobs: List[JobInfo], small_scores: List[float], reference: Dict[str, float]) -> None:
+    """Prints escalation share and agreement for every band, using the baseline score for escalated jobs."""
+    print(f"{'band':>9} {'escalated':>9} {'mean |diff|':>11} {'within 1':>8}")
+    for low in range(0, 11):
+        for high in range(low + 1, min(10, low + 4) + 1):
+            escalate = [low <= s <= high for s in small_scores]
+            final = [reference[j.job_url] if e else s for j, s, e in zip(jobs, small_scores, escalate)]
+            diffs = np.abs(np.array(final) - np.array([reference[j.job_url] for j in jobs]))
+            print(f"{low:>4}-{high:<4} {np.mean(escalate):>9.0%} {diffs.mean():>11.2f} {np.mean(diffs <= 1):>8.0%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare cascade scoring with an all-large-model baseline")
+    parser.add_argument("-r", "--resume_path", type=Path, required=True)
+    parser.add_argument("-e", "--eval_path", type=Path, help="Defaults to the newest eval_results_*.json of the large model")
+    parser.add_argument("--small", type=str, default=CASCADE_SMALL_MODEL)
+    parser.add_argument("--large", type=str, default=CASCADE_LARGE_MODEL)
+    parser.add_argument("--low", type=float, default=CASCADE_ESCALATE_MIN)
+    parser.add_argument("--high", type=float, default=CASCADE_ESCALATE_MAX)
+    parser.add_argument("--sweep", action="store_true", help="Also replay the small model's scores against a grid of bands")
+    args = parser.parse_args()
+    logging.getLogger("scoring").setLevel(logging.WARNING)
+
+    baseline = load_baseline(args.eval_path, args.large)
+    entries = [x for x in baseline["jobs"] if x["new_scores"]]
+    jobs = [
+        JobInfo(
+            company=x["company"], company_url="Not Specified", description=x["description"], is_verified=False,
+            job_title=x["job_title"], job_url=x["job_url"], location="", posted_at="",
+        )
+        for x in entries
+    ]
+    with open(args.resume_path) as f:
+        resume = f.read()
+
+    instrumentation.reset()
+    cascade = CascadeScorer(args.small, args.large, args.low, args.high)
+    start = time.perf_counter()
+    results = run_scoring(resume, [x.description for x in jobs], cascade, SCORING_CONCURRENCY)
+    wall = time.perf_counter() - start
+    for job, result in zip(jobs, results):
+        job.score = result.score
+    summary = cascade.summary()
+    print(f"{len(jobs)} jobs from {baseline['path']}, band {args.low:g}-{args.high:g}, wall {wall:.2f}s")
+    print(f"{'tier':>6} {'model':<28} {'requests':>8} {'latency (s)':>11} {'cost ($)':>9}")
+    for tier, usage in summary["tiers"].items():
+        cost = f"{usage['cost_usd']:.4f}" if usage["cost_usd"] is not None else "-"
+        print(f"{tier:>6} {usage['model'][:28]:<28} {usage['requests']:>8} {usage['latency_s']:>11.2f} {cost:>9}")
+    large = summary["tiers"]["large"]
+    if large["requests"] and large["cost_usd"] is not None and summary["cost_usd"] is not None:
+        all_large = large["cost_usd"] / large["requests"] * len(jobs)
+        print(f"Cascade ${summary['cost_usd']:.4f} against about ${all_large:.4f} with {args.large} for every job")
+    print(f"Escalated {summary['escalated']} of {summary['jobs']} ({summary['escalation_rate']:.0%})")
+    print(f"Agreement with the baseline: {baseline_agreement(jobs, baseline)}")
+
+    if args.sweep:
+        instrumentation.reset()
+
+        async def score_small(resume_text: str, job_description: str):
+            return await cascade.backend.async_score_resume(resume_text, job_description, model_name=args.small)
+
+        small = run_scoring(resume, [x.description for x in jobs], score_small, SCORING_CONCURRENCY)
+        reference = {x["job_url"]: float(np.mean(x["new_scores"])) for x in entries}
+        kept = [(j, s.score) for j, s in zip(jobs, small) if s.score >= 0]
+        sweep([j for j, _ in kept], [s for _, s in kept], reference)
@@ -0,0 +1,101 @@
+"""
+Checks that description compaction saves tokens without moving scores, on a saved eval set.
+
+Takes the jobs of an eval_results_*.json file written by eval_cache, whose repeated scores of
+the full descriptions are the baseline, compacts the descriptions, re-scores the compacted text
+the same number of times and compares the mean scores. Reports the token reduction per job and
+exits non-zero when the mean absolute score change exceeds the tolerance.
+
+Usage:
+    python -m benchmarks.bench_compaction -r resume.txt -e data/cache/eval_results_20250101-120000.json -t 0.5
+    python -m benchmarks.bench_compaction --tokens_only
+"""
+import argparse
+import json
+import logging
+from pathlib import Path
+import sys
+
+import numpy as np
+
+from config import AI_BACKEND, SCORING_CONCURRENCY
+from datamodels.models import JobInfo
+from scoring.backends import get_backend
+from scoring.compaction import Compactor
+from scoring.engine import run_scoring
+
+CACHE_DIR = Path.cwd() / "data/cache"
+
+
+def latest_eval() -> Path:
+    files = sorted(CACHE_DIR.glob("eval_results_*.json"))
+    if not files:
+        sys.exit(f"No eval_results_*.json in {CACHE_DIR}, run eval_cache first")
+    return files[-1]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare scores of compacted and full job descriptions")
+    parser.add_argument("-r", "--resume_path", type=Path, help="Required unless --tokens_only")
+    parser.add_argument("-e", "--eval_path", type=Path, help="Defaults to the latest data/cache/eval_results_*.json")
+    parser.add_argument("-n", "--num_iters", type=int, help="Samples per compacted job, defaults to the eval's num_iter")
+    parser.add_argument("-t", "--tolerance", type=float, default=0.5, help="Maximum mean absolute score change")
+    parser.add_argument("--tokens_only", action="store_true", help="Only report the token reduction")
+    args = parser.parse_args()
+    logging.getLogger("scoring").setLevel(logging.WARNING)
+    if not args.tokens_only and args.resume_path is None:
+        parser.error("--resume_path is required unless --tokens_only")
+
+    eval_path = args.eval_path or latest_eval()
+    with open(eval_path) as f:
+        eval_results = json.load(f)
+    entries = [x for x in eval_results["jobs"] if x["new_scores"]]
+    jobs = [
+        JobInfo(
+            company=x["company"], company_url="Not Specified", description=x["description"], is_verified=False,
+            job_title=x["job_title"], job_url=x["job_url"], location="", posted_at="",
+        )
+        for x in entries
+    ]
+    compactor = Compactor()
+    compacted = compactor.compact_all(jobs)
+    summary = compactor.summary()
+
+    print(f"{len(jobs)} jobs from {eval_path}")
+    print(f"{'#':>3} {'company':<20} {'job title':<28} {'tokens':>7} {'compact':>8} {'saved':>6}")
+    for i, (job, report) in enumerate(zip(jobs, summary["per_job"])):
+        saved = 1 - report["tokens_after"] / report["tokens_before"] if report["tokens_before"] else 0.0
+        print(
+            f"{i:>3} {job.company[:20]:<20} {job.job_title[:28]:<28} {report['tokens_before']:>7} "
+            f"{report['tokens_after']:>8} {saved:>6.0%}"
+        )
+    print(f"Total {summary['tokens_before']} -> {summary['tokens_after']} tokens ({summary['reduction']:.0%} fewer)")
+    if args.tokens_only:
+        sys.exit(0)
+
+    with open(args.resume_path) as f:
+        resume = f.read()
+    num_iters = args.num_iters or eval_results["num_iter"]
+    backend = get_backend()
+    outputs = run_scoring(
+        resume, [x for x in compacted for _ in range(num_iters)], backend.async_score_resume, SCORING_CONCURRENCY
+    )
+    baseline, after, stds = [], [], []
+    for i, entry in enumerate(entries):
+        scores = [x.score for x in outputs[i * num_iters:(i + 1) * num_iters] if x.score >= 0]
+        if not scores:
+            continue
+        baseline.append(np.mean(entry["new_scores"]))
+        after.append(np.mean(scores))
+        stds.append(np.std(entry["new_scores"], ddof=1) if len(entry["new_scores"]) > 1 else 0.0)
+    if not after:
+        sys.exit("Every compacted scoring request failed")
+    diffs = np.array(after) - np.array(baseline)
+    mean_abs = float(np.abs(diffs).mean())
+    print(
+        f"Scores on {AI_BACKEND} over {len(diffs)} jobs, {num_iters} samples each: mean |change| {mean_abs:.2f}, "
+        f"max |change| {np.abs(diffs).max():.2f}, mean change {diffs.mean():+.2f}, "
+        f"baseline std {np.mean(stds):.2f}, within 1 point {np.mean(np.abs(diffs) <= 1):.0%}"
+    )
+    if mean_abs > args.tolerance:
+        sys.exit(f"Mean absolute score change {mean_abs:.2f} exceeds tolerance {args.tolerance}")
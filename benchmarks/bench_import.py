@@ -0,0 +1,74 @@
+"""
+Cold-start benchmark of the CLI entry points using python -X importtime.
+
+Each module is imported in a fresh interpreter without credentials, so it also checks that
+importing never needs an API key. The report lists the cumulative import time, the heaviest
+imports, and whether any provider SDK was loaded, which should only happen on first use.
+
+Usage:
+    python -m benchmarks.bench_import -m main eval_cache -R 5 --max_ms 400
+"""
+import argparse
+import os
+from pathlib import Path
+import subprocess
+import sys
+import tempfile
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+SDK_MODULES = ["openai", "ollama", "apify_client"]
+
+
+def import_times(module: str) -> Dict[str, int]:
+    """Imports module in a fresh interpreter and returns the cumulative microseconds per imported module."""
+    env = {k: v for k, v in os.environ.items() if k not in ("OPENAI_API_KEY", "APIFY_API_KEY")}
+    env["PYTHONPATH"] = str(REPO_ROOT)
+    # A scratch working directory keeps load_dotenv from finding the repo's .env
+    with tempfile.TemporaryDirectory() as workdir:
+        (Path(workdir) / "data").mkdir()
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            capture_output=True, text=True, env=env, cwd=workdir,
+        )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def run_benchmark(modules: List[str], repeats: int, top: int) -> List[Tuple[str, float]]:
+    results = []
+    for module in modules:
+        runs = [import_times(module) for _ in range(repeats)]
+        totals = [run[module] / 1000 for run in runs]
+        loaded = [x for x in SDK_MODULES if x in runs[0]]
+        print(f"{module}: median {np.median(totals):.0f} ms, min {min(totals):.0f} ms over {repeats} runs")
+        print(f"  provider SDKs imported: {', '.join(loaded) if loaded else 'none'}")
+        heaviest = sorted(
+            ((name, us) for name, us in runs[0].items() if name != module and "." not in name),
+            key=lambda x: -x[1],
+        )[:top]
+        for name, us in heaviest:
+            print(f"  {us / 1000:>8.1f} ms  {name}")
+        results.append((module, float(np.median(totals))))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure cold-start import time of the CLI entry points")
+    parser.add_argument("-m", "--modules", nargs="+", default=["main", "eval_cache"])
+    parser.add_argument("-R", "--repeats", type=int, default=5)
+    parser.add_argument("-t", "--top", type=int, default=8, help="Number of heaviest top-level imports to list")
+    parser.add_argument("--max_ms", type=float, help="Exit non-zero if any module's median import time exceeds this")
+    args = parser.parse_args()
+    results = run_benchmark(args.modules, args.repeats, args.top)
+    if args.max_ms is not None and any(ms > args.max_ms for _, ms in results):
+        sys.exit(f"Import time above {args.max_ms} ms")
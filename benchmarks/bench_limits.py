@@ -0,0 +1,113 @@
+"""
+Scores a batch against a fake provider that enforces its own rate limit, with and without the limiter.
+
+The fake provider admits at most --provider_rpm requests per minute and answers the rest with
+a 429 carrying Retry-After, and fails another --error_rate of requests with a 503. Without the
+limiter every rejected request becomes a score of -1, as before; with it, requests are paced
+client side, retried, and only count as failed once their retries run out.
+
+Usage:
+    python -m benchmarks.bench_limits -N 200 -c 16 --provider_rpm 600 --error_rate 0.02
+"""
+import argparse
+import asyncio
+from collections import deque
+import logging
+import random
+import time
+
+import instrumentation
+from datamodels.models import JDScore
+from scoring.engine import run_scoring
+from scoring.limits import CircuitBreaker, LLMLimiter
+
+RESUME = "Data scientist with python sql spark airflow pytorch statistics experimentation forecasting"
+
+
+class FakeResponse:
+    def __init__(self, headers):
+        self.headers = headers
+
+
+class FakeAPIError(RuntimeError):
+    """Mimics an SDK status error: status_code and the response headers."""
+
+    def __init__(self, status_code: int, headers=None):
+        super().__init__(f"Error code: {status_code}")
+        self.status_code = status_code
+        self.response = FakeResponse(headers or {})
+
+
+class RateLimitedProvider:
+    """Sliding one-minute window of admitted requests, with a fixed latency and random 503s."""
+
+    def __init__(self, rpm: int, latency: float, error_rate: float, seed: int = 0):
+        self.rpm = rpm
+        self.latency = latency
+        self.error_rate = error_rate
+        self._admitted = deque()
+        self._rng = random.Random(seed)
+        self.rejected = 0
+
+    async def score(self, resume: str, description: str) -> JDScore:
+        now = time.monotonic()
+        while self._admitted and now - self._admitted[0] >= 60:
+            self._admitted.popleft()
+        if len(self._admitted) >= self.rpm:
+            self.rejected += 1
+            wait = 60 - (now - self._admitted[0])
+            raise FakeAPIError(429, {"retry-after": f"{wait:.0f}", "retry-after-ms": f"{wait * 1000:.0f}"})
+        self._admitted.append(now)
+        await asyncio.sleep(self.latency)
+        if self._rng.random() < self.error_rate:
+            raise FakeAPIError(503)
+        return JDScore(score=len(description) % 11, explanation="fake")
+
+
+def run(mode: str, args: argparse.Namespace) -> None:
+    instrumentation.reset()
+    provider = RateLimitedProvider(args.provider_rpm, args.latency, args.error_rate)
+    limiter = LLMLimiter(
+        "fake", args.client_rpm, 0, args.max_retries, CircuitBreaker(args.breaker_failures, args.cooldown),
+        base_delay=0.2, max_delay=5,
+    )
+
+    async def limited(resume: str, description: str) -> JDScore:
+        score, _ = await limiter.acall(lambda: provider.score(resume, description), "score")
+        return score
+
+    descriptions = [f"job {i} " * (i % 7 + 1) for i in range(args.requests)]
+    start = time.perf_counter()
+    scores = run_scoring(RESUME, descriptions, limited if mode == "limiter" else provider.score, args.concurrency)
+    wall = time.perf_counter() - start
+    failed = sum(x.score < 0 for x in scores)
+    outcomes = instrumentation.request_outcomes().get("score", {})
+    print(
+        f"{mode:>9} {wall:>8.2f} {len(scores) - failed:>7} {failed:>7} {outcomes.get('ok', '-'):>5} "
+        f"{outcomes.get('retried_ok', '-'):>11} {outcomes.get('retries', '-'):>8} {provider.rejected:>9} "
+        f"{limiter.breaker.opens if mode == 'limiter' else '-':>6}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare failed scores against a rate-limited provider with and without the limiter")
+    parser.add_argument("-N", "--requests", type=int, default=200)
+    parser.add_argument("-c", "--concurrency", type=int, default=16)
+    parser.add_argument("--provider_rpm", type=int, default=600, help="Requests per minute the fake provider admits")
+    parser.add_argument("--client_rpm", type=float, help="Limiter requests per minute, defaults to 90%% of provider_rpm")
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds per admitted request")
+    parser.add_argument("--error_rate", type=float, default=0.02, help="Fraction of admitted requests failing with a 503")
+    parser.add_argument("--max_retries", type=int, default=5)
+    parser.add_argument("--breaker_failures", type=int, default=5)
+    parser.add_argument("--cooldown", type=float, default=2.0, help="First circuit breaker pause, in seconds")
+    args = parser.parse_args()
+    args.client_rpm = args.client_rpm or args.provider_rpm * 0.9
+    logging.disable(logging.ERROR)
+
+    print(
+        f"{args.requests} requests, {args.concurrency} in flight, provider admits {args.provider_rpm}/min, "
+        f"limiter {args.client_rpm:.0f}/min, {args.error_rate:.0%} 503s"
+    )
+    print(f"{'mode':>9} {'wall (s)':>8} {'scored':>7} {'failed':>7} {'ok':>5} {'retried_ok':>11} {'retries':>8} {'429s seen':>9} {'pauses':>6}")
+    run("direct", args)
+    run("limiter", args)
@@ -0,0 +1,85 @@
+"""
+Compares scoring throughput on a local Ollama server with and without throughput mode.
+
+    default:    the current path, SCORING_CONCURRENCY requests in flight, the server's default
+                context window, and the model loaded by the first request
+    throughput: the model prewarmed and pinned, num_ctx sized to each prompt, and as many
+                requests in flight as the server has parallel slots
+
+The model is unloaded before each mode, so both start cold. In throughput mode the load is timed
+separately: in the workflow it overlaps the prompt check and the fetch. jobs/min and tokens/s are
+over scoring wall time. The default mode does not size the context window, so with long
+descriptions (-w) Ollama may truncate its prompts; "prompt tok" shows how much it evaluated.
+
+Needs a running Ollama server with the model pulled, and OLLAMA_NUM_PARALLEL set to the server's
+own setting. Usage:
+    AI_BACKEND=ollama python -m benchmarks.bench_ollama -N 40 -w 400 --model gemma3:1b
+    AI_BACKEND=ollama python -m benchmarks.bench_ollama -N 40 -w 1500 --slots 2 --default_concurrency 8
+"""
+import argparse
+import logging
+import time
+
+from ollama import chat
+
+from benchmarks.bench_prefilter import synthetic_jobs
+from config import OLLAMA_NUM_PARALLEL
+import instrumentation
+from scoring import ollama_models
+from scoring.engine import run_scoring
+from scoring.tokens import estimate_message_tokens
+
+RESUME = (
+    "Data scientist with 6 years of python, sql, spark and airflow. Built forecasting and experimentation "
+    "platforms, pytorch models for churn and demand, dbt and snowflake pipelines, and dashboards for product teams."
+)
+
+
+def unload(model_name: str) -> None:
+    chat(model=model_name, messages=[], keep_alive=0)
+
+
+def run(mode: str, args: argparse.Namespace, descriptions: list) -> None:
+    unload(args.model)
+    instrumentation.reset()
+    ollama_models.model = args.model
+    ollama_models.throughput = mode == "throughput"
+    ollama_models.KEEP_ALIVE = -1 if mode == "throughput" else "30m"
+    ollama_models._num_ctx.clear()
+    load = 0.0
+    if mode == "throughput":
+        start = time.perf_counter()
+        longest = max(estimate_message_tokens(ollama_models._score_messages(RESUME, x)) for x in descriptions)
+        ollama_models.prewarm([args.model], longest)
+        load = time.perf_counter() - start
+    concurrency = args.slots if mode == "throughput" else args.default_concurrency
+
+    start = time.perf_counter()
+    scores = run_scoring(RESUME, descriptions, ollama_models.async_score_resume, concurrency)
+    wall = time.perf_counter() - start
+    calls = instrumentation.llm_calls(stage="score")
+    completion = sum(x.completion_tokens for x in calls)
+    evaluated = sum(x.prompt_tokens for x in calls)
+    failed = sum(x.score < 0 for x in scores)
+    num_ctx = ollama_models._num_ctx.get(args.model, "-")
+    print(
+        f"{mode:>10} {concurrency:>5} {num_ctx:>7} {load:>8.1f} {wall:>8.1f} {len(descriptions) / wall * 60:>8.1f} "
+        f"{completion / wall:>8.1f} {evaluated:>10} {failed:>6}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare Ollama scoring throughput with and without throughput mode")
+    parser.add_argument("-N", "--jobs", type=int, default=40)
+    parser.add_argument("-w", "--words", type=int, default=400, help="Words per synthetic job description")
+    parser.add_argument("--model", type=str, default=ollama_models.model)
+    parser.add_argument("--slots", type=int, default=OLLAMA_NUM_PARALLEL, help="Parallel slots of the server")
+    parser.add_argument("--default_concurrency", type=int, default=8, help="Requests in flight on the default path")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    descriptions = [x.description for x in synthetic_jobs(args.jobs, args.words)]
+    print(f"{args.jobs} jobs of {args.words} words with {args.model}, {args.slots} server slots")
+    print(f"{'mode':>10} {'in fl':>5} {'num_ctx':>7} {'load (s)':>8} {'wall (s)':>8} {'jobs/min':>8} {'gen tok/s':>8} {'prompt tok':>10} {'failed':>6}")
+    run("default", args, descriptions)
+    run("throughput", args, descriptions)
@@ -0,0 +1,155 @@
+"""
+Compares scoring on one Ollama host with scoring spread over a pool of hosts.
+
+The hosts are fakes: each serves SLOTS requests at a time, sleeps a per-request latency and
+answers a score derived from the job description alone, so every host would score a job the same.
+The pool has one host that is SLOW times slower than the rest and, with --down_after, one that
+stops answering after that many requests, and its health checks, mid-run. Requests go through
+ollama_models.async_score_resume and the shared limiter, as in the workflow; the single-host run
+uses the plain client path without a pool.
+
+Reports wall time and jobs/min per mode, per-host requests, failures and throughput from the
+run report, and whether the pool's ranking matches the single host's.
+
+Usage:
+    AI_BACKEND=ollama python -m benchmarks.bench_ollama_pool -N 120 --hosts 4
+    AI_BACKEND=ollama python -m benchmarks.bench_ollama_pool -N 120 --hosts 3 --down_after 0
+"""
+import argparse
+import asyncio
+from contextlib import nullcontext
+import logging
+import time
+from typing import Dict, List, Optional
+from unittest import mock
+import zlib
+
+from ollama import ChatResponse, ListResponse, Message
+
+from benchmarks.bench_prefilter import synthetic_jobs
+import instrumentation
+from scoring import ollama_models
+from scoring.engine import run_scoring
+from scoring.ollama_pool import OllamaPool, model_key
+
+RESUME = (
+    "Data scientist with 6 years of python, sql, spark and airflow. Built forecasting and experimentation "
+    "platforms, pytorch models for churn and demand, dbt and snowflake pipelines, and dashboards for product teams."
+)
+DIGEST = "sha256:fake"
+
+
+class FakeHost:
+    """
+    One fake Ollama server with a fixed number of slots.
+
+    Attributes:
+        url (str): The host's URL.
+        latency (float): Seconds per request once it has a slot.
+        slots (int): Requests it serves at once; the rest queue.
+        down_after (int, optional): Requests after which it stops answering, None to stay up.
+    """
+
+    def __init__(self, url: str, latency: float, slots: int, down_after: Optional[int] = None):
+        self.url = url
+        self.latency = latency
+        self.slots = slots
+        self.down_after = down_after
+        self.received = 0
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    @property
+    def down(self) -> bool:
+        return self.down_after is not None and self.received >= self.down_after
+
+    def list(self) -> ListResponse:
+        if self.down:
+            raise ConnectionError(f"{self.url} is down")
+        return ListResponse(models=[ListResponse.Model(model=model_key(ollama_models.model), digest=DIGEST)])
+
+    def chat(self, model: str, messages: List[Dict[str, str]], **kwargs) -> ChatResponse:
+        # Only prewarm uses the synchronous client
+        return ChatResponse(model=model, message=Message(role="assistant", content=""))
+
+    async def achat(self, model: str, messages: List[Dict[str, str]], **kwargs) -> ChatResponse:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.slots)
+        if self.down:
+            raise ConnectionError(f"{self.url} is down")
+        self.received += 1
+        async with self._slots:
+            await asyncio.sleep(self.latency)
+        description = messages[-1]["content"]
+        score = zlib.crc32(description.encode()) % 101 / 10
+        return ChatResponse(
+            model=model,
+            message=Message(role="assistant", content=f'{{"score": {score}, "explanation": "fake"}}'),
+            prompt_eval_count=len(description) // 4,
+            eval_count=40,
+        )
+
+
+class FakeClient:
+    """Stands in for ollama.Client and ollama.AsyncClient of one fake host."""
+
+    def __init__(self, host: FakeHost, is_async: bool):
+        self.list = host.list
+        self.chat = host.achat if is_async else host.chat
+
+
+def ranking(scores) -> List[int]:
+    return sorted(range(len(scores)), key=lambda i: (-scores[i].score, i))
+
+
+def run(name: str, descriptions: List[str], concurrency: int, pool: Optional[OllamaPool] = None, single: Optional[FakeHost] = None):
+    instrumentation.reset()
+    ollama_models._pool = pool
+    patch = mock.patch.object(ollama_models, "get_async_client", lambda: FakeClient(single, True)) if single else nullcontext()
+    with patch:
+        start = time.perf_counter()
+        scores = run_scoring(RESUME, descriptions, ollama_models.async_score_resume, concurrency)
+        wall = time.perf_counter() - start
+    failed = sum(x.score < 0 for x in scores)
+    print(f"{name:>7} {concurrency:>5} {wall:>8.2f} {len(descriptions) / wall * 60:>8.0f} {failed:>6}")
+    return scores
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare scoring on one Ollama host with a pool of fake hosts")
+    parser.add_argument("-N", "--jobs", type=int, default=120)
+    parser.add_argument("--hosts", type=int, default=4, help="Fake hosts in the pool")
+    parser.add_argument("--slots", type=int, default=2, help="Parallel slots of each host")
+    parser.add_argument("--latency", type=float, default=0.1, help="Seconds per request on a normal host")
+    parser.add_argument("--slow", type=float, default=4.0, help="Latency multiplier of the slow host")
+    parser.add_argument("--down_after", type=int, default=10, help="Requests after which the last host goes down, -1 for never")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    descriptions = [x.description for x in synthetic_jobs(args.jobs, 200)]
+    print(f"{args.jobs} jobs, {args.hosts} hosts of {args.slots} slots, {args.latency}s per request")
+    print(f"{'mode':>7} {'in fl':>5} {'wall (s)':>8} {'jobs/min':>8} {'failed':>6}")
+    baseline = run("single", descriptions, args.slots, single=FakeHost("single", args.latency, args.slots))
+
+    fakes = {}
+    for i in range(args.hosts):
+        url = f"http://host{i}:11434"
+        latency = args.latency * (args.slow if i == 0 else 1)
+        down_after = args.down_after if i == args.hosts - 1 and args.down_after >= 0 and args.hosts > 1 else None
+        fakes[url] = FakeHost(url, latency, args.slots, down_after)
+    pool = OllamaPool(
+        list(fakes),
+        slots=args.slots,
+        request_timeout=args.latency * 50,
+        cooldown=args.latency * 10,
+        health_interval=args.latency * 5,
+        client_factory=lambda host, timeout: FakeClient(fakes[host], False),
+        async_client_factory=lambda host, timeout: FakeClient(fakes[host], True),
+    )
+    pooled = run("pool", descriptions, args.slots * args.hosts, pool=pool)
+    pool.close()
+
+    print(f"\n{'host':>20} {'requests':>8} {'share':>6} {'failed':>6} {'req/min':>8} {'tok/s':>7}")
+    for host, x in instrumentation.host_stats().items():
+        print(f"{host:>20} {x['requests']:>8} {x['share']:>6.0%} {x['failed']:>6} {x['requests_per_min']:>8.0f} {x['tokens_per_s']:>7.0f}")
+    same = ranking(baseline) == ranking(pooled) and [x.score for x in baseline] == [x.score for x in pooled]
+    print(f"\nranking identical to the single host: {same}")
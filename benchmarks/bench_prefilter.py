@@ -0,0 +1,57 @@
+"""
+Timing benchmark for the BM25 prefilter on synthetic job descriptions.
+
+Usage:
+    python -m benchmarks.bench_prefilter -n 1000 5000 -w 400
+"""
+import argparse
+import logging
+import random
+import time
+from typing import List
+
+from datamodels.models import JobInfo
+from scoring.prefilter import prefilter_jobs
+
+VOCAB = (
+    "python sql spark airflow kubernetes docker aws gcp azure pytorch tensorflow statistics experimentation "
+    "forecasting dashboards tableau looker stakeholders leadership mentoring pipelines etl dbt snowflake "
+    "marketing sales finance healthcare benefits insurance equal opportunity employer applicants disability "
+    "veterans customers product roadmap agile scrum java scala golang rust react typescript frontend backend "
+    "nursing retail warehouse logistics forklift accounting audit compliance legal recruiting onboarding"
+).split()
+
+
+def synthetic_jobs(n: int, words: int, seed: int = 0) -> List[JobInfo]:
+    rng = random.Random(seed)
+    return [
+        JobInfo(
+            company=f"Company {i}",
+            company_url="Not Specified",
+            description=" ".join(rng.choices(VOCAB, k=words)),
+            is_verified=False,
+            job_title="Data Scientist",
+            job_url=f"https://example.com/jobs/{i}",
+            location="Austin",
+            posted_at="2025-01-01",
+        )
+        for i in range(n)
+    ]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the lexical prefilter")
+    parser.add_argument("-n", "--num_jobs", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("-w", "--words", type=int, default=400, help="Words per synthetic description")
+    parser.add_argument("-k", "--top_k", type=int, default=50)
+    args = parser.parse_args()
+    logging.getLogger("scoring").setLevel(logging.WARNING)
+
+    resume = "Data scientist with python sql spark airflow pytorch statistics experimentation forecasting dbt snowflake"
+    print(f"{'postings':>10} {'seconds':>10} {'calls saved':>12}")
+    for n in args.num_jobs:
+        jobs = synthetic_jobs(n, args.words)
+        start = time.perf_counter()
+        kept, dropped = prefilter_jobs(resume, jobs, top_k=args.top_k)
+        elapsed = time.perf_counter() - start
+        print(f"{n:>10} {elapsed:>10.3f} {len(dropped):>12}")
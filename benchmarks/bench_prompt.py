@@ -0,0 +1,117 @@
+"""
+Compares the latency of turning a prompt into a search three ways, over a corpus of sample prompts.
+
+    sequential: the gate, then the extraction, one LLM request after the other (the old path)
+    concurrent: the gate and the extraction in flight together
+    fast path:  the local parser, falling back to the concurrent requests when it is unsure
+
+The corpus mixes prompts the parser should handle, with the search it should return, and
+prompts it should leave to the LLM. Parser mismatches are listed. By default the LLM requests
+go to the fake backend, with the gate and extract latencies of benchmarks.fakes scaled by -s;
+--live sends them to the configured backend instead.
+
+Usage:
+    python -m benchmarks.bench_prompt -s 1
+    python -m benchmarks.bench_prompt --live
+"""
+import argparse
+import asyncio
+from contextlib import nullcontext
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from benchmarks.fakes import FakeBackends, scaled_profiles
+from scoring.backends import get_backend
+from scoring.prompt_extraction import async_extract_search, parse_prompt
+
+# (prompt, expected (keywords, city, limit, hybrid) or None if the LLM should handle it)
+CORPUS: List[Tuple[str, Optional[Tuple[str, str, int, bool]]]] = [
+    ("Data Scientist jobs in Austin, limit 50", ("Data Scientist", "Austin", 50, False)),
+    ("Data Scientist jobs in Austin, TX, limit 30, hybrid", ("Data Scientist", "Austin", 30, True)),
+    ("Senior Data Engineer jobs in New York City", ("Senior Data Engineer", "New York City", 20, False)),
+    ("data scientist or machine learning engineer jobs in chicago", ("data scientist OR machine learning engineer", "Chicago", 20, False)),
+    ("Find me 40 product manager roles in Seattle and Portland", ("product manager", "Seattle; Portland", 40, False)),
+    ("Search for Backend Engineer positions in San Francisco, CA with a limit of 25", ("Backend Engineer", "San Francisco", 25, False)),
+    ("Analytics Engineer jobs in Denver, Colorado; hybrid only", ("Analytics Engineer", "Denver", 20, True)),
+    ("Show me UX Designer jobs in Boston or Providence, max 15", ("UX Designer", "Boston; Providence", 15, False)),
+    ("ML Engineer / Data Scientist jobs in Atlanta, 60 results", ("ML Engineer OR Data Scientist", "Atlanta", 60, False)),
+    ("Site Reliability Engineer openings in Raleigh, NC", ("Site Reliability Engineer", "Raleigh", 20, False)),
+    ("Data Scientist jobs in Seattle, Washington", ("Data Scientist", "Seattle", 20, False)),
+    ("QA Engineer jobs in Buffalo, New York", ("QA Engineer", "Buffalo", 20, False)),
+    ("Remote data scientist jobs in Austin", None),
+    ("Data Scientist jobs in Austin paying over 150k", None),
+    ("Hybrid cloud engineer jobs in Dallas", None),
+    ("Data scientist jobs at startups in Austin", None),
+    ("Jobs for new grads in the Bay Area", None),
+    ("I'm a biologist looking to move into data science around Boston, what's out there?", None),
+    ("Data Scientist jobs in Austin, limit 5000", None),
+    ("What is the capital of France?", None),
+    ("Staff machine learning engineer jobs anywhere in Texas", None),
+    ("Data analyst roles in Chicago that sponsor visas", None),
+    ("Sales jobs in Austin with equity", None),
+    ("Policy analyst jobs in Washington, DC", None),
+    ("Data Scientist jobs in New York", None),
+    ("Data Scientist jobs in Austin TX", None),
+]
+
+
+def check_parser() -> List[str]:
+    """Returns a line per corpus prompt the parser got wrong."""
+    mismatches = []
+    for prompt, expected in CORPUS:
+        parsed = parse_prompt(prompt)
+        got = (parsed.keywords, parsed.city, parsed.limit, parsed.hybrid) if parsed is not None else None
+        if got != expected:
+            mismatches.append(f"{prompt!r}: expected {expected}, got {got}")
+    return mismatches
+
+
+async def sequential(prompt: str) -> None:
+    backend = get_backend()
+    if (await backend.async_check_search_prompt(prompt)).is_valid:
+        await backend.async_extract_reqs(prompt)
+
+
+def time_mode(mode: str, repeat: int) -> List[float]:
+    """Seconds per prompt, over every corpus prompt repeat times."""
+    latencies = []
+    for _ in range(repeat):
+        for prompt, _ in CORPUS:
+            start = time.perf_counter()
+            try:
+                if mode == "sequential":
+                    asyncio.run(sequential(prompt))
+                else:
+                    asyncio.run(async_extract_search(prompt, fast_path=mode == "fast path"))
+            except ValueError:
+                pass
+            latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare prompt parsing latency with and without the local fast path")
+    parser.add_argument("-s", "--scale", type=float, default=1.0, help="Multiplier on the fake gate and extract latencies")
+    parser.add_argument("--repeat", type=int, default=1, help="Passes over the corpus per mode")
+    parser.add_argument("--live", action="store_true", help="Send LLM requests to the configured backend instead of the fakes")
+    args = parser.parse_args()
+    logging.disable(logging.ERROR)
+
+    mismatches = check_parser()
+    parsed = sum(parse_prompt(p) is not None for p, _ in CORPUS)
+    print(f"{len(CORPUS)} prompts, {parsed} parsed locally, {len(mismatches)} parser mismatches")
+    for line in mismatches:
+        print(f"  {line}")
+
+    fakes = None if args.live else FakeBackends(profiles=scaled_profiles(args.scale))
+    results: Dict[str, List[float]] = {}
+    with fakes.install() if fakes is not None else nullcontext():
+        for mode in ("sequential", "concurrent", "fast path"):
+            results[mode] = time_mode(mode, args.repeat)
+    print(f"{'mode':>11} {'mean (ms)':>10} {'p50 (ms)':>9} {'p95 (ms)':>9} {'total (s)':>9}")
+    for mode, latencies in results.items():
+        ms = np.array(latencies) * 1000
+        print(f"{mode:>11} {ms.mean():>10.1f} {np.percentile(ms, 50):>9.1f} {np.percentile(ms, 95):>9.1f} {sum(latencies):>9.2f}")
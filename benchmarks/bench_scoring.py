@@ -0,0 +1,48 @@
+"""
+Wall-clock benchmark of the concurrent scoring engine against a fake backend.
+
+The fake scorer sleeps for a fixed latency, standing in for one LLM round trip,
+so the numbers isolate the engine's scheduling from any real provider.
+
+Usage:
+    python -m benchmarks.bench_scoring -j 200 -l 0.05 -c 1 4 16 64
+"""
+import argparse
+import asyncio
+import logging
+import time
+from typing import List
+
+from datamodels.models import JDScore
+from scoring.engine import run_scoring
+
+
+def make_fake_scorer(latency: float):
+    async def fake_score_resume(resume_text: str, job_description: str) -> JDScore:
+        await asyncio.sleep(latency)
+        return JDScore(score=len(job_description) % 11, explanation="fake")
+    return fake_score_resume
+
+
+def run_benchmark(num_jobs: int, latency: float, concurrency_levels: List[int]) -> None:
+    descriptions = [f"Job description {i}" for i in range(num_jobs)]
+    scorer = make_fake_scorer(latency)
+    serial_estimate = num_jobs * latency
+    print(f"{num_jobs} jobs, {latency * 1000:.0f} ms per call, serial estimate {serial_estimate:.2f}s")
+    print(f"{'concurrency':>12} {'wall (s)':>10} {'jobs/s':>10} {'speedup':>10}")
+    for concurrency in concurrency_levels:
+        start = time.perf_counter()
+        results = run_scoring("resume", descriptions, scorer, max_concurrency=concurrency)
+        elapsed = time.perf_counter() - start
+        assert [x.score for x in results] == [len(d) % 11 for d in descriptions], "results out of order"
+        print(f"{concurrency:>12} {elapsed:>10.2f} {num_jobs / elapsed:>10.1f} {serial_estimate / elapsed:>10.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark concurrent scoring against a fixed-latency fake backend")
+    parser.add_argument("-j", "--num_jobs", type=int, default=200)
+    parser.add_argument("-l", "--latency", type=float, default=0.05, help="Seconds per fake LLM call")
+    parser.add_argument("-c", "--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    args = parser.parse_args()
+    logging.getLogger("scoring").setLevel(logging.WARNING)
+    run_benchmark(args.num_jobs, args.latency, args.concurrency)
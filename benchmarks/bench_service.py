@@ -0,0 +1,153 @@
+"""
+Load test of the HTTP service against one CLI invocation per request, with fake backends.
+
+Both modes run the same streamed search-and-score workflow against FakeBackends, with a
+different resume per request so every request pays for its scoring. The CLI mode starts a
+fresh interpreter per request, as running main.py does; the service mode sends the same
+requests to one long-running server. --cold_start adds a fixed start-up cost, such as
+loading an Ollama model, which the CLI pays per request and the service once at start.
+
+Usage:
+    python -m benchmarks.bench_service -N 20 -c 4 -n 20 -s 0.1 --cold_start 1.0
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import contextlib
+import io
+import json
+import logging
+import multiprocessing
+import os
+from pathlib import Path
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Tuple
+import urllib.request
+
+import numpy as np
+
+from benchmarks.fakes import FakeBackends, scaled_profiles
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+RESUME = "Data scientist with python sql spark airflow pytorch statistics experimentation forecasting dbt snowflake"
+PROMPT = "Data scientist jobs in Austin"
+
+
+def _env() -> Dict[str, str]:
+    env = dict(os.environ)
+    env.setdefault("OPENAI_API_KEY", "benchmark")
+    env.setdefault("APIFY_API_KEY", "benchmark")
+    env["PYTHONPATH"] = str(REPO_ROOT)
+    return env
+
+
+def cli_once(resume: str, num_postings: int, scale: float, cold_start: float) -> None:
+    """Runs one streamed workflow in this process, as a main.py invocation would."""
+    logging.disable(logging.ERROR)
+    time.sleep(cold_start)
+    import main
+
+    with FakeBackends(num_postings=num_postings, profiles=scaled_profiles(scale, 0)).install():
+        with contextlib.redirect_stdout(io.StringIO()):
+            main.run_stream_workflow(resume, PROMPT)
+
+
+def run_cli(requests: int, concurrency: int, num_postings: int, scale: float, cold_start: float) -> List[float]:
+    def invoke(i: int) -> float:
+        args = [
+            sys.executable, "-m", "benchmarks.bench_service", "--cli_once", f"{RESUME} variant {i}",
+            "-n", str(num_postings), "-s", str(scale), "--cold_start", str(cold_start),
+        ]
+        with tempfile.TemporaryDirectory(prefix="bench_service_") as workdir:
+            os.makedirs(Path(workdir) / "data/cache")
+            start = time.perf_counter()
+            subprocess.run(args, cwd=workdir, env=_env(), check=True, capture_output=True)
+            return time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(invoke, range(requests)))
+
+
+def _serve(workdir: str, workers: int, num_postings: int, scale: float, cold_start: float, ready) -> None:
+    os.environ.update(_env())
+    os.chdir(workdir)
+    logging.disable(logging.ERROR)
+    import server
+
+    with FakeBackends(num_postings=num_postings, profiles=scaled_profiles(scale, 0)).install():
+        http_server = server.serve(port=0, workers=workers)
+        time.sleep(cold_start)
+        ready.put(http_server.server_address[1])
+        with contextlib.redirect_stdout(io.StringIO()):
+            http_server.serve_forever()
+
+
+def request_stream(port: int, resume: str) -> Tuple[float, float]:
+    """Submits one streamed job and reads it to the end. Returns seconds to the first result and to completion."""
+    body = json.dumps({"resume": resume, "prompt": PROMPT, "stream": True}).encode()
+    req = urllib.request.Request(
+        f"http://127.0.0.1:{port}/jobs", data=body, headers={"Content-Type": "application/json"}
+    )
+    start = time.perf_counter()
+    first = None
+    with urllib.request.urlopen(req) as response:
+        for line in response:
+            event = json.loads(line)
+            if event["event"] == "result" and first is None:
+                first = time.perf_counter() - start
+            if event["event"] in ("done", "failed"):
+                if event["event"] == "failed":
+                    raise RuntimeError(event["error"])
+                break
+    return first or 0.0, time.perf_counter() - start
+
+
+def run_service(requests: int, concurrency: int, num_postings: int, scale: float, cold_start: float) -> List[Tuple[float, float]]:
+    ctx = multiprocessing.get_context("spawn")
+    ready = ctx.Queue()
+    with tempfile.TemporaryDirectory(prefix="bench_service_") as workdir:
+        os.makedirs(Path(workdir) / "data/cache")
+        process = ctx.Process(target=_serve, args=(workdir, concurrency, num_postings, scale, cold_start, ready))
+        process.start()
+        try:
+            port = ready.get(timeout=60)
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                return list(pool.map(lambda i: request_stream(port, f"{RESUME} variant {i}"), range(requests)))
+        finally:
+            process.terminate()
+            process.join()
+
+
+def report(mode: str, latencies: List[float], wall: float, first: List[float] = None) -> None:
+    p50, p95 = np.percentile(latencies, [50, 95])
+    first_cell = f"{np.percentile(first, 50):.2f}" if first else "-"
+    print(f"{mode:>8} {len(latencies):>9} {wall:>8.2f} {len(latencies) / wall:>8.2f} {p50:>8.2f} {p95:>8.2f} {first_cell:>11}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare requests/s of the HTTP service with CLI invocations")
+    parser.add_argument("-N", "--requests", type=int, default=20)
+    parser.add_argument("-c", "--concurrency", type=int, default=4, help="Requests in flight, and service workers")
+    parser.add_argument("-n", "--num_postings", type=int, default=20, help="Postings per request")
+    parser.add_argument("-s", "--scale", type=float, default=0.1, help="Multiplier on the default fake latencies")
+    parser.add_argument("--cold_start", type=float, default=0.0, help="Seconds of start-up cost per process, e.g. a model load")
+    parser.add_argument("--cli_once", type=str, metavar="RESUME", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.cli_once is not None:
+        cli_once(args.cli_once, args.num_postings, args.scale, args.cold_start)
+        sys.exit(0)
+
+    print(
+        f"{args.requests} requests, {args.concurrency} in flight, {args.num_postings} postings each, "
+        f"latency scale {args.scale}, cold start {args.cold_start}s"
+    )
+    print(f"{'mode':>8} {'requests':>9} {'wall (s)':>8} {'req/s':>8} {'p50 (s)':>8} {'p95 (s)':>8} {'first (s)':>11}")
+    start = time.perf_counter()
+    cli = run_cli(args.requests, args.concurrency, args.num_postings, args.scale, args.cold_start)
+    report("cli", cli, time.perf_counter() - start)
+    start = time.perf_counter()
+    service = run_service(args.requests, args.concurrency, args.num_postings, args.scale, args.cold_start)
+    report("service", [x[1] for x in service], time.perf_counter() - start, [x[0] for x in service])
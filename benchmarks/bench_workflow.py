@@ -0,0 +1,110 @@
+"""
+End-to-end benchmark of main.run_workflow against fake LLM and job-board backends.
+
+Every run happens in a fresh process and a scratch working directory, so caches start
+empty and peak RSS belongs to that run alone. Stage latencies are measured per call
+inside the fakes; jobs/s is the postings the fakes actually returned over workflow wall time, and
+"scored" counts the descriptions the fakes scored. The prompt always goes through the fake gate and
+extract calls, whose limit of n postings the fetch then honours. With -b, jobs are scored
+in multi-job requests of that many prompt tokens. The benchmark then fails if any fake batch was
+rejected as malformed, since every rejected batch is rescored through the single-job fallback and
+the numbers would no longer measure batching. "splits" counts batches split after a response
+mismatch or an injected error.
+
+Usage:
+    python -m benchmarks.bench_workflow -n 10 100 1000 -s 0.1 -e 0.01 -c 8
+    python -m benchmarks.bench_workflow -n 100 1000 -s 0.1 -e 0 -b 8000
+"""
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import contextlib
+import io
+import logging
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+from benchmarks.fakes import FakeBackends, scaled_profiles
+
+STAGES = ["gate", "extract", "fetch", "score", "gaps"]
+RESUME = "Data scientist with python sql spark airflow pytorch statistics experimentation forecasting dbt snowflake"
+
+
+def run_once(
+    num_postings: int, scale: float, error_rate: float, duplicate_rate: float, concurrency: int, batch_tokens: int = 0
+) -> Dict[str, Any]:
+    """Runs the workflow once in the current process and returns its measurements."""
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+    os.environ.setdefault("APIFY_API_KEY", "benchmark")
+    os.environ["SCORING_CONCURRENCY"] = str(concurrency)
+    os.environ["SCORING_BATCH_TOKENS"] = str(batch_tokens)
+    # The prompt parser would answer without the fake extract call and its limit
+    os.environ["PROMPT_FAST_PATH"] = "off"
+    logging.disable(logging.ERROR)
+    with tempfile.TemporaryDirectory(prefix="bench_workflow_") as workdir:
+        os.chdir(workdir)
+        os.makedirs("data/cache")
+        import instrumentation
+        import main
+
+        fakes = FakeBackends(
+            num_postings=num_postings, duplicate_rate=duplicate_rate, profiles=scaled_profiles(scale, error_rate)
+        )
+        with fakes.install(), contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            main.run_workflow(RESUME, "Data scientist jobs in Austin")
+            elapsed = time.perf_counter() - start
+    return {
+        "wall_s": elapsed,
+        "latencies": fakes.latencies,
+        "fetched": fakes.fetched,
+        "scored": fakes.scored,
+        "batch_splits": instrumentation.batch_splits(),
+        # ru_maxrss is in kilobytes on Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def run_benchmark(
+    sizes: List[int], scale: float, error_rate: float, duplicate_rate: float, concurrency: int, batch_tokens: int = 0
+) -> None:
+    print(
+        f"latency scale {scale}, score error rate {error_rate}, duplicate rate {duplicate_rate}, "
+        f"concurrency {concurrency}, batch tokens {batch_tokens}"
+    )
+    header = f"{'postings':>9} {'scored':>7} {'wall (s)':>9} {'jobs/s':>8} {'RSS (MB)':>9} {'splits':>6}"
+    for stage in STAGES:
+        header += f" {stage + ' p50/p95 (ms)':>24}"
+    print(header)
+    ctx = multiprocessing.get_context("spawn")
+    for n in sizes:
+        with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+            result = pool.submit(run_once, n, scale, error_rate, duplicate_rate, concurrency, batch_tokens).result()
+        splits = result["batch_splits"]
+        assert not splits.get("mismatch"), f"{splits['mismatch']} fake batches were rejected as malformed"
+        assert result["fetched"] == n, f"asked for {n} postings, the fake fetch returned {result['fetched']}"
+        row = f"{result['fetched']:>9} {result['scored']:>7} {result['wall_s']:>9.2f}"
+        row += f" {result['fetched'] / result['wall_s']:>8.1f} {result['peak_rss_mb']:>9.1f}"
+        row += f" {sum(splits.values()):>6}"
+        for stage in STAGES:
+            latencies = np.asarray(result["latencies"].get(stage, [])) * 1000
+            cell = f"{np.percentile(latencies, 50):.0f}/{np.percentile(latencies, 95):.0f}" if latencies.size else "-"
+            row += f" {cell:>24}"
+        print(row)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the full workflow against fake backends")
+    parser.add_argument("-n", "--num_postings", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("-s", "--scale", type=float, default=0.1, help="Multiplier on the default fake latencies")
+    parser.add_argument("-e", "--error_rate", type=float, default=0.01, help="Fraction of scoring calls that fail")
+    parser.add_argument("-d", "--duplicate_rate", type=float, default=0.0, help="Fraction of postings that are reposts")
+    parser.add_argument("-c", "--concurrency", type=int, default=8)
+    parser.add_argument("-b", "--batch_tokens", type=int, default=0, help="Prompt token budget per multi-job request, 0 for one job per request")
+    args = parser.parse_args()
+    run_benchmark(args.num_postings, args.scale, args.error_rate, args.duplicate_rate, args.concurrency, args.batch_tokens)
@@ -0,0 +1,205 @@
+"""
+Fake LLM and job-board backends for benchmarking the workflow without OpenAI or Apify.
+
+FakeBackends implements the same functions as scoring.oa_models and job_boards.apify,
+with a latency distribution and error rate per stage, and records how long every call
+took. install() registers them as the scoring backend and patches the fetch functions into
+main, and into server when it is loaded.
+"""
+import asyncio
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass, field
+import random
+import sys
+import time
+import zlib
+from typing import AsyncIterator, Dict, Iterator, List, Optional
+from unittest import mock
+
+from benchmarks.bench_prefilter import synthetic_jobs
+from datamodels.models import BatchJDScore, BatchJDScores, JDScore, JobInfo, SearchExtract, WorkflowReqs
+
+
+class FakeBackendError(RuntimeError):
+    """Raised by a fake call that was chosen to fail."""
+
+
+@dataclass
+class StageProfile:
+    """
+    Latency and failure behaviour of one fake stage.
+
+    Latencies are log-normal around median seconds; sigma 0 gives a fixed latency.
+    """
+    median: float
+    sigma: float = 0.0
+    error_rate: float = 0.0
+
+
+DEFAULT_PROFILES = {
+    "gate": StageProfile(median=0.5, sigma=0.2),
+    "extract": StageProfile(median=0.8, sigma=0.2),
+    "fetch": StageProfile(median=2.0, sigma=0.1),
+    "score": StageProfile(median=0.05, sigma=0.5, error_rate=0.01),
+    "gaps": StageProfile(median=1.0, sigma=0.2),
+}
+
+
+def scaled_profiles(scale: float, error_rate: float = 0.01) -> Dict[str, StageProfile]:
+    """Returns DEFAULT_PROFILES with every latency multiplied by scale and the given score error rate."""
+    profiles = {k: StageProfile(v.median * scale, v.sigma, v.error_rate) for k, v in DEFAULT_PROFILES.items()}
+    profiles["score"].error_rate = error_rate
+    return profiles
+
+
+@dataclass
+class FakeBackends:
+    """
+    Stand-ins for the LLM and job-board calls made by main.run_workflow.
+
+    Attributes:
+        num_postings (int): Postings returned by fetch_posts.
+        words (int): Words per synthetic job description.
+        duplicate_rate (float): Fraction of fetched postings that are reposts of an earlier posting.
+        profiles (Dict[str, StageProfile]): Behaviour of the gate, extract, fetch, score and gaps stages.
+        latencies (Dict[str, List[float]]): Measured seconds of every call, by stage.
+        fetched (int): Postings returned by the fetch calls so far.
+        scored (int): Job descriptions scored so far, alone or in a batch.
+    """
+    model = "fake"
+    SCORE_PROMPT_VERSION = "fake"
+    BATCH_SCORE_PROMPT_VERSION = "fake-batch"
+
+    num_postings: int = 100
+    words: int = 400
+    duplicate_rate: float = 0.0
+    profiles: Dict[str, StageProfile] = field(default_factory=lambda: dict(DEFAULT_PROFILES))
+    seed: int = 0
+    latencies: Dict[str, List[float]] = field(default_factory=dict)
+    fetched: int = 0
+    scored: int = 0
+
+    def __post_init__(self):
+        self._rng = random.Random(self.seed)
+
+    def _delay(self, stage: str) -> float:
+        profile = self.profiles[stage]
+        if self._rng.random() < profile.error_rate:
+            raise FakeBackendError(f"Injected {stage} failure")
+        return profile.median * self._rng.lognormvariate(0, profile.sigma) if profile.sigma else profile.median
+
+    def _record(self, stage: str, start: float) -> None:
+        self.latencies.setdefault(stage, []).append(time.perf_counter() - start)
+
+    @contextmanager
+    def _timed(self, stage: str) -> Iterator[float]:
+        start = time.perf_counter()
+        try:
+            yield self._delay(stage)
+        finally:
+            self._record(stage, start)
+
+    def check_search_prompt(self, prompt: str) -> SearchExtract:
+        with self._timed("gate") as delay:
+            time.sleep(delay)
+        return SearchExtract(is_valid=True, confidence=0.95, rationale="fake")
+
+    def extract_reqs(self, prompt: str) -> WorkflowReqs:
+        with self._timed("extract") as delay:
+            time.sleep(delay)
+        return WorkflowReqs(resume=None, keywords="Data Scientist", city="Austin", limit=self.num_postings)
+
+    async def async_check_search_prompt(self, prompt: str) -> SearchExtract:
+        with self._timed("gate") as delay:
+            await asyncio.sleep(delay)
+        return SearchExtract(is_valid=True, confidence=0.95, rationale="fake")
+
+    async def async_extract_reqs(self, prompt: str) -> WorkflowReqs:
+        with self._timed("extract") as delay:
+            await asyncio.sleep(delay)
+        return WorkflowReqs(resume=None, keywords="Data Scientist", city="Austin", limit=self.num_postings)
+
+    def _postings(self, limit: int) -> List[JobInfo]:
+        jobs = synthetic_jobs(limit, self.words, seed=self.seed)
+        for i, job in enumerate(jobs):
+            if i and self._rng.random() < self.duplicate_rate:
+                job.description = jobs[self._rng.randrange(i)].description
+        self.fetched += len(jobs)
+        return jobs
+
+    def fetch_posts(self, search_data: WorkflowReqs, date_posted: str = "week") -> List[JobInfo]:
+        with self._timed("fetch") as delay:
+            time.sleep(delay)
+        return self._postings(search_data.limit)
+
+    def fetch_posts_multi(self, queries: List[WorkflowReqs], max_concurrency=None, date_posted: str = "week") -> List[JobInfo]:
+        return self.fetch_posts(queries[0])
+
+    async def stream_posts(self, search_data: WorkflowReqs, page_size=10, poll_interval=2.0) -> AsyncIterator[JobInfo]:
+        with self._timed("fetch") as delay:
+            await asyncio.sleep(delay)
+        for job in self._postings(search_data.limit):
+            yield job
+
+    async def stream_posts_multi(self, queries: List[WorkflowReqs], max_concurrency=None) -> AsyncIterator[JobInfo]:
+        async for job in self.stream_posts(queries[0]):
+            yield job
+
+    def _score(self, job_description: str, model_name: Optional[str] = None) -> JDScore:
+        self.scored += 1
+        score = zlib.crc32(job_description.encode()) % 11
+        # Another model disagrees by up to a point, the same way every time
+        if model_name is not None and model_name != self.model:
+            score = min(10, max(0, score + zlib.crc32(f"{model_name}{job_description}".encode()) % 3 - 1))
+        return JDScore(score=score, explanation="fake explanation")
+
+    def score_resume(self, resume_text: str, job_description: str) -> JDScore:
+        try:
+            with self._timed("score") as delay:
+                time.sleep(delay)
+        except FakeBackendError:
+            return JDScore(score=-1, explanation="Comparison failed")
+        return self._score(job_description)
+
+    async def async_score_resume(self, resume_text: str, job_description: str, model_name: Optional[str] = None) -> JDScore:
+        with self._timed("score") as delay:
+            await asyncio.sleep(delay)
+        return self._score(job_description, model_name)
+
+    async def async_score_resume_batch(self, resume_text: str, job_descriptions: List[str]) -> BatchJDScores:
+        with self._timed("score") as delay:
+            await asyncio.sleep(delay)
+        return BatchJDScores(scores=[
+            BatchJDScore(job_index=i, **self._score(jd).model_dump()) for i, jd in enumerate(job_descriptions)
+        ])
+
+    def summarize_gaps(self, explanations: List[str]) -> str:
+        with self._timed("gaps") as delay:
+            time.sleep(delay)
+        return f"Fake gap summary of {len(explanations)} explanations"
+
+    async def async_summarize_gaps(self, explanations: List[str]) -> str:
+        with self._timed("gaps") as delay:
+            await asyncio.sleep(delay)
+        return f"Fake gap summary of {len(explanations)} explanations"
+
+    async def async_merge_gap_summaries(self, summaries: List[str]) -> str:
+        with self._timed("gaps") as delay:
+            await asyncio.sleep(delay)
+        return f"Fake merge of {len(summaries)} gap summaries"
+
+    @contextmanager
+    def install(self) -> Iterator["FakeBackends"]:
+        """Registers the fakes as the active scoring backend and patches the fetch functions into main and server."""
+        import main
+        from config import AI_BACKEND
+        from scoring import backends
+
+        modules = [main] + ([sys.modules["server"]] if "server" in sys.modules else [])
+        with ExitStack() as stack:
+            stack.enter_context(mock.patch.dict(backends.BACKENDS, {AI_BACKEND: self}))
+            for module in modules:
+                for name in ("fetch_posts", "fetch_posts_multi", "stream_posts", "stream_posts_multi"):
+                    if hasattr(module, name):
+                        stack.enter_context(mock.patch.object(module, name, getattr(self, name)))
+            yield self
@@ -16,10 +16,92 @@ load_dotenv()
 AI_BACKEND = os.getenv("AI_BACKEND", "openai").lower()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 APIFY_API_KEY = os.getenv("APIFY_API_KEY")
+# Job board fetch cache: "off", "ttl" (reuse results younger than FETCH_CACHE_TTL_HOURS),
+# "record" (always fetch and save) or "replay" (only serve saved results, fully offline)
+FETCH_CACHE_MODE = os.getenv("FETCH_CACHE_MODE", "ttl").lower()
+FETCH_CACHE_TTL_HOURS = float(os.getenv("FETCH_CACHE_TTL_HOURS", "1"))
+# Parse common prompt shapes ("Data Scientist jobs in Austin, limit 50") locally instead of with the LLM
+PROMPT_FAST_PATH = os.getenv("PROMPT_FAST_PATH", "on").lower() not in ("off", "0", "false")
+# Maximum number of Apify actor runs and dataset requests in flight at once
+APIFY_CONCURRENCY = int(os.getenv("APIFY_CONCURRENCY", "4"))
+# Ollama throughput mode: pin the model in memory, load it at startup, size the context window of
+# every request to its prompt, and keep as many scoring requests in flight as the server has slots
+OLLAMA_THROUGHPUT = AI_BACKEND == "ollama" and os.getenv("OLLAMA_THROUGHPUT", "off").lower() in ("on", "1", "true")
+# Parallel request slots of the Ollama server, i.e. the server's own OLLAMA_NUM_PARALLEL
+OLLAMA_NUM_PARALLEL = int(os.getenv("OLLAMA_NUM_PARALLEL", "4"))
+# Ollama servers to spread requests over, as comma-separated URLs; empty uses the one server at OLLAMA_HOST.
+# Every host should have the same slots and the same models pulled.
+OLLAMA_HOSTS = [x.strip() for x in os.getenv("OLLAMA_HOSTS", "").split(",") if x.strip()]
+# A pooled request slower than this is abandoned and sent to another host
+OLLAMA_REQUEST_TIMEOUT_S = float(os.getenv("OLLAMA_REQUEST_TIMEOUT_S", "300"))
+# Seconds between health checks of the pooled hosts, and a failed host's pause before it gets requests again
+OLLAMA_HEALTH_INTERVAL_S = float(os.getenv("OLLAMA_HEALTH_INTERVAL_S", "15"))
+OLLAMA_HOST_COOLDOWN_S = float(os.getenv("OLLAMA_HOST_COOLDOWN_S", "30"))
+# Bounds of the per-request context window (num_ctx) in throughput mode
+OLLAMA_MIN_CTX = int(os.getenv("OLLAMA_MIN_CTX", "4096"))
+OLLAMA_MAX_CTX = int(os.getenv("OLLAMA_MAX_CTX", "32768"))
+# Maximum number of scoring requests in flight at once
+SCORING_CONCURRENCY = int(os.getenv(
+    "SCORING_CONCURRENCY", str(OLLAMA_NUM_PARALLEL * max(1, len(OLLAMA_HOSTS))) if OLLAMA_THROUGHPUT else "8"
+))
+# Prompt token budget per multi-job scoring request, 0 scores one job per request
+SCORING_BATCH_TOKENS = int(os.getenv("SCORING_BATCH_TOKENS", "0"))
+# Prompt token budget per gap summarization request; larger result sets are summarized map-reduce style.
+# The default Ollama context window is small, so its budget is too.
+GAP_CHUNK_TOKENS = int(os.getenv("GAP_CHUNK_TOKENS", "1500" if AI_BACKEND == "ollama" else "8000"))
+# Cascade scoring (--cascade): every job is scored by the small model, and jobs it scores within
+# [CASCADE_ESCALATE_MIN, CASCADE_ESCALATE_MAX] are scored again by the large model
+CASCADE_SMALL_MODEL = os.getenv("CASCADE_SMALL_MODEL", "gemma3:1b" if AI_BACKEND == "ollama" else "gpt-4.1-nano-2025-04-14")
+CASCADE_LARGE_MODEL = os.getenv("CASCADE_LARGE_MODEL", "gemma3:12b" if AI_BACKEND == "ollama" else "gpt-4.1-2025-04-14")
+CASCADE_ESCALATE_MIN = float(os.getenv("CASCADE_ESCALATE_MIN", "5"))
+CASCADE_ESCALATE_MAX = float(os.getenv("CASCADE_ESCALATE_MAX", "8"))
+# How long Ollama keeps the model, and with it the KV cache of the shared prompt prefix, loaded.
+# A bare number is seconds; a negative one keeps it loaded until the server stops.
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "-1" if OLLAMA_THROUGHPUT else "30m")
+# Client-side limits shared by every LLM request of the process, 0 for unlimited. The OpenAI defaults
+# sit under the lower usage tiers; a local Ollama server needs none.
+LLM_REQUESTS_PER_MIN = float(os.getenv("LLM_REQUESTS_PER_MIN", "0" if AI_BACKEND == "ollama" else "500"))
+LLM_TOKENS_PER_MIN = float(os.getenv("LLM_TOKENS_PER_MIN", "0" if AI_BACKEND == "ollama" else "200000"))
+# Retries of a rate-limited, overloaded or dropped request before it counts as failed
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "5"))
+# Consecutive transient failures that pause all LLM requests, and the first pause in seconds, 0 disables
+CIRCUIT_BREAKER_FAILURES = int(os.getenv("CIRCUIT_BREAKER_FAILURES", "5"))
+CIRCUIT_BREAKER_COOLDOWN_S = float(os.getenv("CIRCUIT_BREAKER_COOLDOWN_S", "30"))
+# Persistent cache of scores across runs
+SCORE_CACHE_ENABLED = os.getenv("SCORE_CACHE", "on").lower() not in ("off", "0", "false")
+SCORE_CACHE_MAX_ENTRIES = int(os.getenv("SCORE_CACHE_MAX_ENTRIES", "50000"))
+SCORE_CACHE_MAX_AGE_DAYS = float(os.getenv("SCORE_CACHE_MAX_AGE_DAYS", "30"))
+# Bulk scoring through the OpenAI Batch API (--bulk): seconds between status checks of a submitted
+# batch, and the completion window requested
+BATCH_POLL_INTERVAL_S = float(os.getenv("BATCH_POLL_INTERVAL_S", "60"))
+BATCH_COMPLETION_WINDOW = os.getenv("BATCH_COMPLETION_WINDOW", "24h")
+# Per-run metrics export: "" (off), "prometheus" (textfile collector format) or "jsonl"
+METRICS_EXPORT = os.getenv("METRICS_EXPORT", "").lower()
+METRICS_PATH = os.getenv("METRICS_PATH")
 
-if AI_BACKEND == "openai" and not OPENAI_API_KEY:
-    raise ValueError("OPENAI_API_KEY environment variable not set, but OpenAI backend selected.")
-if not APIFY_API_KEY:
-    raise ValueError("APIFY_API_KEY environment variable not set.")
+if FETCH_CACHE_MODE not in ("off", "ttl", "record", "replay"):
+    raise ValueError(f"Unknown FETCH_CACHE_MODE: {FETCH_CACHE_MODE}. Must be 'off', 'ttl', 'record' or 'replay'.")
+if METRICS_EXPORT not in ("", "prometheus", "jsonl"):
+    raise ValueError(f"Unknown METRICS_EXPORT: {METRICS_EXPORT}. Must be empty, 'prometheus' or 'jsonl'.")
+if CASCADE_ESCALATE_MIN > CASCADE_ESCALATE_MAX:
+    raise ValueError("CASCADE_ESCALATE_MIN must not be above CASCADE_ESCALATE_MAX.")
+if OLLAMA_MIN_CTX > OLLAMA_MAX_CTX:
+    raise ValueError("OLLAMA_MIN_CTX must not be above OLLAMA_MAX_CTX.")
+if SCORING_CONCURRENCY < 1:
+    raise ValueError("SCORING_CONCURRENCY must be at least 1.")
 
-logger.info(f"Using AI backend: {AI_BACKEND}")
\ No newline at end of file
+logger.info(f"Using AI backend: {AI_BACKEND}")
+
+
+# Credentials are checked when a client is first created, not at import time, so commands
+# that never reach a provider (--help, cache maintenance, replayed fetches) need no keys.
+def require_openai_key() -> str:
+    if not OPENAI_API_KEY:
+        raise ValueError("OPENAI_API_KEY environment variable not set, but OpenAI backend selected.")
+    return OPENAI_API_KEY
+
+
+def require_apify_key() -> str:
+    if not APIFY_API_KEY:
+        raise ValueError("APIFY_API_KEY environment variable not set.")
+    return APIFY_API_KEY
\ No newline at end of file
@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import List, Optional
 from pydantic import BaseModel, Field
 
 
@@ -9,8 +9,8 @@ class SearchExtract(BaseModel):
 
 class WorkflowReqs(BaseModel):
     resume: Optional[str] = Field(description="The plain text of a resume")
-    keywords: str = Field(description="The job title")
-    city: str = Field(description="The city where the job is located. DO NOT include the state")
+    keywords: str = Field(description="The job title. Separate alternative job titles with ' OR '")
+    city: str = Field(description="The city where the job is located. DO NOT include the state. Separate multiple cities with '; '")
     limit: Optional[int] = Field(description="The maximum number of items to return", default=20)
     hybrid: Optional[bool] = Field(description="Whether to apply a hybrid job-only filter", default=False)
 
@@ -25,5 +25,37 @@ class JobInfo(BaseModel):
     work_type: Optional[str] = Field(description="OnSite/Remote/Hybrid status", default="Remote")
     posted_at: str = Field(description="Posting date")
     score: Optional[float] = Field(description="Assigned score by LLM", default=0)
-    explanation: Optional[str] = Field(description="Short explanation as to why the score was given", default="None") 
+    explanation: Optional[str] = Field(description="Short explanation as to why the score was given", default="None")
+    duplicate_of: Optional[str] = Field(description="job_url of the posting this one duplicates, whose score it shares", default=None)
+    prefilter_score: Optional[float] = Field(description="Lexical similarity to the resume, relative to the best posting in the run", default=None)
 
+class JDScore(BaseModel):
+    """Score of a single job description against a resume"""
+    score: float = Field(description="Resume suitability score")
+    explanation: str = Field(description="Explanation of suitability score")
+
+class BatchJDScore(BaseModel):
+    """Score of one job description within a batched scoring request"""
+    job_index: int = Field(description="The number of the job description being scored")
+    score: float = Field(description="Resume suitability score")
+    explanation: str = Field(description="Explanation of suitability score")
+
+class BatchJDScores(BaseModel):
+    scores: List[BatchJDScore] = Field(description="One score per job description, in the order given")
+
+class LLMCallUsage(BaseModel):
+    """Usage and timing reported for a single LLM request"""
+    backend: str = Field(description="The AI backend that served the request")
+    model: str = Field(description="The model name")
+    stage: str = Field(description="The workflow stage that made the request")
+    latency: float = Field(description="Wall-clock seconds for the request")
+    prompt_tokens: int = Field(description="Prompt tokens, including cached ones if the backend reports them", default=0)
+    completion_tokens: int = Field(description="Completion tokens", default=0)
+    cached_tokens: Optional[int] = Field(description="Prompt tokens served from the provider's prefix cache, None if the backend does not report them", default=0)
+    prefill_seconds: Optional[float] = Field(description="Seconds spent evaluating the uncached prompt, if reported", default=None)
+
+class StageSpan(BaseModel):
+    """Wall-clock timing of one workflow stage"""
+    stage: str = Field(description="The workflow stage")
+    started_at: float = Field(description="Unix time the stage started")
+    duration: float = Field(description="Wall-clock seconds spent in the stage")
@@ -1,13 +1,17 @@
 import argparse
+import asyncio
 from datetime import datetime, timezone
 import json
 import logging
 from pathlib import Path
-from pprint import pprint
-from typing import List
+from typing import Any, Dict, List, Optional
 
-from datamodels.models import JobInfo
-from scoring.oa_models import score_resume
+import numpy as np
+
+from config import AI_BACKEND, SCORING_CONCURRENCY
+from datamodels.models import JDScore, JobInfo
+from run_history import load_jobs
+from scoring.backends import get_backend
 
 logging.basicConfig(
     level=logging.INFO,
@@ -19,43 +23,204 @@ logger = logging.getLogger(__name__)
 CACHE_DIR = Path.cwd() / "data/cache"
 CACHE_DIR.mkdir(exist_ok=True)
 
-def run_eval(resume: str, jobs_formatted: List[JobInfo], num_iter=5):
-    dt_string = datetime.now(timezone.utc).strftime(format="%Y%m%d-%H%M%S")
-    all_outputs = []
-    for i, job in enumerate(jobs_formatted):
-        result_dict = {
-            "original_score": job.score,
-            "original_explanation": job.explanation,
-            "new_scores": [],
-            "new_explanations": [],
-        }
-        for _ in range(num_iter):
-            output = score_resume(resume_text=resume, job_description=job.description)
+
+async def _sample(resume: str, job: JobInfo, semaphore: asyncio.Semaphore, model_name: Optional[str]) -> JDScore:
+    async with semaphore:
+        try:
+            return await get_backend().async_score_resume(resume, job.description, model_name=model_name)
+        except Exception as e:
+            logger.error(f"Failed to score {job.job_url}: {e}")
+            return JDScore(score=-1, explanation="Comparison failed")
+
+
+def _converged(scores: List[float], tolerance: float) -> bool:
+    # Standard error of the mean score is within tolerance
+    return np.std(scores, ddof=1) / np.sqrt(len(scores)) <= tolerance
+
+
+async def _eval_job(
+    resume: str,
+    job: JobInfo,
+    semaphore: asyncio.Semaphore,
+    num_iter: int,
+    min_iter: int,
+    tolerance: float,
+    model_name: Optional[str] = None,
+) -> Dict[str, Any]:
+    result_dict = {
+        "job_url": job.job_url,
+        "company": job.company,
+        "job_title": job.job_title,
+        "description": job.description,
+        "original_score": job.score,
+        "original_explanation": job.explanation,
+        "new_scores": [],
+        "new_explanations": [],
+        "failures": 0,
+    }
+    wave = min(min_iter, num_iter)
+    attempts = 0
+    while attempts < num_iter:
+        outputs = await asyncio.gather(*[_sample(resume, job, semaphore, model_name) for _ in range(wave)])
+        attempts += wave
+        for output in outputs:
+            if output.score < 0:
+                result_dict["failures"] += 1
+                continue
             result_dict["new_scores"].append(output.score)
             result_dict["new_explanations"].append(output.explanation)
-        print("")
-        print(f"Result {i}")
-        pprint(result_dict)
-        all_outputs.append(result_dict)
+        scores = result_dict["new_scores"]
+        if len(scores) >= max(min_iter, 2) and _converged(scores, tolerance):
+            break
+        wave = 1
+    return result_dict
+
+
+def _job_stats(result_dict: Dict[str, Any]) -> Dict[str, float]:
+    scores = np.asarray(result_dict["new_scores"], dtype=float)
+    if scores.size == 0:
+        return {"n": 0, "mean": float("nan"), "std": float("nan"), "drift": float("nan")}
+    mean = scores.mean()
+    return {
+        "n": int(scores.size),
+        "mean": round(float(mean), 3),
+        "std": round(float(scores.std(ddof=1)) if scores.size > 1 else 0.0, 3),
+        "drift": round(float(mean - result_dict["original_score"]), 3),
+    }
+
+
+def summarize(all_outputs: List[Dict[str, Any]], num_iter: int) -> Dict[str, float]:
+    """
+    Aggregates per-job statistics into run-level stability numbers.
+
+    Args:
+        all_outputs (List[Dict[str, Any]]): Per-job results, each with a "stats" entry.
+        num_iter (int): The maximum number of samples per job.
+
+    Returns:
+        Dict[str, float]: Mean std, mean and max absolute drift from the original score,
+            samples taken and the fraction of the full grid they represent.
+    """
+    stats = [x["stats"] for x in all_outputs if x["stats"]["n"] > 0]
+    stds = np.array([x["std"] for x in stats])
+    drifts = np.abs(np.array([x["drift"] for x in stats]))
+    samples = sum(x["stats"]["n"] + x["failures"] for x in all_outputs)
+    return {
+        "jobs": len(all_outputs),
+        "jobs_scored": len(stats),
+        "mean_std": round(float(stds.mean()), 3) if stds.size else float("nan"),
+        "mean_abs_drift": round(float(drifts.mean()), 3) if drifts.size else float("nan"),
+        "max_abs_drift": round(float(drifts.max()), 3) if drifts.size else float("nan"),
+        "samples": samples,
+        "grid_fraction": round(samples / (len(all_outputs) * num_iter), 3) if all_outputs else 0.0,
+    }
+
+
+def print_table(all_outputs: List[Dict[str, Any]], summary: Dict[str, float]) -> None:
+    print("")
+    print(f"{'#':>3} {'company':<20} {'job title':<28} {'orig':>5} {'mean':>5} {'std':>5} {'n':>3} {'drift':>6}")
+    for i, x in enumerate(all_outputs):
+        s = x["stats"]
+        print(
+            f"{i:>3} {x['company'][:20]:<20} {x['job_title'][:28]:<28} {x['original_score']:>5.1f} "
+            f"{s['mean']:>5.1f} {s['std']:>5.2f} {s['n']:>3} {s['drift']:>+6.2f}"
+        )
+    print("")
+    print(
+        f"{summary['jobs_scored']}/{summary['jobs']} jobs scored, mean std {summary['mean_std']}, "
+        f"mean |drift| {summary['mean_abs_drift']}, max |drift| {summary['max_abs_drift']}, "
+        f"{summary['samples']} samples ({summary['grid_fraction']:.0%} of the full grid)"
+    )
+
+
+async def _run_eval(
+    resume: str,
+    jobs_formatted: List[JobInfo],
+    num_iter: int,
+    min_iter: int,
+    tolerance: float,
+    max_concurrency: int,
+    model_name: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    semaphore = asyncio.Semaphore(max_concurrency)
+    return await asyncio.gather(*[
+        _eval_job(resume, job, semaphore, num_iter, min_iter, tolerance, model_name) for job in jobs_formatted
+    ])
+
+
+def run_eval(
+    resume: str,
+    jobs_formatted: List[JobInfo],
+    num_iter=5,
+    min_iter=3,
+    tolerance=0.25,
+    max_concurrency=SCORING_CONCURRENCY,
+    model_name: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Re-scores cached jobs several times to measure how stable the LLM scores are.
+
+    All jobs are sampled concurrently. Each job starts with min_iter samples and then adds one
+    sample at a time until the standard error of its mean score is within tolerance or num_iter
+    samples have been taken. Per-job mean, std and drift from the original score are written,
+    with a run summary, to a timestamped eval_results file.
+
+    Args:
+        resume (str): The plain text content of the candidate's resume.
+        jobs_formatted (List[JobInfo]): The cached jobs to re-score.
+        num_iter (int, optional): Maximum samples per job. Defaults to 5.
+        min_iter (int, optional): Samples per job before checking convergence. Defaults to 3.
+        tolerance (float, optional): Standard error, in score points, at which sampling stops. Defaults to 0.25.
+        max_concurrency (int, optional): Concurrent request limit. Defaults to SCORING_CONCURRENCY.
+        model_name (str, optional): Score with this model instead of the backend's, e.g. the large
+            cascade model for a baseline. Defaults to None.
+
+    Returns:
+        Dict[str, Any]: The eval results as written to disk.
+    """
+    dt_string = datetime.now(timezone.utc).strftime(format="%Y%m%d-%H%M%S")
+    all_outputs = asyncio.run(
+        _run_eval(resume, jobs_formatted, num_iter, min_iter, tolerance, max_concurrency, model_name)
+    )
+    for result_dict in all_outputs:
+        result_dict["stats"] = _job_stats(result_dict)
+    summary = summarize(all_outputs, num_iter)
+    print_table(all_outputs, summary)
+
+    results = {
+        "eval_date": dt_string,
+        "backend": AI_BACKEND,
+        "model": model_name or get_backend().model,
+        "num_iter": num_iter,
+        "min_iter": min_iter,
+        "tolerance": tolerance,
+        "summary": summary,
+        "jobs": all_outputs,
+    }
     output_file = CACHE_DIR / f"eval_results_{dt_string}.json"
+    logger.info(f"Saving eval results to {output_file}")
     with open(output_file, "w") as f:
-        json.dump(all_outputs, f, indent=4)
-    
-
+        json.dump(results, f, indent=4)
+    return results
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="LLM based job searches given a prompt")
     parser.add_argument("-r", "--resume_path", type=Path, help="Path to local resume, currently only .txt format", required=True)
-    parser.add_argument("-c", "--cache_path", type=Path, help="The cache to test against", required=True)
-    parser.add_argument("-n", "--num_iters", type=int, default=5)
+    parser.add_argument("-c", "--cache_path", type=str, default="latest", help="The run to test against: a run_id from the run history, 'latest', or a jobs_*.json file")
+    parser.add_argument("-n", "--num_iters", type=int, default=5, help="Maximum samples per job")
+    parser.add_argument("-m", "--min_iters", type=int, default=3, help="Samples per job before checking convergence")
+    parser.add_argument("-t", "--tolerance", type=float, default=0.25, help="Stop sampling a job once the standard error of its mean score is below this")
+    parser.add_argument("--concurrency", type=int, default=SCORING_CONCURRENCY)
+    parser.add_argument("--model", type=str, help="Score with this model instead of the backend's, e.g. CASCADE_LARGE_MODEL for a cascade baseline")
     args = parser.parse_args()
 
     logger.info(f"Reading resume from {args.resume_path}")
     with open(args.resume_path) as f:
         resume = f.read()
-    with open(args.cache_path) as f:
-        cache_data = json.load(f)
-    jobs_formatted = [JobInfo.model_validate(x) for x in cache_data["jobs"]]
+    jobs_formatted = load_jobs(args.cache_path)
 
-    run_eval(resume, jobs_formatted, num_iter=args.num_iters)
+    run_eval(
+        resume, jobs_formatted, num_iter=args.num_iters, min_iter=args.min_iters,
+        tolerance=args.tolerance, max_concurrency=args.concurrency, model_name=args.model,
+    )
@@ -0,0 +1,353 @@
+from contextlib import contextmanager
+import json
+import logging
+import os
+from pathlib import Path
+import threading
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from config import METRICS_EXPORT, METRICS_PATH
+from datamodels.models import LLMCallUsage, StageSpan
+
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+logger = logging.getLogger(__name__)
+
+DEFAULT_METRICS_PATHS = {
+    "prometheus": Path.cwd() / "data/metrics/jobsearch.prom",
+    "jsonl": Path.cwd() / "data/metrics/runs.jsonl",
+}
+
+# USD per million tokens: (prompt, cached prompt, completion). Local Ollama models cost nothing.
+MODEL_PRICES = {
+    "gpt-4.1-2025-04-14": (2.00, 0.50, 8.00),
+    "gpt-4.1-mini-2025-04-14": (0.40, 0.10, 1.60),
+    "gpt-4.1-nano-2025-04-14": (0.10, 0.025, 0.40),
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+}
+# Requests sent through the Batch API (stage "batch_score") are billed at half price
+BATCH_STAGE = "batch_score"
+BATCH_PRICE_FACTOR = 0.5
+
+_lock = threading.Lock()
+_calls: List[LLMCallUsage] = []
+_spans: List[StageSpan] = []
+# Per stage, how LLM requests ended: "ok" first time, "retried_ok" after retries, or "failed"
+# for good, plus the total number of "retries" spent
+_outcomes: Dict[str, Dict[str, int]] = {}
+# Multi-job scoring requests split in half and retried, by reason: "mismatch" when the response
+# did not score every job exactly once, "error" when the request itself failed
+_batch_splits: Dict[str, int] = {}
+# Per pooled LLM host: requests served, failed and redirected elsewhere, completion tokens,
+# summed request seconds and the span of time it was busy
+_hosts: Dict[str, Dict[str, float]] = {}
+
+
+def record_llm_call(**kwargs) -> None:
+    """Records the usage of one LLM request. Keyword arguments are the fields of LLMCallUsage."""
+    call = LLMCallUsage(**kwargs)
+    with _lock:
+        _calls.append(call)
+
+
+def record_request_outcome(stage: str, outcome: str, retries: int = 0) -> None:
+    """Counts how one LLM request ended: "ok", "retried_ok" or "failed", after retries retries."""
+    with _lock:
+        counts = _outcomes.setdefault(stage, {"ok": 0, "retried_ok": 0, "failed": 0, "retries": 0})
+        counts[outcome] += 1
+        counts["retries"] += retries
+
+
+def record_batch_split(reason: str) -> None:
+    """Counts a multi-job scoring request that was split and retried, because of a "mismatch" or an "error"."""
+    with _lock:
+        _batch_splits[reason] = _batch_splits.get(reason, 0) + 1
+
+
+def batch_splits() -> Dict[str, int]:
+    with _lock:
+        return dict(_batch_splits)
+
+
+def record_host_request(host: str, ok: bool, latency: float, completion_tokens: int = 0) -> None:
+    """Counts one request to a pooled host, which either answered or failed and was sent elsewhere."""
+    now = time.time()
+    with _lock:
+        stats = _hosts.setdefault(host, {
+            "requests": 0, "failed": 0, "completion_tokens": 0, "latency_s": 0.0, "first_at": now - latency, "last_at": now,
+        })
+        stats["requests" if ok else "failed"] += 1
+        stats["completion_tokens"] += completion_tokens
+        stats["latency_s"] += latency
+        stats["first_at"] = min(stats["first_at"], now - latency)
+        stats["last_at"] = now
+
+
+def host_stats() -> Dict[str, Dict[str, float]]:
+    """
+    Per pooled host: requests answered and failed, completion tokens, and its throughput in
+    requests per minute and completion tokens per second over the time it was busy.
+    """
+    with _lock:
+        hosts = {host: dict(stats) for host, stats in _hosts.items()}
+    total = sum(x["requests"] for x in hosts.values())
+    report = {}
+    for host, stats in hosts.items():
+        busy = max(stats["last_at"] - stats["first_at"], 1e-9)
+        report[host] = {
+            "requests": stats["requests"],
+            "failed": stats["failed"],
+            "share": round(stats["requests"] / total, 3) if total else 0.0,
+            "completion_tokens": stats["completion_tokens"],
+            "latency_s": round(stats["latency_s"], 3),
+            "requests_per_min": round(stats["requests"] / busy * 60, 2),
+            "tokens_per_s": round(stats["completion_tokens"] / busy, 2),
+        }
+    return report
+
+
+def request_outcomes() -> Dict[str, Dict[str, int]]:
+    with _lock:
+        return {stage: dict(counts) for stage, counts in _outcomes.items()}
+
+
+def llm_calls(stage: Optional[str] = None) -> List[LLMCallUsage]:
+    with _lock:
+        return [x for x in _calls if stage is None or x.stage == stage]
+
+
+def stage_spans() -> List[StageSpan]:
+    with _lock:
+        return list(_spans)
+
+
+def reset() -> None:
+    with _lock:
+        _calls.clear()
+        _spans.clear()
+        _outcomes.clear()
+        _batch_splits.clear()
+        _hosts.clear()
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """Times the enclosed block as one workflow stage, also when it raises."""
+    started_at = time.time()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_span = StageSpan(stage=stage, started_at=started_at, duration=time.perf_counter() - start)
+        with _lock:
+            _spans.append(stage_span)
+
+
+def estimate_cost(call: LLMCallUsage) -> Optional[float]:
+    """Returns the estimated USD cost of one request, or None if the model has no known price."""
+    if call.backend == "ollama":
+        return 0.0
+    if call.model not in MODEL_PRICES:
+        return None
+    prompt_price, cached_price, completion_price = MODEL_PRICES[call.model]
+    cached = call.cached_tokens or 0
+    uncached = call.prompt_tokens - cached
+    cost = (uncached * prompt_price + cached * cached_price + call.completion_tokens * completion_price) / 1e6
+    return cost * BATCH_PRICE_FACTOR if call.stage == BATCH_STAGE else cost
+
+
+def _sum_known(values: Iterable[Optional[int]]) -> Optional[int]:
+    """Sums the values that are known, or returns None if none are."""
+    known = [x for x in values if x is not None]
+    return sum(known) if known else None
+
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def cache_report(calls: List[LLMCallUsage]) -> Dict[str, float]:
+    """
+    Summarizes how much of the prompt traffic was served from the provider's prefix cache.
+
+    Only requests whose backend reports cached tokens count; Ollama does not, so a run on Ollama
+    reports the cached tokens and the hit ratio as None. Latency saved is estimated from the
+    measured prefill rate when the backend reports it, otherwise from the difference in mean
+    latency between requests with and without cached tokens, times the number of requests with
+    a cache hit (OpenAI).
+
+    Args:
+        calls (List[LLMCallUsage]): The recorded requests to summarize.
+
+    Returns:
+        Dict[str, float]: Request and token counts, the cache-hit ratio and the estimated seconds saved.
+    """
+    reported = [x for x in calls if x.cached_tokens is not None]
+    prompt_tokens = sum(x.prompt_tokens for x in reported)
+    cached_tokens = sum(x.cached_tokens for x in reported)
+    hits = [x for x in reported if x.cached_tokens > 0]
+    misses = [x for x in reported if x.cached_tokens == 0]
+
+    timed = [x for x in reported if x.prefill_seconds is not None]
+    evaluated = sum(x.prompt_tokens - x.cached_tokens for x in timed)
+    if timed and evaluated > 0:
+        seconds_per_token = sum(x.prefill_seconds for x in timed) / evaluated
+        latency_saved = cached_tokens * seconds_per_token
+    elif hits and misses:
+        mean_hit = sum(x.latency for x in hits) / len(hits)
+        mean_miss = sum(x.latency for x in misses) / len(misses)
+        latency_saved = max(0.0, mean_miss - mean_hit) * len(hits)
+    else:
+        latency_saved = 0.0
+
+    return {
+        "requests": len(calls),
+        "requests_with_cache_hit": len(hits) if reported else None,
+        "prompt_tokens": sum(x.prompt_tokens for x in calls),
+        "cached_tokens": cached_tokens if reported else None,
+        "cache_hit_ratio": (round(cached_tokens / prompt_tokens, 4) if prompt_tokens else 0.0) if reported else None,
+        "est_latency_saved_s": round(latency_saved, 3) if reported else None,
+    }
+
+
+def run_report() -> Dict[str, Any]:
+    """
+    Aggregates the stage spans and LLM requests recorded since the last reset.
+
+    Returns:
+        Dict[str, Any]: Seconds per stage, and per stage and model the request count, latency
+            percentiles, token counts and estimated cost, plus the run's total cost. Costs of
+            models without a known price are left out of the totals and listed under unpriced_models.
+            request_outcomes counts, per stage, the requests that succeeded first time, succeeded
+            after retries and failed for good. batch_splits counts multi-job scoring requests
+            that were split and retried, by reason. hosts reports per-host throughput when requests
+            are spread over a pool of hosts.
+    """
+    stages: Dict[str, float] = {}
+    for x in stage_spans():
+        stages[x.stage] = round(stages.get(x.stage, 0.0) + x.duration, 3)
+
+    groups: Dict[tuple, List[LLMCallUsage]] = {}
+    for call in llm_calls():
+        groups.setdefault((call.stage, call.model), []).append(call)
+    llm = []
+    unpriced = set()
+    total_cost = 0.0
+    for (stage, model), calls in groups.items():
+        costs = [estimate_cost(x) for x in calls]
+        if None in costs:
+            unpriced.add(model)
+            cost = None
+        else:
+            cost = sum(costs)
+            total_cost += cost
+        latencies = [x.latency for x in calls]
+        llm.append({
+            "stage": stage,
+            "model": model,
+            "backend": calls[0].backend,
+            "requests": len(calls),
+            "latency_s": round(sum(latencies), 3),
+            "latency_p50_s": round(_percentile(latencies, 0.5), 3),
+            "latency_p95_s": round(_percentile(latencies, 0.95), 3),
+            "prompt_tokens": sum(x.prompt_tokens for x in calls),
+            "completion_tokens": sum(x.completion_tokens for x in calls),
+            "cached_tokens": _sum_known(x.cached_tokens for x in calls),
+            "cost_usd": round(cost, 6) if cost is not None else None,
+        })
+    return {
+        "stage_seconds": stages,
+        "llm": llm,
+        "total_cost_usd": round(total_cost, 6),
+        "unpriced_models": sorted(unpriced),
+        "request_outcomes": request_outcomes(),
+        "batch_splits": batch_splits(),
+        "hosts": host_stats(),
+    }
+
+
+def _prometheus_lines(report: Dict[str, Any]) -> List[str]:
+    lines = [
+        "# HELP jobsearch_stage_seconds Wall-clock seconds spent in each workflow stage during the last run.",
+        "# TYPE jobsearch_stage_seconds gauge",
+    ]
+    lines += [f'jobsearch_stage_seconds{{stage="{stage}"}} {seconds}' for stage, seconds in report["stage_seconds"].items()]
+    metrics = [
+        ("llm_requests", "requests", "LLM requests made during the last run."),
+        ("llm_latency_seconds", "latency_s", "Summed LLM request latency during the last run."),
+        ("llm_prompt_tokens", "prompt_tokens", "Prompt tokens, including cached ones, sent during the last run."),
+        ("llm_cached_tokens", "cached_tokens", "Prompt tokens served from the provider's prefix cache during the last run."),
+        ("llm_completion_tokens", "completion_tokens", "Completion tokens generated during the last run."),
+        ("llm_cost_usd", "cost_usd", "Estimated USD cost of the last run."),
+    ]
+    for name, field, help_text in metrics:
+        lines += [f"# HELP jobsearch_{name} {help_text}", f"# TYPE jobsearch_{name} gauge"]
+        for x in report["llm"]:
+            if x[field] is not None:
+                lines.append(f'jobsearch_{name}{{stage="{x["stage"]}",model="{x["model"]}"}} {x[field]}')
+    lines += [
+        "# HELP jobsearch_llm_request_outcomes LLM requests by how they ended during the last run: ok, retried_ok or failed.",
+        "# TYPE jobsearch_llm_request_outcomes gauge",
+    ]
+    for stage, counts in report.get("request_outcomes", {}).items():
+        lines += [
+            f'jobsearch_llm_request_outcomes{{stage="{stage}",outcome="{x}"}} {counts[x]}'
+            for x in ("ok", "retried_ok", "failed")
+        ]
+    lines += [
+        "# HELP jobsearch_llm_retries Retries of transient LLM request failures during the last run.",
+        "# TYPE jobsearch_llm_retries gauge",
+    ]
+    lines += [
+        f'jobsearch_llm_retries{{stage="{stage}"}} {counts["retries"]}'
+        for stage, counts in report.get("request_outcomes", {}).items()
+    ]
+    host_metrics = [
+        ("llm_host_requests", "requests", "LLM requests each pooled host answered during the last run."),
+        ("llm_host_failed", "failed", "LLM requests that failed on each pooled host and were sent elsewhere."),
+        ("llm_host_tokens_per_second", "tokens_per_s", "Completion tokens per second of each pooled host during the last run."),
+    ]
+    for name, field, help_text in host_metrics:
+        lines += [f"# HELP jobsearch_{name} {help_text}", f"# TYPE jobsearch_{name} gauge"]
+        lines += [f'jobsearch_{name}{{host="{host}"}} {x[field]}' for host, x in report.get("hosts", {}).items()]
+    lines += [
+        "# HELP jobsearch_last_run_timestamp_seconds Unix time the last run finished.",
+        "# TYPE jobsearch_last_run_timestamp_seconds gauge",
+        f"jobsearch_last_run_timestamp_seconds {time.time():.0f}",
+    ]
+    return lines
+
+
+def export_metrics(run_id: str, report: Dict[str, Any], fmt: str = METRICS_EXPORT, path: Optional[Path] = None) -> None:
+    """
+    Exports a run report for external monitoring.
+
+    "prometheus" rewrites a node_exporter textfile with the last run's numbers; the file is
+    replaced atomically so the collector never reads half of it. "jsonl" appends the whole
+    report as one line, keyed by run_id.
+
+    Args:
+        run_id (str): Identifies the run, e.g. its query_date.
+        report (Dict[str, Any]): The output of run_report.
+        fmt (str, optional): "prometheus", "jsonl", or empty to skip. Defaults to METRICS_EXPORT.
+        path (Path, optional): Output file. Defaults to METRICS_PATH, or a file under data/metrics.
+    """
+    if not fmt:
+        return
+    path = path or (Path(METRICS_PATH) if METRICS_PATH else DEFAULT_METRICS_PATHS[fmt])
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if fmt == "prometheus":
+        tmp_path = path.with_suffix(path.suffix + ".tmp")
+        with open(tmp_path, "w") as f:
+            f.write("\n".join(_prometheus_lines(report)) + "\n")
+        os.replace(tmp_path, path)
+    else:
+        with open(path, "a") as f:
+            f.write(json.dumps({"run_id": run_id, **report}) + "\n")
+    logger.info(f"Exported run metrics to {path}")
@@ -1,10 +1,16 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
 import logging
-from typing import List
+import re
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable, Dict, List, Optional
+from weakref import WeakKeyDictionary
 
-from apify_client import ApifyClient
-
-from config import APIFY_API_KEY
+from config import APIFY_CONCURRENCY, require_apify_key
 from datamodels.models import JobInfo, WorkflowReqs
+from .fetch_cache import load_items, store_items
+
+if TYPE_CHECKING:
+    from apify_client import ApifyClient, ApifyClientAsync
 
 
 logger = logging.getLogger(__name__)
@@ -14,10 +20,85 @@ logging.basicConfig(
     datefmt="%Y-%m-%d %H:%M:%S",
 )
 
-client = ApifyClient(token=APIFY_API_KEY)
+ACTOR_ID = "apimaestro/linkedin-jobs-scraper-api"
+TERMINAL_STATUSES = {"SUCCEEDED", "FAILED", "ABORTED", "TIMED-OUT"}
+# The actor's posting-age filters, narrowest first
+DATE_POSTED_WINDOWS = [("24h", timedelta(hours=24)), ("week", timedelta(days=7)), ("month", timedelta(days=30))]
+
+_client: Optional["ApifyClient"] = None
+# Async clients are bound to the event loop they were created on
+_async_clients: WeakKeyDictionary[asyncio.AbstractEventLoop, "ApifyClientAsync"] = WeakKeyDictionary()
+
+
+def get_client() -> "ApifyClient":
+    """Returns the shared sync Apify client, importing the SDK on first use."""
+    global _client
+    if _client is None:
+        from apify_client import ApifyClient
+        _client = ApifyClient(token=require_apify_key())
+    return _client
+
+
+def get_async_client() -> "ApifyClientAsync":
+    """Returns the async Apify client of the running event loop, creating it on first use."""
+    loop = asyncio.get_running_loop()
+    if loop not in _async_clients:
+        from apify_client import ApifyClientAsync
+        _async_clients[loop] = ApifyClientAsync(token=require_apify_key())
+    return _async_clients[loop]
+
+
+def date_posted_window(since: Optional[datetime]) -> str:
+    """
+    Returns the narrowest posting-age filter of the actor that covers everything posted after since.
+
+    Args:
+        since (datetime, optional): Time of the last successful fetch, timezone-aware. None for a first fetch.
+
+    Returns:
+        str: "24h", "week" or "month"; "week" without a since, as a plain search uses.
+    """
+    if since is None:
+        return "week"
+    age = datetime.now(timezone.utc) - since
+    for window, span in DATE_POSTED_WINDOWS:
+        if age <= span:
+            return window
+    return DATE_POSTED_WINDOWS[-1][0]
+
+
+def _build_run_input(search_data: WorkflowReqs, date_posted: str = "week") -> Dict[str, Any]:
+    run_input = {
+        "date_posted": date_posted,
+        "keywords": search_data.keywords,
+        "limit": search_data.limit,
+        "location": search_data.city,
+    }
+    if search_data.hybrid:
+        run_input["remote"] = "hybrid"
+    return run_input
+
+
+def _to_job_info(item: Dict[str, Any]) -> Optional[JobInfo]:
+    try:
+        return JobInfo(
+            company=item.get("company", "Not Specified"),
+            company_url=item.get("company_url", "Not Specified"),
+            description=item.get("description", "Not Specified"),
+            is_verified=item.get("is_verified", False),
+            job_title=item.get("job_title", "Not Specified"),
+            job_url=item.get("job_url", "Not Specified"),
+            location=item.get("location", "Not Specified"),
+            posted_at=item.get("posted_at", "Not Specified"),
+            salary=item.get("salary", "Not Specified"),
+            work_type=item.get("work_type", "Not Specified")\
+        )
+    except Exception as e:
+        logger.error(f"Unable to unpack returned item: {e}")
+        return None
 
 
-def fetch_posts(search_data: WorkflowReqs) -> List[JobInfo]:
+def fetch_posts(search_data: WorkflowReqs, date_posted: str = "week") -> List[JobInfo]:
     """
     Fetches job postings using APIFY Jobs Scraper API.
 
@@ -30,38 +111,242 @@ def fetch_posts(search_data: WorkflowReqs) -> List[JobInfo]:
         city (str): The city to search for jobs in.
         limit (int, optional): The maximum number of job postings to fetch. Defaults to 5.
         hybrid (bool, optional): If True, only fetch hybrid/remote jobs. Defaults to False.
+        date_posted (str, optional): Only postings this recent, see date_posted_window. Defaults to "week".
 
     Returns:
         List[JobInfo]: A list of JobInfo objects representing the fetched job postings.
     """
-    run_input = {
-        "date_posted": "week", # only show results from last week
-        "keywords": search_data.keywords,
-        "limit": search_data.limit,
-        "location": search_data.city,
-    }
-    if search_data.hybrid:
-        run_input["remote"] = "hybrid"
-    run = client.actor("apimaestro/linkedin-jobs-scraper-api").call(run_input=run_input)
-    
+    run_input = _build_run_input(search_data, date_posted)
+    items = load_items(run_input)
+    if items is None:
+        client = get_client()
+        run = client.actor(ACTOR_ID).call(run_input=run_input)
+        items = list(client.dataset(run["defaultDatasetId"]).iterate_items())
+        # A failed or aborted run leaves a partial dataset, which must not be served as the full search
+        if run["status"] == "SUCCEEDED":
+            store_items(run_input, items)
+        else:
+            logger.error(f"Apify run {run['id']} ended with status {run['status']}, not caching its items")
+
     jobs = []
-    for item in client.dataset(run["defaultDatasetId"]).iterate_items():
+    for item in items:
+        job = _to_job_info(item)
+        if job is not None:
+            jobs.append(job)
+    return jobs
+
+
+async def stream_posts(search_data: WorkflowReqs, page_size: int = 10, poll_interval: float = 2.0) -> AsyncIterator[JobInfo]:
+    """
+    Streams job postings out of the Apify dataset while the actor run is still in progress.
+
+    Starts the actor without waiting for it, then pages through its default dataset, yielding
+    each item as a JobInfo as soon as it is stored. Polling stops once the run has finished and
+    the dataset is drained. Items held by the fetch cache are yielded without starting a run, and
+    only the items of a run that succeeded are cached.
+
+    Args:
+        search_data (WorkflowReqs): The search keywords, city, limit and hybrid flag.
+        page_size (int, optional): Items requested per dataset page. Defaults to 10.
+        poll_interval (float, optional): Seconds to wait when no new items are available. Defaults to 2.0.
+
+    Yields:
+        JobInfo: Each job posting, in dataset order.
+    """
+    run_input = _build_run_input(search_data)
+    items = load_items(run_input)
+    if items is not None:
+        for job in map(_to_job_info, items):
+            if job is not None:
+                yield job
+        return
+
+    async_client = get_async_client()
+    run = await async_client.actor(ACTOR_ID).start(run_input=run_input)
+    run_client = async_client.run(run["id"])
+    dataset = async_client.dataset(run["defaultDatasetId"])
+    offset = 0
+    finished = False
+    succeeded = False
+    items = []
+    while True:
+        page = await dataset.list_items(offset=offset, limit=page_size)
+        offset += len(page.items)
+        items.extend(page.items)
+        for item in page.items:
+            job = _to_job_info(item)
+            if job is not None:
+                yield job
+        if len(page.items) == page_size:
+            continue
+        if finished:
+            break
+        run = await run_client.get()
+        if run is None or run["status"] in TERMINAL_STATUSES:
+            # One more pass picks up items written between the last page and the status check
+            finished = True
+            succeeded = run is not None and run["status"] == "SUCCEEDED"
+            if run is not None and not succeeded:
+                logger.error(f"Apify run {run['id']} ended with status {run['status']}, not caching its items")
+            continue
+        await asyncio.sleep(poll_interval)
+    if succeeded:
+        store_items(run_input, items)
+
+
+def expand_queries(search_data: WorkflowReqs) -> List[WorkflowReqs]:
+    """
+    Splits a search with alternative titles or several cities into one query per combination.
+
+    Titles are separated by " OR " or "|", cities by ";", "|" or " OR ". Commas are not separators,
+    so "Austin, TX" stays one location. Each query keeps the original limit and hybrid flag.
+
+    Args:
+        search_data (WorkflowReqs): The extracted search, e.g. keywords "Data Scientist OR ML Engineer"
+            and city "Austin; Denver; Remote".
+
+    Returns:
+        List[WorkflowReqs]: One search per (keywords, city) pair, in the order given.
+    """
+    keywords = [x.strip() for x in re.split(r"\s+OR\s+|\|", search_data.keywords) if x.strip()]
+    cities = [x.strip() for x in re.split(r"\s+OR\s+|[|;]", search_data.city) if x.strip()]
+    return [
+        search_data.model_copy(update={"keywords": k, "city": c})
+        for k in dict.fromkeys(keywords)
+        for c in dict.fromkeys(cities)
+    ]
+
+
+async def _fetch_run(
+    async_client: Callable[[], "ApifyClientAsync"],
+    search_data: WorkflowReqs,
+    semaphore: asyncio.Semaphore,
+    page_size: int,
+    date_posted: str = "week",
+) -> List[JobInfo]:
+    run_input = _build_run_input(search_data, date_posted)
+    items = load_items(run_input)
+    if items is None:
+        items = await _fetch_run_items(async_client(), search_data, run_input, semaphore, page_size)
+    return [job for job in map(_to_job_info, items) if job is not None]
+
+
+async def _fetch_run_items(
+    async_client: "ApifyClientAsync",
+    search_data: WorkflowReqs,
+    run_input: Dict[str, Any],
+    semaphore: asyncio.Semaphore,
+    page_size: int,
+) -> List[Dict[str, Any]]:
+    async with semaphore:
+        logger.info(f"Starting Apify run for {search_data.keywords!r} in {search_data.city!r}")
+        run = await async_client.actor(ACTOR_ID).call(run_input=run_input)
+    if run is None:
+        logger.error(f"Apify run for {search_data.keywords!r} in {search_data.city!r} did not start")
+        return []
+    dataset = async_client.dataset(run["defaultDatasetId"])
+    info = await dataset.get()
+    item_count = info["itemCount"] if info else 0
+    total = item_count if search_data.limit is None else min(item_count, search_data.limit)
+
+    async def fetch_page(offset: int) -> List[Dict[str, Any]]:
+        async with semaphore:
+            page = await dataset.list_items(offset=offset, limit=min(page_size, total - offset))
+        return page.items
+
+    pages = await asyncio.gather(*[fetch_page(offset) for offset in range(0, total, page_size)])
+    items = [item for page in pages for item in page]
+    if run["status"] == "SUCCEEDED":
+        store_items(run_input, items)
+    else:
+        logger.error(f"Apify run {run['id']} ended with status {run['status']}, not caching its items")
+    return items
+
+
+def _merge_unique(job_lists: List[List[JobInfo]]) -> List[JobInfo]:
+    seen = set()
+    merged = []
+    for jobs in job_lists:
+        for job in jobs:
+            if job.job_url in seen and job.job_url != "Not Specified":
+                continue
+            seen.add(job.job_url)
+            merged.append(job)
+    return merged
+
+
+async def async_fetch_posts_multi(
+    queries: List[WorkflowReqs], max_concurrency: Optional[int] = None, page_size: int = 50, date_posted: str = "week"
+) -> List[JobInfo]:
+    """
+    Runs one Apify actor run per query concurrently and merges the results.
+
+    At most max_concurrency actor runs and dataset page requests are in flight at once. Each
+    run fetches at most its query's limit, and its dataset pages are downloaded in parallel.
+    Postings returned by more than one query are kept once, at their first position.
+
+    Args:
+        queries (List[WorkflowReqs]): The searches to run, e.g. from expand_queries.
+        max_concurrency (int, optional): Global cap on concurrent Apify requests. Defaults to APIFY_CONCURRENCY.
+        page_size (int, optional): Items per dataset page request. Defaults to 50.
+        date_posted (str, optional): Only postings this recent, see date_posted_window. Defaults to "week".
+
+    Returns:
+        List[JobInfo]: The merged job postings, in query order.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency or APIFY_CONCURRENCY)
+    # Only created if some query is not served from the fetch cache
+    job_lists = await asyncio.gather(*[_fetch_run(get_async_client, q, semaphore, page_size, date_posted) for q in queries])
+    merged = _merge_unique(job_lists)
+    logger.info(f"Fetched {sum(map(len, job_lists))} postings over {len(queries)} queries, {len(merged)} unique")
+    return merged
+
+
+def fetch_posts_multi(
+    queries: List[WorkflowReqs], max_concurrency: Optional[int] = None, date_posted: str = "week"
+) -> List[JobInfo]:
+    """Synchronous entry point for async_fetch_posts_multi."""
+    return asyncio.run(async_fetch_posts_multi(queries, max_concurrency, date_posted=date_posted))
+
+
+async def stream_posts_multi(queries: List[WorkflowReqs], max_concurrency: Optional[int] = None) -> AsyncIterator[JobInfo]:
+    """
+    Merges stream_posts over several queries into one stream without repeated job URLs.
+
+    Args:
+        queries (List[WorkflowReqs]): The searches to run, e.g. from expand_queries.
+        max_concurrency (int, optional): Maximum concurrent actor runs. Defaults to APIFY_CONCURRENCY.
+
+    Yields:
+        JobInfo: Each unique job posting, as soon as any run produces it.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency or APIFY_CONCURRENCY)
+    queue: asyncio.Queue = asyncio.Queue()
+    done = object()
+
+    async def pump(search_data: WorkflowReqs) -> None:
         try:
-            jobs.append(
-                JobInfo(
-                    company=item.get("company", "Not Specified"),
-                    company_url=item.get("company_url", "Not Specified"),
-                    description=item.get("description", "Not Specified"),
-                    is_verified=item.get("is_verified", False),
-                    job_title=item.get("job_title", "Not Specified"),
-                    job_url=item.get("job_url", "Not Specified"),
-                    location=item.get("location", "Not Specified"),
-                    posted_at=item.get("posted_at", "Not Specified"),
-                    salary=item.get("salary", "Not Specified"),
-                    work_type=item.get("work_type", "Not Specified")\
-                )
-            )
+            async with semaphore:
+                async for job in stream_posts(search_data):
+                    await queue.put(job)
         except Exception as e:
-            logger.error(f"Unable to unpack returned item: {e}")
-            continue
-    return jobs
\ No newline at end of file
+            logger.error(f"Apify stream for {search_data.keywords!r} in {search_data.city!r} failed: {e}")
+        finally:
+            await queue.put(done)
+
+    tasks = [asyncio.create_task(pump(q)) for q in queries]
+    seen = set()
+    remaining = len(tasks)
+    try:
+        while remaining:
+            job = await queue.get()
+            if job is done:
+                remaining -= 1
+                continue
+            if job.job_url in seen and job.job_url != "Not Specified":
+                continue
+            seen.add(job.job_url)
+            yield job
+    finally:
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,301 @@
+from collections import defaultdict
+from datetime import datetime, timezone
+import hashlib
+import json
+import logging
+from pathlib import Path
+import re
+import zlib
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from datamodels.models import JobInfo
+
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+logger = logging.getLogger(__name__)
+
+DEFAULT_INDEX_PATH = Path.cwd() / "data/cache/posting_index.json"
+MISSING_URL = "Not Specified"
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_WORD_RE = re.compile(r"\w+")
+
+
+def shingles(text: str, k: int = 3) -> set:
+    """Returns the set of k-word shingles of a text, ignoring case and punctuation."""
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < k:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + k]) for i in range(len(words) - k + 1)}
+
+
+def resume_key(resume: str) -> str:
+    return hashlib.sha256(re.sub(r"\s+", " ", resume).strip().encode()).hexdigest()
+
+
+class PostingIndex:
+    """
+    MinHash/LSH index of job descriptions that persists across runs.
+
+    Signatures are split into bands; two postings become candidates when any band matches,
+    and candidates are confirmed when their estimated Jaccard similarity reaches threshold.
+    Each entry remembers the score it was given, and how it was scored, so reposts can reuse it.
+    """
+
+    def __init__(
+        self,
+        path: Optional[Path] = DEFAULT_INDEX_PATH,
+        num_perm: int = 128,
+        bands: int = 32,
+        threshold: float = 0.7,
+        max_age_days: float = 60,
+        seed: int = 1,
+    ):
+        if num_perm % bands != 0:
+            raise ValueError(f"num_perm ({num_perm}) must be divisible by bands ({bands})")
+        self.path = path
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.max_age_days = max_age_days
+        self.seed = seed
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, int(_MERSENNE_PRIME), num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, int(_MERSENNE_PRIME), num_perm, dtype=np.uint64)
+        self.entries: Dict[str, dict] = {}
+        self.signatures: Dict[str, np.ndarray] = {}
+        self._buckets = [defaultdict(list) for _ in range(bands)]
+        if path is not None and path.exists():
+            self._load()
+
+    def signature(self, text: str) -> np.ndarray:
+        hashes = np.fromiter((zlib.crc32(s.encode()) for s in shingles(text)), dtype=np.uint64)
+        if hashes.size == 0:
+            return np.full(self.num_perm, int(_MAX_HASH), dtype=np.uint32)
+        # uint64 overflow wraps around, which still gives a fixed universal hash family
+        permuted = ((np.outer(self._a, hashes) + self._b[:, None]) % _MERSENNE_PRIME) & _MAX_HASH
+        return permuted.min(axis=1).astype(np.uint32)
+
+    def _band_keys(self, sig: np.ndarray) -> List[bytes]:
+        return [sig[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def query(self, sig: np.ndarray) -> Optional[str]:
+        """Returns the key of the most similar indexed posting above threshold, if any."""
+        candidates = set()
+        for band, band_key in zip(self._buckets, self._band_keys(sig)):
+            candidates.update(band.get(band_key, ()))
+        best_key, best_sim = None, self.threshold
+        for key in candidates:
+            sim = float(np.mean(self.signatures[key] == sig))
+            if sim >= best_sim:
+                best_key, best_sim = key, sim
+        return best_key
+
+    def add(self, key: str, sig: np.ndarray, **metadata) -> None:
+        if key not in self.signatures:
+            for band, band_key in zip(self._buckets, self._band_keys(sig)):
+                band[band_key].append(key)
+        self.signatures[key] = sig
+        self.entries[key] = {**self.entries.get(key, {}), **metadata}
+
+    def _load(self) -> None:
+        with open(self.path) as f:
+            data = json.load(f)
+        if data.get("num_perm") != self.num_perm or data.get("bands") != self.bands:
+            logger.warning(f"Ignoring posting index at {self.path}, it was built with different LSH parameters")
+            return
+        now = datetime.now(timezone.utc)
+        expired = 0
+        for key, entry in data["entries"].items():
+            seen_at = datetime.fromisoformat(entry["seen_at"])
+            if (now - seen_at).total_seconds() > self.max_age_days * 86400:
+                expired += 1
+                continue
+            sig = np.asarray(entry.pop("signature"), dtype=np.uint32)
+            self.add(key, sig, **entry)
+        logger.info(f"Loaded {len(self.entries)} postings from {self.path}, expired {expired}")
+
+    def save(self) -> None:
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        data = {
+            "num_perm": self.num_perm,
+            "bands": self.bands,
+            "entries": {
+                key: {**entry, "signature": self.signatures[key].tolist()}
+                for key, entry in self.entries.items()
+            },
+        }
+        with open(self.path, "w") as f:
+            json.dump(data, f)
+
+
+class Deduper:
+    """
+    Incremental deduplication of job postings within a run, backed by a persistent index.
+
+    Postings are admitted one at a time, so the same logic serves both a fetched list and a
+    stream of postings. Admit returns one of:
+        EXACT: the job_url was already admitted; the posting is dropped.
+        NEAR: the description nearly duplicates an admitted posting; it shares that score.
+        REUSED: it matches a posting scored for the same resume and with the same fingerprint in an
+            earlier run; the score is reused.
+        NEW: it needs an LLM score.
+
+    The fingerprint holds what a score depends on besides the resume and the description, such as
+    the backend, model and prompt version, e.g. from scoring.job_posts.score_fingerprint. Without
+    one, earlier scores are never reused.
+
+    Attributes:
+        postings (List[JobInfo]): Every unique-URL posting admitted so far, in input order.
+        to_score (List[JobInfo]): Cluster representatives that still need an LLM score.
+        reused (int): Representatives whose score was reused from an earlier run.
+    """
+
+    EXACT = "exact"
+    NEAR = "near"
+    REUSED = "reused"
+    NEW = "new"
+
+    def __init__(self, resume: str, index: PostingIndex, fingerprint: Optional[Dict[str, Any]] = None):
+        self.index = index
+        self.fingerprint = fingerprint
+        self.postings: List[JobInfo] = []
+        self.to_score: List[JobInfo] = []
+        self.reused = 0
+        self.exact = 0
+        self.near = 0
+        self._resume_key = resume_key(resume)
+        self._run_index = PostingIndex(
+            path=None, num_perm=index.num_perm, bands=index.bands, threshold=index.threshold, seed=index.seed
+        )
+        self._seen_urls = set()
+        self._positions: Dict[int, int] = {}
+        self._representatives: Dict[int, JobInfo] = {}
+        self._clusters: Dict[int, List[JobInfo]] = defaultdict(list)
+        self._signatures: Dict[int, np.ndarray] = {}
+
+    def admit(self, job: JobInfo) -> str:
+        if job.job_url != MISSING_URL:
+            if job.job_url in self._seen_urls:
+                self.exact += 1
+                return self.EXACT
+            self._seen_urls.add(job.job_url)
+        pos = len(self.postings)
+        self.postings.append(job)
+        self._positions[id(job)] = pos
+        sig = self.index.signature(job.description)
+        rep_pos = self._run_index.query(sig)
+        if rep_pos is not None:
+            rep = self.postings[int(rep_pos)]
+            job.duplicate_of = rep.job_url
+            job.score = rep.score
+            job.explanation = rep.explanation
+            self._clusters[int(rep_pos)].append(job)
+            self._representatives[id(job)] = rep
+            self.near += 1
+            return self.NEAR
+        self._run_index.add(str(pos), sig)
+        self._signatures[pos] = sig
+
+        prior_url = self.index.query(sig)
+        prior = self.index.entries.get(prior_url) if prior_url is not None else None
+        if self._reusable(prior):
+            job.score = prior["score"]
+            job.explanation = prior["explanation"]
+            if prior_url != job.job_url:
+                job.duplicate_of = prior_url
+            self.reused += 1
+            return self.REUSED
+        self.to_score.append(job)
+        return self.NEW
+
+    def _reusable(self, prior: Optional[dict]) -> bool:
+        """Whether an indexed score was given to this resume by the same backend, model and prompt."""
+        if prior is None or self.fingerprint is None or prior.get("resume_key") != self._resume_key:
+            return False
+        return all(prior.get(name) == value for name, value in self.fingerprint.items())
+
+    def representative_of(self, job: JobInfo) -> Optional[JobInfo]:
+        """Returns the posting whose score a near duplicate shares."""
+        return self._representatives.get(id(job))
+
+    def duplicates_of(self, job: JobInfo) -> List[JobInfo]:
+        """Returns the near duplicates admitted so far that share this representative's score."""
+        return self._clusters.get(self._positions.get(id(job)), [])
+
+    def fan_out(self) -> None:
+        """Copies each representative's score and explanation onto the rest of its cluster."""
+        for rep_pos, members in self._clusters.items():
+            rep = self.postings[rep_pos]
+            for job in members:
+                job.score = rep.score
+                job.explanation = rep.explanation
+
+    def remember(self, scored: List[JobInfo], save: bool = True) -> None:
+        """
+        Stores newly scored representatives in the index so later runs recognize reposts.
+
+        Args:
+            scored (List[JobInfo]): The representatives that actually received an LLM score.
+            save (bool, optional): Write the index to disk afterwards. Defaults to True.
+        """
+        seen_at = datetime.now(timezone.utc).isoformat()
+        for job in scored:
+            pos = self._positions.get(id(job))
+            if pos not in self._signatures or job.score < 0 or job.job_url == MISSING_URL:
+                continue
+            self.index.add(
+                job.job_url, self._signatures[pos], score=job.score, explanation=job.explanation,
+                resume_key=self._resume_key, seen_at=seen_at, **(self.fingerprint or {}),
+            )
+        if save:
+            self.index.save()
+
+    def log_summary(self) -> None:
+        logger.info(
+            f"Dedup: {len(self.postings) + self.exact} postings, {self.exact} exact URL duplicates dropped, "
+            f"{self.near} near duplicates, {self.reused} scores reused from earlier runs, "
+            f"{len(self.to_score)} left to score"
+        )
+
+
+def dedup_postings(
+    job_postings: List[JobInfo],
+    resume: str,
+    index: Optional[PostingIndex] = None,
+    fingerprint: Optional[Dict[str, Any]] = None,
+) -> Deduper:
+    """
+    Collapses duplicate and near-duplicate job postings so each role is scored once.
+
+    Postings with the same job_url are dropped outright. The remaining postings are clustered
+    by MinHash/LSH on their descriptions; only the first posting of each cluster is scored and
+    the others point at it through duplicate_of. A representative that matches a posting scored
+    for the same resume with the same fingerprint in an earlier run reuses that score instead of
+    being scored again.
+
+    Args:
+        job_postings (List[JobInfo]): A list of JobInfo objects as returned by fetch_posts.
+        resume (str): The plain text content of the candidate's resume.
+        index (PostingIndex, optional): Persistent index of earlier postings. Defaults to the on-disk index.
+        fingerprint (Dict[str, Any], optional): How the postings will be scored: backend, model, prompt
+            version and compaction. Defaults to None, which never reuses earlier scores.
+
+    Returns:
+        Deduper: The deduplicated postings and the subset that needs scoring.
+    """
+    deduper = Deduper(resume, index if index is not None else PostingIndex(), fingerprint)
+    for job in job_postings:
+        deduper.admit(job)
+    deduper.log_summary()
+    return deduper
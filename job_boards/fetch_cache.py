@@ -0,0 +1,91 @@
+from datetime import datetime, timezone
+import hashlib
+import json
+import logging
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from config import FETCH_CACHE_MODE, FETCH_CACHE_TTL_HOURS
+
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+logger = logging.getLogger(__name__)
+
+FETCH_CACHE_DIR = Path.cwd() / "data/cache/fetch"
+
+
+class ReplayMissError(LookupError):
+    """Raised in replay mode when no recording exists for a run input."""
+
+
+def _normalize(value: Any) -> Any:
+    if isinstance(value, str):
+        return " ".join(value.lower().split())
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in value.items() if v is not None}
+    return value
+
+
+def run_input_key(run_input: Dict[str, Any]) -> str:
+    """Hashes an actor run input so that casing, whitespace and key order do not matter."""
+    normalized = json.dumps(_normalize(run_input), sort_keys=True)
+    return hashlib.sha256(normalized.encode()).hexdigest()[:24]
+
+
+def _path(run_input: Dict[str, Any]) -> Path:
+    return FETCH_CACHE_DIR / f"{run_input_key(run_input)}.json"
+
+
+def load_items(
+    run_input: Dict[str, Any], mode: str = FETCH_CACHE_MODE, ttl_hours: float = FETCH_CACHE_TTL_HOURS
+) -> Optional[List[Dict[str, Any]]]:
+    """
+    Returns the stored raw dataset items for a run input, if the mode allows serving them.
+
+    In "ttl" mode items are served while younger than ttl_hours. In "replay" mode they are served
+    regardless of age, and a missing recording raises ReplayMissError so nothing hits the network.
+    "off" and "record" never serve stored items.
+
+    Args:
+        run_input (Dict[str, Any]): The actor run input.
+        mode (str, optional): The fetch cache mode. Defaults to FETCH_CACHE_MODE.
+        ttl_hours (float, optional): Maximum age of items served in "ttl" mode. Defaults to FETCH_CACHE_TTL_HOURS.
+
+    Returns:
+        Optional[List[Dict[str, Any]]]: The raw dataset items, or None when the live actor should be called.
+    """
+    if mode not in ("ttl", "replay"):
+        return None
+    path = _path(run_input)
+    if not path.exists():
+        if mode == "replay":
+            raise ReplayMissError(f"No recording for run input {run_input} at {path}")
+        return None
+    with open(path) as f:
+        data = json.load(f)
+    age_hours = (datetime.now(timezone.utc) - datetime.fromisoformat(data["fetched_at"])).total_seconds() / 3600
+    if mode == "ttl" and age_hours > ttl_hours:
+        logger.info(f"Fetch cache entry {path.name} is {age_hours:.1f}h old, refetching")
+        return None
+    logger.info(f"Serving {len(data['items'])} items from fetch cache {path.name} ({age_hours:.1f}h old)")
+    return data["items"]
+
+
+def store_items(run_input: Dict[str, Any], items: List[Dict[str, Any]], mode: str = FETCH_CACHE_MODE) -> None:
+    """Saves raw dataset items for a run input in "ttl" and "record" modes."""
+    if mode not in ("ttl", "record"):
+        return
+    FETCH_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    path = _path(run_input)
+    data = {
+        "run_input": run_input,
+        "fetched_at": datetime.now(timezone.utc).isoformat(),
+        "items": items,
+    }
+    with open(path, "w") as f:
+        json.dump(data, f)
+    logger.info(f"Recorded {len(items)} items to {path}")
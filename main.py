@@ -1,14 +1,28 @@
 import argparse
+import asyncio
 from datetime import datetime, timezone
+import hashlib
 import json
 import logging
 from pathlib import Path
-from typing import Dict, List
+import time
+from typing import Dict, List, Optional
 
-from datamodels.models import JobInfo
-from job_boards.apify import fetch_posts
+from config import CASCADE_LARGE_MODEL, CASCADE_SMALL_MODEL, OLLAMA_THROUGHPUT
+from datamodels.models import JobInfo, WorkflowReqs
+import instrumentation
+from job_boards.apify import (
+    date_posted_window, expand_queries, fetch_posts, fetch_posts_multi, stream_posts, stream_posts_multi,
+)
+from job_boards.dedup import Deduper, PostingIndex, dedup_postings, resume_key
+from scoring.batch_api import BATCH_DIR, BulkRun, LocalBatchClient, bulk_fingerprint, finish_bulk_run, submit_bulk_run
+from scoring.cascade import CascadeScorer, baseline_agreement, latest_baseline
+from scoring.compaction import Compactor
+from scoring.gaps import GapProfile
 from scoring.prompt_extraction import check_and_extract
-from scoring.job_posts import score_job_posts, identify_resume_gaps
+from scoring.job_posts import score_fingerprint, score_job_posts, identify_resume_gaps, score_matrix, stream_score_posts
+from scoring.prefilter import prefilter_jobs
+from run_history import RunHistory, job_key
 
 logging.basicConfig(
     level=logging.INFO,
@@ -20,28 +34,98 @@ logger = logging.getLogger(__name__)
 CACHE_DIR = Path.cwd() / "data/cache"
 CACHE_DIR.mkdir(exist_ok=True)
 
-def cache_data(query_metadata: Dict[str, str], scores: List[JobInfo], gap_summary: str) -> None:
+def cache_data(
+    query_metadata: Dict[str, str], scores: List[JobInfo], gap_summary: str, source: Optional[str] = None
+) -> str:
     """
-    Saves all data to a cache file.
+    Saves all data to the run history.
     Args:
         scores (List[JobInfo]): List of JobInfo objects containing job details and scores.
         gap_summary (str): Summary of areas where the resume could be improved.
+        source (str, optional): Tags the run, e.g. with the watched search it belongs to.
     Side Effects:
-        - Saves all job scores and details to a timestamped JSON file in the cache directory.
+        - Appends the run and all job scores and details to the run history database.
 
+    Returns:
+        str: The run_id the run was stored under.
     """
     dt_string = datetime.now(timezone.utc).strftime(format="%Y%m%d-%H%M%S")
-    outfile = CACHE_DIR / f"jobs_{dt_string}.json"
-    logger.info(f"Saving data to {outfile}")
     sorted_jobs = sorted(scores, key=lambda x: x.score, reverse=True)
-    jobs_d = {
-        "query_date": dt_string,
-        "query_params": query_metadata,
-        "jobs": [x.model_dump() for x in sorted_jobs],
-        "areas_of_improvement": gap_summary
-    }
-    with open(outfile, "w") as f:
-        json.dump(jobs_d, f, indent=4)
+    history = RunHistory()
+    run_id = history.add_run(dt_string, query_metadata, sorted_jobs, gap_summary, source=source)
+    history.close()
+    logger.info(f"Saved run {run_id} to {history.path}")
+    return run_id
+
+
+def save_run(
+    query_metadata: Dict[str, str], scores: List[JobInfo], gap_summary: str, source: Optional[str] = None
+) -> str:
+    """
+    Adds the run's stage timings, LLM usage and estimated cost to the query metadata,
+    saves everything to the cache and exports the metrics if METRICS_EXPORT is set.
+    Returns the run_id.
+    """
+    report = instrumentation.run_report()
+    query_metadata["instrumentation"] = report
+    logger.info(f"Stage seconds: {report['stage_seconds']}, estimated cost: ${report['total_cost_usd']:.4f}")
+    for stage, counts in report["request_outcomes"].items():
+        if counts["retried_ok"] or counts["failed"]:
+            logger.warning(
+                f"{stage} requests: {counts['retried_ok']} succeeded after {counts['retries']} retries, "
+                f"{counts['failed']} failed"
+            )
+    for host, stats in report["hosts"].items():
+        logger.info(
+            f"{host}: {stats['requests']} requests ({stats['share']:.0%}), {stats['failed']} failed, "
+            f"{stats['requests_per_min']} req/min, {stats['tokens_per_s']} tok/s"
+        )
+    run_id = cache_data(query_metadata, scores, gap_summary, source)
+    instrumentation.export_metrics(run_id, report)
+    return run_id
+
+
+def prewarm_backend(resume: str = "", cascade: bool = False) -> None:
+    """
+    In Ollama throughput mode, starts loading the scoring models in the background, so the load
+    overlaps the prompt check and the fetch instead of delaying the first score.
+    """
+    if not OLLAMA_THROUGHPUT:
+        return
+    from scoring.ollama_models import start_prewarm
+    start_prewarm([CASCADE_SMALL_MODEL, CASCADE_LARGE_MODEL] if cascade else None, resume)
+
+
+def log_compaction(compactor: Compactor) -> Dict[str, object]:
+    """Logs the prompt tokens compaction saved and returns the per-job report for the query metadata."""
+    summary = compactor.summary()
+    logger.info(
+        f"Compaction: {summary['tokens_before']} -> {summary['tokens_after']} description tokens "
+        f"({summary['reduction']:.0%} fewer) over {summary['jobs']} jobs"
+    )
+    return summary
+
+
+def log_cascade(cascade: CascadeScorer, scores: List[JobInfo]) -> Dict[str, object]:
+    """
+    Logs the share of jobs the cascade escalated and its latency and cost, compares the scores with
+    the newest eval_cache baseline of the large model if there is one, and returns it all for the
+    query metadata.
+    """
+    summary = cascade.summary()
+    cost = f"${summary['cost_usd']:.4f}" if summary["cost_usd"] is not None else "unknown cost"
+    logger.info(
+        f"Cascade: {summary['escalated']} of {summary['jobs']} jobs ({summary['escalation_rate']:.0%}) escalated "
+        f"to {cascade.large_model}, {summary['latency_s']}s of requests, {cost}"
+    )
+    baseline = latest_baseline(cascade.large_model)
+    if baseline is None:
+        logger.info(f"No eval_cache baseline scored with {cascade.large_model} to compare against")
+        return summary
+    agreement = baseline_agreement(scores, baseline)
+    summary["baseline_agreement"] = {"path": baseline["path"], **agreement}
+    logger.info(f"Cascade agreement with {baseline['path']}: {agreement}")
+    return summary
 
 
 def display_output(scores: List[JobInfo], gap_summary: str, top_n=5) -> None:
@@ -68,16 +152,29 @@ def display_output(scores: List[JobInfo], gap_summary: str, top_n=5) -> None:
     print(gap_summary)
 
 
-def run_workflow(resume: str, prompt: str) -> None:
+def run_workflow(
+    resume: str,
+    prompt: str,
+    top_k: Optional[int] = None,
+    min_similarity: Optional[float] = None,
+    dedup: bool = True,
+    compact: bool = False,
+    gap_profile: bool = False,
+    cascade: bool = False,
+) -> None:
     """
     Executes the main workflow for job searching and evaluation.
 
     Steps:
         1. Fetches job postings that match the specified job title and city.
-           If 'hybrid' is True, only hybrid jobs in the search.
-        2. Compares each job posting against the provided resume, assigning a score and reason.
-        3. Summarize gaps in jobs > 7 that would improve resume
-        4. Sorts the job postings by score, prints the top 5, saves all to cache
+           If 'hybrid' is True, only hybrid jobs in the search. Alternative titles or several
+           cities are fetched as concurrent searches and merged.
+        2. Collapses duplicate and reposted postings so each role is scored once.
+        3. Optionally ranks the postings lexically against the resume and keeps only the best ones.
+        4. Compares each remaining job posting against the provided resume, assigning a score and reason.
+           Duplicates share the score of the posting they duplicate.
+        5. Summarize gaps in jobs > 7 that would improve resume
+        6. Sorts the job postings by score, prints the top 5, saves all to cache
 
     Args:
         resume (str): The contents of the user's resume in plain text.
@@ -85,11 +182,18 @@ def run_workflow(resume: str, prompt: str) -> None:
         city (str): The city to search for jobs in. Only the city. Not city, state.
         limit (int): The maximum number of job postings to fetch.
         hybrid (bool): Whether to include hybrid/remote jobs in the search.
+        top_k (int, optional): Only send the top_k lexically closest postings to the LLM.
+        min_similarity (float, optional): Only send postings at or above this relative lexical score to the LLM.
+        dedup (bool, optional): Whether to collapse duplicate postings before scoring. Defaults to True.
+        compact (bool, optional): Whether to strip boilerplate from descriptions before scoring. Defaults to False.
+        gap_profile (bool, optional): Fold the gaps into the resume's stored gap profile. Defaults to False.
+        cascade (bool, optional): Score with the small cascade model and escalate borderline jobs. Defaults to False.
 
     Returns:
         None
     """\
     
+    instrumentation.reset()
     search_data = check_and_extract(prompt)
     search_data.resume = resume
     query_d = {
@@ -97,23 +201,501 @@ def run_workflow(resume: str, prompt: str) -> None:
         "city": search_data.city,
         "hybrid": search_data.hybrid
     }
-    job_postings = fetch_posts(search_data)
+    queries = expand_queries(search_data)
+    if len(queries) > 1:
+        query_d["queries"] = [{"keywords": q.keywords, "city": q.city} for q in queries]
+    with instrumentation.span("fetch"):
+        job_postings = fetch_posts(search_data) if len(queries) == 1 else fetch_posts_multi(queries)
     if len(job_postings) == 0:
         logger.error("No job posts were returned from fetch. Exiting.")
         return
-    scores = score_job_posts(search_data.resume, job_postings)
-    gap_summary = identify_resume_gaps(scores)
+    to_score = job_postings
+    compactor = Compactor() if compact else None
+    cascade_scorer = CascadeScorer() if cascade else None
+    if dedup:
+        with instrumentation.span("dedup"):
+            dedup_result = dedup_postings(
+                job_postings, search_data.resume, fingerprint=score_fingerprint(compactor=compactor, cascade=cascade_scorer)
+            )
+        query_d["dedup"] = {
+            "unique_postings": len(dedup_result.postings),
+            "to_score": len(dedup_result.to_score),
+            "reused_scores": dedup_result.reused,
+        }
+        job_postings = dedup_result.postings
+        to_score = dedup_result.to_score
+    if top_k is not None or min_similarity is not None:
+        with instrumentation.span("prefilter"):
+            to_score, skipped = prefilter_jobs(search_data.resume, to_score, top_k=top_k, min_score=min_similarity)
+        query_d["prefilter"] = {"top_k": top_k, "min_similarity": min_similarity, "llm_calls_saved": len(skipped)}
+        for job in skipped:
+            job.explanation = "Skipped by lexical prefilter"
+    with instrumentation.span("score"):
+        scored = score_job_posts(search_data.resume, to_score, compactor=compactor, cascade=cascade_scorer)
+    if compactor is not None:
+        query_d["compaction"] = log_compaction(compactor)
+    if dedup:
+        dedup_result.remember(scored)
+        dedup_result.fan_out()
+    scores = job_postings
+    if cascade_scorer is not None:
+        query_d["cascade"] = log_cascade(cascade_scorer, scores)
+    query_d["prompt_cache"] = instrumentation.cache_report(instrumentation.llm_calls(stage="score"))
+    logger.info(f"Scoring prompt cache: {query_d['prompt_cache']}")
+    with instrumentation.span("gaps"):
+        gap_summary = identify_resume_gaps(scores, resume=resume if gap_profile else None)
     display_output(scores, gap_summary, top_n=5)
-    cache_data(query_d, scores, gap_summary)
+    save_run(query_d, scores, gap_summary)
+    logger.info("Script complete")
+
+
+def run_stream_workflow(
+    resume: str, prompt: str, dedup: bool = True, compact: bool = False, gap_profile: bool = False, cascade: bool = False
+) -> None:
+    """
+    Executes the workflow with fetching and scoring overlapped.
+
+    Job postings are scored as they stream out of the Apify dataset instead of after the
+    whole fetch completes. Every result is printed and appended to a partial JSON-lines cache
+    file as soon as it is scored; once the stream ends, gap analysis runs and the run is saved
+    to the run history in place of the partial file.
+
+    Args:
+        resume (str): The contents of the user's resume in plain text.
+        prompt (str): The search prompt.
+        dedup (bool, optional): Whether to collapse duplicate postings before scoring. Defaults to True.
+        compact (bool, optional): Whether to strip boilerplate from descriptions before scoring. Defaults to False.
+        gap_profile (bool, optional): Fold the gaps into the resume's stored gap profile. Defaults to False.
+        cascade (bool, optional): Score with the small cascade model and escalate borderline jobs. Defaults to False.
+
+    Returns:
+        None
+    """
+    instrumentation.reset()
+    search_data = check_and_extract(prompt)
+    search_data.resume = resume
+    query_d = {
+        "keywords": search_data.keywords,
+        "city": search_data.city,
+        "hybrid": search_data.hybrid
+    }
+    queries = expand_queries(search_data)
+    if len(queries) > 1:
+        query_d["queries"] = [{"keywords": q.keywords, "city": q.city} for q in queries]
+    dt_string = datetime.now(timezone.utc).strftime(format="%Y%m%d-%H%M%S")
+    partial_file = CACHE_DIR / f"jobs_{dt_string}.partial.jsonl"
+    logger.info(f"Streaming results to {partial_file}")
+    compactor = Compactor() if compact else None
+    cascade_scorer = CascadeScorer() if cascade else None
+    # Streamed postings are scored one per request
+    fingerprint = score_fingerprint(0, compactor, cascade_scorer)
+    deduper = Deduper(resume, PostingIndex(), fingerprint) if dedup else None
+    with open(partial_file, "w") as f:
+        def on_result(job: JobInfo) -> None:
+            print(f"{job.score:>5} | {job.company} | {job.job_title}")
+            f.write(job.model_dump_json() + "\n")
+            f.flush()
+
+        job_stream = stream_posts(search_data) if len(queries) == 1 else stream_posts_multi(queries)
+        with instrumentation.span("fetch_and_score"):
+            stats = asyncio.run(stream_score_posts(
+                resume, job_stream, on_result, deduper=deduper, compactor=compactor, cascade=cascade_scorer
+            ))
+    query_d["stream"] = stats
+    if compactor is not None:
+        query_d["compaction"] = log_compaction(compactor)
+    if stats["fetched"] == 0:
+        logger.error("No job posts were returned from fetch. Exiting.")
+        partial_file.unlink()
+        return
+
+    with open(partial_file) as f:
+        scores = [JobInfo.model_validate_json(line) for line in f]
+    if cascade_scorer is not None:
+        query_d["cascade"] = log_cascade(cascade_scorer, scores)
+    query_d["prompt_cache"] = instrumentation.cache_report(instrumentation.llm_calls(stage="score"))
+    with instrumentation.span("gaps"):
+        gap_summary = identify_resume_gaps(scores, resume=resume if gap_profile else None)
+    display_output(scores, gap_summary, top_n=5)
+    save_run(query_d, scores, gap_summary)
+    partial_file.unlink()
+    logger.info("Script complete")
+
+
+def read_resumes(resume_dir: Path) -> Dict[str, str]:
+    """Reads every .txt resume in a directory, keyed by file name without the extension."""
+    resumes = {}
+    for path in sorted(resume_dir.glob("*.txt")):
+        with open(path) as f:
+            resumes[path.stem] = f.read()
+    return resumes
+
+
+def display_matrix(names: List[str], rows: List[Dict[str, object]], top_n=5) -> None:
+    """
+    Prints the top jobs by their best score across resumes, with every resume's score, then each resume's top jobs.
+
+    Args:
+        names (List[str]): The resume names, one column each.
+        rows (List[Dict[str, object]]): One row per job with its company, job_title and scores by resume, best first.
+        top_n (int, optional): Number of jobs to display per table. Defaults to 5.
+    """
+    width = max(6, *(len(x) for x in names))
+    print("")
+    print(" ".join(f"{x[:width]:>{width}}" for x in names) + " | company | job title")
+    for row in rows[:top_n * 2]:
+        print(" ".join(f"{row['scores'][x]:>{width}}" for x in names) + f" | {row['company']} | {row['job_title']}")
+    for name in names:
+        print("")
+        print(f"Top {top_n} for {name}")
+        for row in sorted(rows, key=lambda x: x["scores"][name], reverse=True)[:top_n]:
+            print(f"{row['scores'][name]:>5} | {row['company']} | {row['job_title']}")
+
+
+def run_matrix_workflow(
+    resumes: Dict[str, str], prompt: str, top_n: int = 5, dedup: bool = True, compact: bool = False
+) -> None:
+    """
+    Scores several resume variants against the same job search.
+
+    The prompt is checked and the postings fetched once. Duplicate postings are collapsed once
+    for all resumes, and the whole resume x job grid is scored through one scheduler and the
+    shared score cache, so a repeated run only pays for pairs it has not scored before. Prints
+    the ranked matrix and each resume's top jobs, saves the matrix to the cache directory and
+    stores one run per resume in the run history. Gap analysis is skipped.
+
+    Args:
+        resumes (Dict[str, str]): Resume texts by name.
+        prompt (str): The search prompt.
+        top_n (int, optional): Number of jobs to display per resume. Defaults to 5.
+        dedup (bool, optional): Whether to collapse duplicate postings before scoring. Defaults to True.
+        compact (bool, optional): Whether to strip boilerplate from descriptions before scoring. Defaults to False.
+
+    Returns:
+        None
+    """
+    instrumentation.reset()
+    search_data = check_and_extract(prompt)
+    query_d = {
+        "keywords": search_data.keywords,
+        "city": search_data.city,
+        "hybrid": search_data.hybrid,
+        "resumes": list(resumes),
+    }
+    queries = expand_queries(search_data)
+    if len(queries) > 1:
+        query_d["queries"] = [{"keywords": q.keywords, "city": q.city} for q in queries]
+    with instrumentation.span("fetch"):
+        job_postings = fetch_posts(search_data) if len(queries) == 1 else fetch_posts_multi(queries)
+    if len(job_postings) == 0:
+        logger.error("No job posts were returned from fetch. Exiting.")
+        return
+    to_score = job_postings
+    deduper = None
+    if dedup:
+        # Clusters do not depend on the resume; scores of earlier runs come from the score cache instead
+        with instrumentation.span("dedup"):
+            deduper = dedup_postings(job_postings, "", PostingIndex(path=None))
+        job_postings = deduper.postings
+        to_score = deduper.to_score
+    compactor = Compactor() if compact else None
+    with instrumentation.span("score"):
+        grid, query_d["matrix"] = score_matrix(resumes, to_score, compactor=compactor)
+    if compactor is not None:
+        query_d["compaction"] = log_compaction(compactor)
+
+    positions = {id(job): i for i, job in enumerate(to_score)}
+    cells = []
+    rows = []
+    for job in job_postings:
+        rep = deduper.representative_of(job) if deduper is not None else None
+        i = positions[id(rep or job)]
+        cells.append((job, i))
+        rows.append({
+            "job_url": job.job_url,
+            "company": job.company,
+            "job_title": job.job_title,
+            "scores": {name: grid[name][i].score for name in resumes},
+            "explanations": {name: grid[name][i].explanation for name in resumes},
+        })
+    rows.sort(key=lambda x: max(x["scores"].values()), reverse=True)
+    display_matrix(list(resumes), rows, top_n=top_n)
+
+    report = instrumentation.run_report()
+    query_d["instrumentation"] = report
+    dt_string = datetime.now(timezone.utc).strftime(format="%Y%m%d-%H%M%S")
+    matrix_file = CACHE_DIR / f"matrix_{dt_string}.json"
+    with open(matrix_file, "w") as f:
+        json.dump({"query_date": dt_string, "query_params": query_d, "jobs": rows}, f, indent=4)
+    logger.info(f"Saved matrix to {matrix_file}")
+
+    history = RunHistory()
+    for name in resumes:
+        jobs = [
+            job.model_copy(update={"score": grid[name][i].score, "explanation": grid[name][i].explanation})
+            for job, i in cells
+        ]
+        jobs.sort(key=lambda x: x.score, reverse=True)
+        run_id = history.add_run(dt_string, {**query_d, "resume": name}, jobs, "", source=matrix_file.name)
+        logger.info(f"Saved {name} as run {run_id}")
+    history.close()
+    instrumentation.export_metrics(f"matrix_{dt_string}", report)
+    logger.info("Script complete")
+
+
+def watch_key(prompt: str, resume: str) -> str:
+    """Identifies a watched search by its prompt, ignoring case and spacing, and the resume it is scored against."""
+    normalized = " ".join(prompt.lower().split())
+    return hashlib.sha256(f"{normalized}\n{resume_key(resume)}".encode()).hexdigest()[:16]
+
+
+def run_watch_workflow(
+    resume: str, prompt: str, top_n: int = 5, dedup: bool = True, compact: bool = False, cascade: bool = False
+) -> None:
+    """
+    Runs a watched search incrementally, scoring only postings it has not scored before.
+
+    The first run extracts the search from the prompt and fetches the last week, like run_workflow.
+    Every successful run stores the time it started as the search's watermark; later runs reuse
+    the extracted search without calling the LLM, fetch with the narrowest posting-age window that
+    covers the watermark, and score only postings none of the search's runs has scored, told apart
+    by URL or, without one, by content. Jobs whose scoring failed in an earlier run are scored
+    again. The new scores are saved as a run tagged with the search, and the merged ranking of all
+    of its runs is displayed. Gaps are folded into the resume's gap profile, so only new jobs are
+    summarized. A run with nothing new makes no LLM requests.
+
+    Args:
+        resume (str): The contents of the user's resume in plain text.
+        prompt (str): The search prompt.
+        top_n (int, optional): Number of jobs to display from the merged ranking. Defaults to 5.
+        dedup (bool, optional): Whether to collapse duplicate postings before scoring. Defaults to True.
+        compact (bool, optional): Whether to strip boilerplate from descriptions before scoring. Defaults to False.
+        cascade (bool, optional): Score with the small cascade model and escalate borderline jobs. Defaults to False.
+
+    Returns:
+        None
+    """
+    instrumentation.reset()
+    started = datetime.now(timezone.utc)
+    key = watch_key(prompt, resume)
+    history = RunHistory()
+    watch = history.get_watch(key)
+    if watch is None:
+        search_data = check_and_extract(prompt)
+        since = None
+    else:
+        search_data = WorkflowReqs.model_validate_json(watch["search"])
+        since = datetime.fromisoformat(watch["watermark"])
+    search_json = search_data.model_copy(update={"resume": None}).model_dump_json()
+    search_data.resume = resume
+    window = date_posted_window(since)
+    query_d = {
+        "keywords": search_data.keywords,
+        "city": search_data.city,
+        "hybrid": search_data.hybrid,
+        "watch": {"watch_key": key, "since": since.isoformat() if since else None, "date_posted": window},
+    }
+    queries = expand_queries(search_data)
+    if len(queries) > 1:
+        query_d["queries"] = [{"keywords": q.keywords, "city": q.city} for q in queries]
+    with instrumentation.span("fetch"):
+        if len(queries) == 1:
+            job_postings = fetch_posts(search_data, date_posted=window)
+        else:
+            job_postings = fetch_posts_multi(queries, date_posted=window)
+    seen = history.watched_job_keys(key)
+    new = [x for x in job_postings if job_key(x) not in seen]
+    # Postings whose scoring failed in an earlier run are older than the watermark, so they are
+    # usually not fetched again; score them again from the history.
+    fetched = {job_key(x) for x in new}
+    retried = [x for x in history.watched_failed_jobs(key) if job_key(x) not in fetched]
+    query_d["watch"].update({"fetched": len(job_postings), "new": len(new), "retried": len(retried)})
+    logger.info(
+        f"Watch {key}: {len(job_postings)} postings since {since or 'the last week'}, {len(new)} not scored before, "
+        f"{len(retried)} failed before and retried"
+    )
+    new += retried
+
+    run_id = None
+    if new:
+        to_score = new
+        compactor = Compactor() if compact else None
+        cascade_scorer = CascadeScorer() if cascade else None
+        if dedup:
+            with instrumentation.span("dedup"):
+                dedup_result = dedup_postings(
+                    new, resume, fingerprint=score_fingerprint(compactor=compactor, cascade=cascade_scorer)
+                )
+            query_d["dedup"] = {
+                "unique_postings": len(dedup_result.postings),
+                "to_score": len(dedup_result.to_score),
+                "reused_scores": dedup_result.reused,
+            }
+            new = dedup_result.postings
+            to_score = dedup_result.to_score
+        with instrumentation.span("score"):
+            scored = score_job_posts(resume, to_score, compactor=compactor, cascade=cascade_scorer)
+        if compactor is not None:
+            query_d["compaction"] = log_compaction(compactor)
+        if dedup:
+            dedup_result.remember(scored)
+            dedup_result.fan_out()
+        if cascade_scorer is not None:
+            query_d["cascade"] = log_cascade(cascade_scorer, new)
+        with instrumentation.span("gaps"):
+            gap_summary = identify_resume_gaps(new, resume=resume)
+        run_id = save_run(query_d, new, gap_summary, source=f"watch:{key}")
+    else:
+        logger.info("Nothing new since the last run")
+        gap_summary = GapProfile(resume).summary or "No gap analysis yet, no jobs scored above the threshold"
+    history.set_watch(key, search_json, started.isoformat(), run_id)
+    ranked = history.watched_jobs(key)
+    history.close()
+    print(f"{len(new)} new postings, {len(ranked)} ranked in total")
+    display_output(ranked, gap_summary, top_n=top_n)
+    logger.info("Script complete")
+
+
+def run_bulk_workflow(
+    resume: str,
+    prompt: str,
+    dedup: bool = True,
+    compact: bool = False,
+    gap_profile: bool = False,
+    local: bool = False,
+    poll_interval: Optional[float] = None,
+    timeout: Optional[float] = None,
+) -> None:
+    """
+    Scores a search through the OpenAI Batch API instead of interactive requests.
+
+    Fetches and deduplicates like run_workflow, then writes every pending scoring request to a
+    batch input file and submits it, waits for the batch and ingests its results into the
+    postings and the score cache, and saves the run. Each step is recorded in a manifest under
+    data/cache/batches; rerunning the same command while a batch is unfinished picks that run up
+    where it stopped instead of fetching again, so a bulk run survives restarts and timeouts.
+
+    Args:
+        resume (str): The contents of the user's resume in plain text.
+        prompt (str): The search prompt.
+        dedup (bool, optional): Whether to collapse duplicate postings before scoring. Defaults to True.
+        compact (bool, optional): Whether to strip boilerplate from descriptions before scoring. Defaults to False.
+        gap_profile (bool, optional): Fold the gaps into the resume's stored gap profile. Defaults to False.
+        local (bool, optional): Use the offline stand-in batch endpoint instead of OpenAI. Defaults to False.
+        poll_interval (float, optional): Seconds between status checks. Defaults to BATCH_POLL_INTERVAL_S.
+        timeout (float, optional): Stop waiting after this many seconds, leaving the run to resume. Defaults to waiting.
+
+    Returns:
+        None
+    """
+    instrumentation.reset()
+    if local:
+        client = LocalBatchClient()
+    else:
+        from scoring.oa_models import get_client
+        client = get_client()
+    prefix = watch_key(prompt, resume)
+    run = BulkRun.latest_unfinished(prefix)
+    if run is not None:
+        logger.info(f"Resuming bulk run {run.path.stem}, batch {run.state['batch_id']} ({run.state.get('batch_status')})")
+    else:
+        search_data = check_and_extract(prompt)
+        search_data.resume = resume
+        query_d = {
+            "keywords": search_data.keywords,
+            "city": search_data.city,
+            "hybrid": search_data.hybrid
+        }
+        queries = expand_queries(search_data)
+        if len(queries) > 1:
+            query_d["queries"] = [{"keywords": q.keywords, "city": q.city} for q in queries]
+        with instrumentation.span("fetch"):
+            job_postings = fetch_posts(search_data) if len(queries) == 1 else fetch_posts_multi(queries)
+        if len(job_postings) == 0:
+            logger.error("No job posts were returned from fetch. Exiting.")
+            return
+        to_score = job_postings
+        representative_of = None
+        model_name = LocalBatchClient.model if local else None
+        compactor = Compactor() if compact else None
+        if dedup:
+            with instrumentation.span("dedup"):
+                dedup_result = dedup_postings(job_postings, resume, fingerprint=bulk_fingerprint(model_name, compactor))
+            query_d["dedup"] = {
+                "unique_postings": len(dedup_result.postings),
+                "to_score": len(dedup_result.to_score),
+                "reused_scores": dedup_result.reused,
+            }
+            # Near duplicates of reused scores take them now; the rest are assigned their representative's result
+            dedup_result.fan_out()
+            job_postings = dedup_result.postings
+            to_score = dedup_result.to_score
+            representative_of = dedup_result.representative_of
+        dt_string = datetime.now(timezone.utc).strftime(format="%Y%m%d-%H%M%S")
+        with instrumentation.span("submit"):
+            run = submit_bulk_run(
+                BATCH_DIR / f"{prefix}-{dt_string}.json", resume, job_postings, to_score, query_d, client,
+                model_name=model_name, compactor=compactor,
+                representative_of=representative_of,
+            )
+        if compactor is not None:
+            run.state["query"]["compaction"] = log_compaction(compactor)
+            run.save()
+
+    with instrumentation.span("batch"):
+        kwargs = {"poll_interval": poll_interval} if poll_interval is not None else {}
+        scores = finish_bulk_run(run, client, timeout=timeout, **kwargs)
+    if scores is None:
+        return
+    query_d = run.state["query"]
+    query_d["bulk"] = {
+        key: run.state[key] for key in ("batch_id", "batch_status", "model", "requests", "from_cache")
+    }
+    query_d["bulk"]["failed"] = len(run.state["failed"])
+    with instrumentation.span("gaps"):
+        gap_summary = identify_resume_gaps(scores, resume=resume if gap_profile else None)
+    display_output(scores, gap_summary, top_n=5)
+    run.state["run_id"] = save_run(query_d, scores, gap_summary, source="bulk")
+    run.save()
     logger.info("Script complete")
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="LLM based job searches given a prompt")
-    parser.add_argument("-r", "--resume_path", type=Path, help="Path to local resume, currently only .txt format", required=True)
+    resume_group = parser.add_mutually_exclusive_group(required=True)
+    resume_group.add_argument("-r", "--resume_path", type=Path, help="Path to local resume, currently only .txt format")
+    resume_group.add_argument("--resume_dir", type=Path, help="Score every .txt resume in this directory against one fetch")
     parser.add_argument("-p", "--prompt", type=str, help="The LLM prompt", required=True)
+    parser.add_argument("-k", "--top_k", type=int, help="Only score the top K postings by lexical similarity to the resume")
+    parser.add_argument("--min_similarity", type=float, help="Only score postings with relative lexical similarity (0-1) at or above this")
+    parser.add_argument("--no_dedup", action="store_true", help="Score every posting, even duplicates and reposts")
+    parser.add_argument("--stream", action="store_true", help="Score postings as they are fetched instead of after the fetch completes")
+    parser.add_argument("--compact", action="store_true", help="Strip boilerplate from job descriptions before scoring")
+    parser.add_argument("--gap_profile", action="store_true", help="Fold this run's gaps into the resume's stored gap profile instead of summarizing from scratch")
+    parser.add_argument("-n", "--top_n", type=int, default=5, help="Jobs to display per resume with --resume_dir or --watch")
+    parser.add_argument("--watch", action="store_true", help="Only fetch and score postings newer than this search's last run, and show the merged ranking")
+    parser.add_argument("--cascade", action="store_true", help="Score with a small model first and re-score only borderline jobs with a large one")
+    parser.add_argument("--every", type=float, help="With --watch, repeat every this many hours instead of exiting")
+    parser.add_argument("--bulk", action="store_true", help="Score through the OpenAI Batch API at batch prices; rerun to resume an unfinished batch")
+    parser.add_argument("--local_batch", action="store_true", help="With --bulk, use the offline stand-in batch endpoint")
+    parser.add_argument("--poll", type=float, help="With --bulk, seconds between batch status checks")
+    parser.add_argument("--timeout", type=float, help="With --bulk, stop waiting after this many seconds and leave the batch to resume")
     args = parser.parse_args()
 
+    if args.resume_dir is not None:
+        resumes = read_resumes(args.resume_dir)
+        if not resumes:
+            logger.error(f"No .txt resumes in {args.resume_dir}! Exiting.")
+            exit(1)
+        if args.stream or args.top_k is not None or args.min_similarity is not None or args.gap_profile or args.cascade:
+            logger.warning("--stream, the lexical prefilter, --gap_profile and --cascade are ignored with --resume_dir")
+        logger.info(f"Scoring {len(resumes)} resumes from {args.resume_dir}")
+        prewarm_backend(max(resumes.values(), key=len))
+        run_matrix_workflow(
+            resumes, args.prompt, top_n=args.top_n, dedup=not args.no_dedup, compact=args.compact
+        )
+        exit(0)
+
     logger.info(f"Reading resume from {args.resume_path}")
     try:
         with open(args.resume_path) as f:
@@ -121,4 +703,42 @@ if __name__ == "__main__":
     except Exception as e:
         logger.error(f"Unable to read resume! Exiting. {e}")
         exit(1)
-    run_workflow(resume, args.prompt)
+    if not args.bulk:
+        prewarm_backend(resume, cascade=args.cascade)
+    if args.bulk:
+        if args.stream or args.watch or args.top_k is not None or args.min_similarity is not None or args.cascade:
+            logger.warning("--stream, --watch, the lexical prefilter and --cascade are ignored with --bulk")
+        run_bulk_workflow(
+            resume, args.prompt, dedup=not args.no_dedup, compact=args.compact, gap_profile=args.gap_profile,
+            local=args.local_batch, poll_interval=args.poll, timeout=args.timeout,
+        )
+    elif args.watch:
+        if args.stream or args.top_k is not None or args.min_similarity is not None:
+            logger.warning("--stream and the lexical prefilter are ignored with --watch")
+        while True:
+            try:
+                run_watch_workflow(
+                    resume, args.prompt, top_n=args.top_n, dedup=not args.no_dedup, compact=args.compact,
+                    cascade=args.cascade,
+                )
+            except Exception as e:
+                if args.every is None:
+                    raise
+                logger.error(f"Watch run failed, the watermark is unchanged: {e}")
+            if args.every is None:
+                break
+            logger.info(f"Next watch run in {args.every} hours")
+            time.sleep(args.every * 3600)
+    elif args.stream:
+        if args.top_k is not None or args.min_similarity is not None:
+            logger.warning("The lexical prefilter needs the whole fetch and is ignored with --stream")
+        run_stream_workflow(
+            resume, args.prompt, dedup=not args.no_dedup, compact=args.compact, gap_profile=args.gap_profile,
+            cascade=args.cascade,
+        )
+    else:
+        run_workflow(
+            resume, args.prompt, top_k=args.top_k, min_similarity=args.min_similarity,
+            dedup=not args.no_dedup, compact=args.compact, gap_profile=args.gap_profile,
+            cascade=args.cascade,
+        )
@@ -0,0 +1,376 @@
+import argparse
+from datetime import datetime, timedelta, timezone
+import json
+import logging
+from pathlib import Path
+import sqlite3
+import sys
+from typing import Any, Dict, Iterator, List, Optional
+
+from datamodels.models import JobInfo
+from job_boards.dedup import MISSING_URL
+
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+logger = logging.getLogger(__name__)
+
+DEFAULT_HISTORY_PATH = Path.cwd() / "data/cache/history.sqlite"
+DATE_FORMAT = "%Y%m%d-%H%M%S"
+# Identifies a job across the runs of a watched search: its URL, or its content when it has none
+_JOB_KEY = (
+    "CASE WHEN j.job_url = :missing THEN j.company || char(31) || j.job_title || char(31) "
+    "|| json_extract(j.data, '$.description') ELSE j.job_url END"
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    query_date TEXT NOT NULL,
+    keywords TEXT,
+    city TEXT,
+    query_params TEXT NOT NULL,
+    areas_of_improvement TEXT,
+    source TEXT
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id TEXT NOT NULL REFERENCES runs (run_id),
+    query_date TEXT NOT NULL,
+    job_url TEXT NOT NULL,
+    company TEXT NOT NULL,
+    job_title TEXT NOT NULL,
+    score REAL,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS watches (
+    watch_key TEXT PRIMARY KEY,
+    search TEXT NOT NULL,
+    watermark TEXT,
+    last_run_id TEXT,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_runs_query_date ON runs (query_date);
+CREATE INDEX IF NOT EXISTS idx_runs_source ON runs (source);
+CREATE INDEX IF NOT EXISTS idx_jobs_run ON jobs (run_id);
+CREATE INDEX IF NOT EXISTS idx_jobs_job_url ON jobs (job_url);
+CREATE INDEX IF NOT EXISTS idx_jobs_company ON jobs (company COLLATE NOCASE, query_date);
+CREATE INDEX IF NOT EXISTS idx_jobs_score ON jobs (score, query_date);
+CREATE INDEX IF NOT EXISTS idx_jobs_query_date ON jobs (query_date);
+"""
+
+
+def since_date(days: float) -> str:
+    """Returns the query_date string of days ago, for filtering."""
+    return (datetime.now(timezone.utc) - timedelta(days=days)).strftime(DATE_FORMAT)
+
+
+class RunHistory:
+    """
+    Append-only SQLite store of every run and the jobs it scored.
+
+    Each run is written once with its query parameters and gap summary; its jobs are kept
+    as full JobInfo records alongside indexed columns for job_url, company, score and query
+    date, so questions across runs do not need to load every run. Watched searches also keep
+    their watermark here, and their runs are tagged with the source "watch:<watch_key>".
+    """
+
+    def __init__(self, path: Path = DEFAULT_HISTORY_PATH):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        # Lets readers query while a run is being written
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(_SCHEMA)
+
+    def add_run(
+        self,
+        query_date: str,
+        query_params: Dict[str, Any],
+        jobs: List[JobInfo],
+        gap_summary: str,
+        run_id: Optional[str] = None,
+        source: Optional[str] = None,
+    ) -> Optional[str]:
+        """
+        Stores one run and its jobs in a single transaction.
+
+        Args:
+            query_date (str): When the run happened, e.g. 20250101-120000.
+            query_params (Dict[str, Any]): The search parameters and run metadata.
+            jobs (List[JobInfo]): The jobs of the run.
+            gap_summary (str): The run's areas of improvement.
+            run_id (str, optional): Store the run under this id, or not at all if it exists. Defaults to
+                query_date, suffixed with a counter if several runs share the same second.
+            source (str, optional): Where the run came from, e.g. an imported file.
+
+        Returns:
+            Optional[str]: The run_id, or None if the given run_id was already stored.
+        """
+        with self.conn:
+            candidates = [run_id] if run_id is not None else [query_date] + [f"{query_date}-{i}" for i in range(1, 100)]
+            for candidate in candidates:
+                inserted = self.conn.execute(
+                    "INSERT OR IGNORE INTO runs VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        candidate, query_date, query_params.get("keywords"), query_params.get("city"),
+                        json.dumps(query_params), gap_summary, source,
+                    ),
+                ).rowcount
+                if inserted:
+                    break
+            else:
+                return None
+            self.conn.executemany(
+                "INSERT INTO jobs (run_id, query_date, job_url, company, job_title, score, data) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (candidate, query_date, x.job_url, x.company, x.job_title, x.score, x.model_dump_json())
+                    for x in jobs
+                ],
+            )
+        return candidate
+
+    def iter_jobs(
+        self,
+        run_id: Optional[str] = None,
+        company: Optional[str] = None,
+        job_url: Optional[str] = None,
+        min_score: Optional[float] = None,
+        since: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[JobInfo]:
+        """
+        Streams stored jobs matching every given filter, best score first within each run, newest run first.
+
+        Args:
+            run_id (str, optional): Only jobs of this run.
+            company (str, optional): Only jobs at this company, case-insensitive.
+            job_url (str, optional): Only this posting, across runs.
+            min_score (float, optional): Only jobs scored at least this.
+            since (str, optional): Only runs on or after this query_date, see since_date.
+            limit (int, optional): Stop after this many jobs.
+
+        Yields:
+            JobInfo: Each matching job, read from the database as it is consumed.
+        """
+        query = "SELECT data FROM jobs WHERE 1 = 1"
+        params: List[Any] = []
+        if run_id is not None:
+            query += " AND run_id = ?"
+            params.append(run_id)
+        if company is not None:
+            query += " AND company = ? COLLATE NOCASE"
+            params.append(company)
+        if job_url is not None:
+            query += " AND job_url = ?"
+            params.append(job_url)
+        if min_score is not None:
+            query += " AND score >= ?"
+            params.append(min_score)
+        if since is not None:
+            query += " AND query_date >= ?"
+            params.append(since)
+        query += " ORDER BY query_date DESC, score DESC, id"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        for (data,) in self.conn.execute(query, params):
+            yield JobInfo.model_validate_json(data)
+
+    def runs(self, since: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Lists stored runs, newest first, with their job counts and best score."""
+        rows = self.conn.execute(
+            "SELECT r.run_id, r.keywords, r.city, COUNT(j.id), MAX(j.score) FROM runs r "
+            "LEFT JOIN jobs j ON j.run_id = r.run_id WHERE r.query_date >= ? "
+            "GROUP BY r.run_id ORDER BY r.query_date DESC, r.rowid DESC",
+            (since or "",),
+        )
+        return [
+            {"run_id": x[0], "keywords": x[1], "city": x[2], "jobs": x[3], "best_score": x[4]}
+            for x in rows
+        ]
+
+    def latest_run_id(self) -> Optional[str]:
+        row = self.conn.execute("SELECT run_id FROM runs ORDER BY query_date DESC, rowid DESC LIMIT 1").fetchone()
+        return row[0] if row else None
+
+    def get_run(self, run_id: str) -> Optional[Dict[str, Any]]:
+        """Returns a run in the layout of the old jobs_*.json cache files."""
+        row = self.conn.execute(
+            "SELECT query_date, query_params, areas_of_improvement FROM runs WHERE run_id = ?", (run_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {
+            "run_id": run_id,
+            "query_date": row[0],
+            "query_params": json.loads(row[1]),
+            "jobs": [x.model_dump() for x in self.iter_jobs(run_id=run_id)],
+            "areas_of_improvement": row[2],
+        }
+
+    def import_json(self, path: Path) -> bool:
+        """Imports one jobs_*.json cache file. Returns False if its run was already stored."""
+        with open(path) as f:
+            data = json.load(f)
+        jobs = [JobInfo.model_validate(x) for x in data["jobs"]]
+        run_id = self.add_run(
+            data["query_date"], data.get("query_params", {}), jobs, data.get("areas_of_improvement", ""),
+            run_id=data["query_date"], source=str(path),
+        )
+        return run_id is not None
+
+    def get_watch(self, watch_key: str) -> Optional[Dict[str, Any]]:
+        """Returns a watched search's extracted search JSON, watermark and last run, or None if it is new."""
+        row = self.conn.execute(
+            "SELECT search, watermark, last_run_id, updated_at FROM watches WHERE watch_key = ?", (watch_key,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {"search": row[0], "watermark": row[1], "last_run_id": row[2], "updated_at": row[3]}
+
+    def set_watch(self, watch_key: str, search: str, watermark: str, last_run_id: Optional[str] = None) -> None:
+        """
+        Records a successful query of a watched search.
+
+        Args:
+            watch_key (str): Identifies the search and resume, see main.watch_key.
+            search (str): The extracted search as WorkflowReqs JSON, reused instead of re-extracting the prompt.
+            watermark (str): ISO time the query started; the next query fetches postings newer than this.
+            last_run_id (str, optional): The run that stored the newly scored jobs. Keeps the previous one if None.
+        """
+        now = datetime.now(timezone.utc).isoformat()
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO watches VALUES (?, ?, ?, ?, ?) ON CONFLICT (watch_key) DO UPDATE SET "
+                "search = excluded.search, watermark = excluded.watermark, "
+                "last_run_id = COALESCE(excluded.last_run_id, last_run_id), updated_at = excluded.updated_at",
+                (watch_key, search, watermark, last_run_id, now),
+            )
+
+    def watched_job_keys(self, watch_key: str) -> set:
+        """
+        Returns the job_key of every job already scored by a watched search. Jobs whose scoring failed
+        (score -1) are left out, so a later run scores them again.
+        """
+        rows = self.conn.execute(
+            f"SELECT DISTINCT {_JOB_KEY} FROM jobs j JOIN runs r ON r.run_id = j.run_id "
+            "WHERE r.source = :source AND j.score >= 0",
+            {"source": f"watch:{watch_key}", "missing": MISSING_URL},
+        )
+        return {x[0] for x in rows}
+
+    def watched_failed_jobs(self, watch_key: str) -> List[JobInfo]:
+        """Returns the jobs of a watched search whose latest scoring failed, to retry on the next run."""
+        rows = self.conn.execute(
+            "SELECT data FROM jobs WHERE id IN (SELECT MAX(j.id) FROM jobs j JOIN runs r ON r.run_id = j.run_id "
+            f"WHERE r.source = :source GROUP BY {_JOB_KEY}) AND score < 0 ORDER BY id",
+            {"source": f"watch:{watch_key}", "missing": MISSING_URL},
+        )
+        return [JobInfo.model_validate_json(x[0]) for x in rows]
+
+    def watched_jobs(self, watch_key: str, limit: Optional[int] = None) -> List[JobInfo]:
+        """
+        Returns the merged ranking of a watched search: every job any of its runs scored, best first.
+
+        A job scored by several runs, e.g. a retried one, keeps its latest score. Jobs are told
+        apart by job_key, so postings without a URL are not merged into one.
+        """
+        query = (
+            "SELECT data FROM jobs WHERE id IN (SELECT MAX(j.id) FROM jobs j JOIN runs r ON r.run_id = j.run_id "
+            f"WHERE r.source = :source GROUP BY {_JOB_KEY}) ORDER BY score DESC, id DESC"
+        )
+        params: Dict[str, Any] = {"source": f"watch:{watch_key}", "missing": MISSING_URL}
+        if limit is not None:
+            query += " LIMIT :limit"
+            params["limit"] = limit
+        return [JobInfo.model_validate_json(x[0]) for x in self.conn.execute(query, params)]
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+def job_key(job: JobInfo) -> str:
+    """Identifies a job across the runs of a watched search: its URL, or its content when it has none."""
+    if job.job_url != MISSING_URL:
+        return job.job_url
+    return "\x1f".join((job.company, job.job_title, job.description))
+
+
+def load_jobs(source: str, history_path: Path = DEFAULT_HISTORY_PATH) -> List[JobInfo]:
+    """
+    Loads the jobs of one run from a run_id in the history store, "latest", or a legacy jobs_*.json file.
+
+    Args:
+        source (str): A run_id, "latest", or the path of a JSON cache file.
+        history_path (Path, optional): The history database. Defaults to DEFAULT_HISTORY_PATH.
+
+    Returns:
+        List[JobInfo]: The run's jobs, best score first.
+    """
+    if source.endswith(".json") and Path(source).exists():
+        with open(source) as f:
+            return [JobInfo.model_validate(x) for x in json.load(f)["jobs"]]
+    history = RunHistory(history_path)
+    run_id = history.latest_run_id() if source == "latest" else source
+    jobs = list(history.iter_jobs(run_id=run_id)) if run_id else []
+    history.close()
+    if not jobs:
+        raise LookupError(f"No run {source!r} in {history_path}")
+    return jobs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query the run history")
+    parser.add_argument("--path", type=Path, default=DEFAULT_HISTORY_PATH)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = subparsers.add_parser("import", help="Import jobs_*.json cache files")
+    import_parser.add_argument("files", type=Path, nargs="*", help="Defaults to data/cache/jobs_*.json")
+
+    runs_parser = subparsers.add_parser("runs", help="List runs")
+    runs_parser.add_argument("--since_days", type=float)
+
+    jobs_parser = subparsers.add_parser("jobs", help="List jobs across runs")
+    jobs_parser.add_argument("--run_id", type=str, help="A run_id, or 'latest'")
+    jobs_parser.add_argument("--company", type=str)
+    jobs_parser.add_argument("--job_url", type=str)
+    jobs_parser.add_argument("--min_score", type=float)
+    jobs_parser.add_argument("--since_days", type=float)
+    jobs_parser.add_argument("--limit", type=int)
+    jobs_parser.add_argument("--jsonl", action="store_true", help="Print full JobInfo records as JSON lines")
+
+    export_parser = subparsers.add_parser("export", help="Print one run as JSON, in the old cache file layout")
+    export_parser.add_argument("run_id", type=str, help="A run_id, or 'latest'")
+    args = parser.parse_args()
+
+    history = RunHistory(args.path)
+    if args.command == "import":
+        files = args.files or sorted(args.path.parent.glob("jobs_*.json"))
+        imported = sum(history.import_json(x) for x in files)
+        logger.info(f"Imported {imported} of {len(files)} files, the rest were already stored")
+    elif args.command == "runs":
+        since = since_date(args.since_days) if args.since_days is not None else None
+        for run in history.runs(since):
+            print(f"{run['run_id']}  {run['jobs']:>4} jobs  best {run['best_score']}  {run['keywords']} / {run['city']}")
+    elif args.command == "jobs":
+        run_id = history.latest_run_id() if args.run_id == "latest" else args.run_id
+        since = since_date(args.since_days) if args.since_days is not None else None
+        jobs = history.iter_jobs(run_id, args.company, args.job_url, args.min_score, since, args.limit)
+        for job in jobs:
+            if args.jsonl:
+                print(job.model_dump_json())
+            else:
+                print(f"{job.score:>5} | {job.company} | {job.job_title} | {job.job_url}")
+    elif args.command == "export":
+        run_id = history.latest_run_id() if args.run_id == "latest" else args.run_id
+        run = history.get_run(run_id) if run_id else None
+        if run is None:
+            sys.exit(f"No run {args.run_id!r} in {args.path}")
+        json.dump(run, sys.stdout, indent=4)
+        print()
+    history.close()
@@ -0,0 +1,47 @@
+import importlib
+import logging
+from typing import Any, Dict, Optional
+
+from config import AI_BACKEND
+
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+logger = logging.getLogger(__name__)
+
+# Backend name -> module path, replaced by the imported module on first use. Any object with
+# the same functions as scoring.oa_models can be registered, e.g. a fake for benchmarks.
+BACKENDS: Dict[str, Any] = {
+    "openai": "scoring.oa_models",
+    "ollama": "scoring.ollama_models",
+}
+
+
+def register_backend(name: str, backend: Any) -> None:
+    """Registers a backend under name, either as a module path to import lazily or as a ready object."""
+    BACKENDS[name] = backend
+
+
+def get_backend(name: Optional[str] = None) -> Any:
+    """
+    Returns the scoring backend, importing its SDK the first time it is requested.
+
+    Args:
+        name (str, optional): The backend name. Defaults to AI_BACKEND.
+
+    Returns:
+        Any: The backend module (or registered object) providing check_search_prompt, extract_reqs,
+            their async counterparts, score_resume, async_score_resume, async_score_resume_batch, summarize_gaps, model
+            and the prompt versions.
+    """
+    name = name or AI_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown AI_BACKEND: {name}. Must be one of {', '.join(repr(x) for x in BACKENDS)}.")
+    backend = BACKENDS[name]
+    if isinstance(backend, str):
+        logger.debug(f"Loading {name} backend from {backend}")
+        backend = BACKENDS[name] = importlib.import_module(backend)
+    return backend
@@ -0,0 +1,499 @@
+import json
+import logging
+from pathlib import Path
+import re
+import time
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional
+import uuid
+
+from config import BATCH_COMPLETION_WINDOW, BATCH_POLL_INTERVAL_S, SCORE_CACHE_ENABLED, SCORE_CACHE_MAX_AGE_DAYS, SCORE_CACHE_MAX_ENTRIES
+from datamodels.models import JDScore, JobInfo
+from instrumentation import BATCH_STAGE, record_llm_call
+from .compaction import Compactor
+from .score_cache import ScoreCache, make_key
+from .tokens import estimate_message_tokens, estimate_tokens
+
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+logger = logging.getLogger(__name__)
+
+BATCH_DIR = Path.cwd() / "data/cache/batches"
+ENDPOINT = "/v1/chat/completions"
+# A batch in one of these states will not change any more; expired and cancelled batches
+# still have an output file with the requests that finished in time
+TERMINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+# Bulk runs are scored by the Batch API, so their scores are cached as the OpenAI backend's
+CACHE_BACKEND = "openai"
+
+
+def batch_line(custom_id: str, resume: str, description: str, model_name: str) -> Dict[str, Any]:
+    """One request of a Batch API input file, the same chat completion score_resume sends."""
+    from . import oa_models
+    return {
+        "custom_id": custom_id,
+        "method": "POST",
+        "url": ENDPOINT,
+        "body": oa_models.score_request_body(resume, description, model_name),
+    }
+
+
+def parse_output_line(line: Dict[str, Any]) -> JDScore:
+    """
+    Reads the score out of one line of a batch output or error file.
+
+    Raises:
+        ValueError: The request failed, or its completion is not a valid JDScore.
+    """
+    response = line.get("response") or {}
+    if line.get("error") or response.get("status_code") != 200:
+        error = line.get("error") or response.get("body", {}).get("error") or {}
+        raise ValueError(f"{error.get('code', response.get('status_code'))}: {error.get('message', 'request failed')}")
+    content = response["body"]["choices"][0]["message"]["content"]
+    return JDScore.model_validate_json(content)
+
+
+def _record_usage(line: Dict[str, Any]) -> None:
+    body = line["response"]["body"]
+    usage = body.get("usage")
+    if not usage:
+        return
+    details = usage.get("prompt_tokens_details") or {}
+    record_llm_call(
+        backend="openai",
+        model=body["model"],
+        stage=BATCH_STAGE,
+        latency=0.0,
+        prompt_tokens=usage.get("prompt_tokens", 0),
+        completion_tokens=usage.get("completion_tokens", 0),
+        cached_tokens=details.get("cached_tokens") or 0,
+    )
+
+
+class BulkRun:
+    """
+    State of one bulk scoring run, kept in a JSON manifest next to its batch input file.
+
+    The manifest is rewritten after every step: submission, each status check and ingestion.
+    It holds everything needed to finish the run in another process: the search metadata, the
+    resume, the postings, which score cache key each posting takes its score from, the batch
+    ids and the scores ingested so far. Score cache keys double as the batch custom_ids, so a
+    posting, its near duplicates and later interactive runs all resolve to the same result.
+
+    Attributes:
+        path (Path): The manifest file.
+        state (Dict[str, Any]): The manifest contents.
+    """
+
+    def __init__(self, path: Path, state: Dict[str, Any]):
+        self.path = path
+        self.state = state
+
+    @classmethod
+    def load(cls, path: Path) -> "BulkRun":
+        with open(path) as f:
+            return cls(path, json.load(f))
+
+    @classmethod
+    def latest_unfinished(cls, prefix: str, directory: Path = BATCH_DIR) -> Optional["BulkRun"]:
+        """Returns the newest run whose manifest name starts with prefix and that has not been saved yet, or None."""
+        for path in sorted(directory.glob(f"{prefix}-*.json"), reverse=True):
+            run = cls.load(path)
+            if run.state.get("run_id") is None:
+                return run
+        return None
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            json.dump(self.state, f, indent=2)
+        tmp.replace(self.path)
+
+    @property
+    def status(self) -> str:
+        return self.state["status"]
+
+    def jobs(self) -> List[JobInfo]:
+        """Returns the run's postings with every score ingested so far applied; a failed request scores -1."""
+        jobs = [JobInfo.model_validate(x) for x in self.state["jobs"]]
+        results = self.state["results"]
+        failed = self.state["failed"]
+        for i, key in self.state["assignments"]:
+            if key in results:
+                jobs[i].score = results[key]["score"]
+                jobs[i].explanation = results[key]["explanation"]
+            elif key in failed:
+                jobs[i].score = -1
+                jobs[i].explanation = "Comparison failed"
+        return jobs
+
+
+def bulk_fingerprint(model_name: Optional[str] = None, compactor: Optional[Compactor] = None) -> Dict[str, Any]:
+    """How a bulk run scores, in the shape of job_posts.score_fingerprint, for reusing earlier scores."""
+    from . import oa_models
+    return {
+        "backend": CACHE_BACKEND,
+        "model_id": model_name or oa_models.model,
+        "prompt_version": oa_models.SCORE_PROMPT_VERSION,
+        "compacted": compactor is not None,
+    }
+
+
+def submit_bulk_run(
+    path: Path,
+    resume: str,
+    job_postings: List[JobInfo],
+    to_score: List[JobInfo],
+    query: Dict[str, Any],
+    client: Any,
+    model_name: Optional[str] = None,
+    compactor: Optional[Compactor] = None,
+    representative_of: Optional[Callable[[JobInfo], Optional[JobInfo]]] = None,
+) -> BulkRun:
+    """
+    Writes every pending scoring request to a Batch API input file and submits it.
+
+    Postings already in the persistent score cache are resolved on the spot and identical
+    requests are sent once. A run with nothing left to score is complete without a batch.
+
+    Args:
+        path (Path): Where to keep the manifest; the input file is written beside it.
+        resume (str): The plain text content of the candidate's resume.
+        job_postings (List[JobInfo]): Every posting of the run, as displayed and saved.
+        to_score (List[JobInfo]): The postings among them that need a score.
+        query (Dict[str, Any]): The run's query metadata, saved with the run once it is scored.
+        client (Any): An OpenAI client, or a LocalBatchClient.
+        model_name (str, optional): Model to score with. Defaults to the OpenAI backend's model.
+        compactor (Compactor, optional): Shrinks descriptions before scoring. Defaults to no compaction.
+        representative_of (Callable, optional): Maps a near duplicate to the posting whose score it shares,
+            e.g. Deduper.representative_of.
+
+    Returns:
+        BulkRun: The saved manifest, "submitted", or "ingested" if nothing needed a request.
+    """
+    # The OpenAI SDK is only imported once a bulk run starts, like the backend registry does
+    from . import oa_models
+    model_name = model_name or oa_models.model
+    prompt_version = oa_models.SCORE_PROMPT_VERSION
+    texts = compactor.compact_all(to_score) if compactor is not None else [x.description for x in to_score]
+    keys = {id(job): make_key(resume, text, CACHE_BACKEND, model_name, prompt_version) for job, text in zip(to_score, texts)}
+    assignments = []
+    for i, job in enumerate(job_postings):
+        source = job if id(job) in keys else (representative_of(job) if representative_of else None)
+        if source is not None and id(source) in keys:
+            assignments.append([i, keys[id(source)]])
+
+    results = {}
+    if SCORE_CACHE_ENABLED:
+        cache = ScoreCache(max_entries=SCORE_CACHE_MAX_ENTRIES, max_age_days=SCORE_CACHE_MAX_AGE_DAYS)
+        for key in set(keys.values()):
+            cached = cache.get(key)
+            if cached is not None:
+                results[key] = cached.model_dump()
+        cache.close()
+    lines = {}
+    for job, text in zip(to_score, texts):
+        key = keys[id(job)]
+        if key not in results and key not in lines:
+            lines[key] = batch_line(key, resume, text, model_name)
+
+    run = BulkRun(path, {
+        "created_at": time.time(),
+        "status": "submitted" if lines else "ingested",
+        "model": model_name,
+        "prompt_version": prompt_version,
+        "query": query,
+        "resume": resume,
+        "jobs": [x.model_dump() for x in job_postings],
+        "assignments": assignments,
+        "requests": len(lines),
+        "from_cache": len(results),
+        "input_file_id": None,
+        "batch_id": None,
+        "output_file_id": None,
+        "error_file_id": None,
+        "results": results,
+        "failed": {},
+        "run_id": None,
+    })
+    logger.info(f"Bulk run {path.stem}: {len(results)} scores from cache, {len(lines)} requests to submit")
+    if lines:
+        input_path = path.with_suffix(".jsonl")
+        input_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(input_path, "w") as f:
+            for line in lines.values():
+                f.write(json.dumps(line) + "\n")
+        with open(input_path, "rb") as f:
+            run.state["input_file_id"] = client.files.create(file=f, purpose="batch").id
+        run.save()
+        submit_batch(run, client)
+    run.save()
+    return run
+
+
+def submit_batch(run: BulkRun, client: Any) -> None:
+    """Creates the batch for a run whose input file is uploaded but whose batch was never created."""
+    batch = client.batches.create(
+        input_file_id=run.state["input_file_id"],
+        endpoint=ENDPOINT,
+        completion_window=BATCH_COMPLETION_WINDOW,
+        metadata={"bulk_run": run.path.stem},
+    )
+    run.state["batch_id"] = batch.id
+    run.state["batch_status"] = batch.status
+    run.save()
+    logger.info(f"Submitted batch {batch.id} with {run.state['requests']} requests")
+
+
+def wait_for_batch(
+    run: BulkRun, client: Any, poll_interval: float = BATCH_POLL_INTERVAL_S, timeout: Optional[float] = None
+) -> bool:
+    """
+    Polls the run's batch until it reaches a terminal status, recording each status in the manifest.
+
+    Args:
+        run (BulkRun): A submitted run.
+        client (Any): An OpenAI client, or a LocalBatchClient.
+        poll_interval (float, optional): Seconds between status checks. Defaults to BATCH_POLL_INTERVAL_S.
+        timeout (float, optional): Give up after this many seconds, leaving the run to be resumed. Defaults to waiting.
+
+    Returns:
+        bool: Whether the batch finished.
+    """
+    if run.state["batch_id"] is None:
+        submit_batch(run, client)
+    start = time.monotonic()
+    while True:
+        batch = client.batches.retrieve(run.state["batch_id"])
+        counts = batch.request_counts
+        if batch.status != run.state.get("batch_status"):
+            progress = f", {counts.completed + counts.failed} of {counts.total} done" if counts else ""
+            logger.info(f"Batch {batch.id}: {batch.status}{progress}")
+        run.state.update({
+            "batch_status": batch.status,
+            "output_file_id": batch.output_file_id,
+            "error_file_id": batch.error_file_id,
+        })
+        run.save()
+        if batch.status in TERMINAL_STATUSES:
+            return True
+        if timeout is not None and time.monotonic() - start + poll_interval > timeout:
+            logger.info(f"Batch {batch.id} is still {batch.status}, rerun the same command to resume")
+            return False
+        time.sleep(poll_interval)
+
+
+def ingest_batch(run: BulkRun, client: Any) -> Dict[str, int]:
+    """
+    Reads a finished batch's output and error files into the run and the persistent score cache.
+
+    Ingestion is idempotent: lines already ingested are skipped, the score cache upserts, and
+    the manifest is only updated after the cache commits. A run interrupted halfway ingests the
+    rest when it is resumed. Requests the batch never answered, e.g. when it expired, count as failed.
+
+    Returns:
+        Dict[str, int]: Counts of scores ingested now, already ingested before, and failed requests.
+    """
+    results = run.state["results"]
+    failed = run.state["failed"]
+    counts = {"ingested": 0, "already_ingested": 0, "failed": 0}
+    cache = ScoreCache(max_entries=SCORE_CACHE_MAX_ENTRIES, max_age_days=SCORE_CACHE_MAX_AGE_DAYS) if SCORE_CACHE_ENABLED else None
+    for file_id in (run.state["output_file_id"], run.state["error_file_id"]):
+        if file_id is None:
+            continue
+        for raw in client.files.content(file_id).text.splitlines():
+            if not raw.strip():
+                continue
+            line = json.loads(raw)
+            key = line["custom_id"]
+            if key in results:
+                counts["already_ingested"] += 1
+                continue
+            try:
+                result = parse_output_line(line)
+            except Exception as e:
+                failed[key] = str(e)
+                continue
+            _record_usage(line)
+            results[key] = result.model_dump()
+            failed.pop(key, None)
+            counts["ingested"] += 1
+            if cache is not None:
+                cache.put(key, result, CACHE_BACKEND, run.state["model"], run.state["prompt_version"])
+    for _, key in run.state["assignments"]:
+        if key not in results and key not in failed:
+            failed[key] = f"No result, batch {run.state['batch_status']}"
+    counts["failed"] = len(failed)
+    if cache is not None:
+        cache.evict()
+        cache.close()
+    run.state["status"] = "ingested"
+    run.save()
+    logger.info(f"Bulk run {run.path.stem}: {counts}")
+    return counts
+
+
+def finish_bulk_run(
+    run: BulkRun, client: Any, poll_interval: float = BATCH_POLL_INTERVAL_S, timeout: Optional[float] = None
+) -> Optional[List[JobInfo]]:
+    """
+    Waits for a submitted run's batch and ingests it; a run that is already ingested is left as is.
+
+    Returns:
+        List[JobInfo]: The run's postings with their scores, or None if the batch is still running after timeout.
+    """
+    if run.status == "submitted":
+        if not wait_for_batch(run, client, poll_interval, timeout):
+            return None
+        ingest_batch(run, client)
+    return run.jobs()
+
+
+def lexical_responder(body: Dict[str, Any]) -> str:
+    """
+    Default scorer of the local stand-in: the share of the job description's terms found in
+    the resume, on the 0-10 scale. It needs no model, so the bulk flow can be exercised offline.
+    """
+    def terms(text: str) -> set:
+        return set(re.findall(r"[a-z][a-z0-9+#]{2,}", text.lower()))
+
+    messages = body["messages"]
+    resume = terms(messages[1]["content"])
+    job = terms(messages[-1]["content"])
+    matched = len(job & resume)
+    score = round(10 * matched / len(job), 1) if job else 0.0
+    return JDScore(
+        score=score, explanation=f"Local stand-in: {matched} of {len(job)} job description terms appear in the resume"
+    ).model_dump_json()
+
+
+class LocalBatchClient:
+    """
+    Offline stand-in for the parts of the OpenAI client the bulk flow uses: files.create,
+    files.content, batches.create and batches.retrieve.
+
+    Files and batches are kept under a directory, so a run submitted by one process can be
+    polled and ingested by another, as with the real endpoint. A batch is validating when
+    created, in progress on the first status check, and completes on the first check after
+    delay seconds, when every request is answered by responder. Requests whose custom_id falls
+    in the fail_rate share get an error line instead, to exercise partial failures.
+
+    Args:
+        directory (Path, optional): Where files and batches are stored. Defaults to data/cache/batches/local.
+        responder (Callable, optional): Returns the completion content for a request body. Defaults to lexical_responder.
+        delay (float, optional): Seconds a batch takes to complete. Defaults to 0.
+        fail_rate (float, optional): Share of requests that fail. Defaults to 0.
+    """
+
+    model = "local-batch-stand-in"
+
+    def __init__(
+        self,
+        directory: Path = BATCH_DIR / "local",
+        responder: Callable[[Dict[str, Any]], str] = lexical_responder,
+        delay: float = 0.0,
+        fail_rate: float = 0.0,
+    ):
+        self.directory = directory
+        self.responder = responder
+        self.delay = delay
+        self.fail_rate = fail_rate
+        (directory / "files").mkdir(parents=True, exist_ok=True)
+        (directory / "batches").mkdir(parents=True, exist_ok=True)
+        self.files = SimpleNamespace(create=self._create_file, content=self._file_content)
+        self.batches = SimpleNamespace(create=self._create_batch, retrieve=self._retrieve_batch)
+
+    def _write_file(self, data: bytes) -> str:
+        file_id = f"file-local-{uuid.uuid4().hex[:16]}"
+        (self.directory / "files" / file_id).write_bytes(data)
+        return file_id
+
+    def _create_file(self, file: Any, purpose: str) -> SimpleNamespace:
+        data = file.read() if hasattr(file, "read") else Path(file).read_bytes()
+        return SimpleNamespace(id=self._write_file(data), purpose=purpose, bytes=len(data))
+
+    def _file_content(self, file_id: str) -> SimpleNamespace:
+        return SimpleNamespace(text=(self.directory / "files" / file_id).read_text())
+
+    def _batch_path(self, batch_id: str) -> Path:
+        return self.directory / "batches" / f"{batch_id}.json"
+
+    def _create_batch(
+        self, input_file_id: str, endpoint: str, completion_window: str, metadata: Optional[Dict[str, str]] = None
+    ) -> SimpleNamespace:
+        if endpoint != ENDPOINT:
+            raise ValueError(f"The local stand-in only serves {ENDPOINT}, not {endpoint}")
+        total = len(self._file_content(input_file_id).text.splitlines())
+        batch = {
+            "id": f"batch-local-{uuid.uuid4().hex[:16]}",
+            "status": "validating",
+            "input_file_id": input_file_id,
+            "created_at": time.time(),
+            "completion_window": completion_window,
+            "metadata": metadata or {},
+            "output_file_id": None,
+            "error_file_id": None,
+            "request_counts": {"total": total, "completed": 0, "failed": 0},
+        }
+        self._batch_path(batch["id"]).write_text(json.dumps(batch))
+        return self._as_batch(batch)
+
+    def _retrieve_batch(self, batch_id: str) -> SimpleNamespace:
+        path = self._batch_path(batch_id)
+        batch = json.loads(path.read_text())
+        if batch["status"] == "validating":
+            batch["status"] = "in_progress"
+        elif batch["status"] == "in_progress" and time.time() - batch["created_at"] >= self.delay:
+            self._process(batch)
+        path.write_text(json.dumps(batch))
+        return self._as_batch(batch)
+
+    def _fails(self, custom_id: str) -> bool:
+        return int(custom_id[:8], 16) / 16**8 < self.fail_rate if re.fullmatch(r"[0-9a-f]{8,}", custom_id) else False
+
+    def _process(self, batch: Dict[str, Any]) -> None:
+        outputs, errors = [], []
+        for raw in self._file_content(batch["input_file_id"]).text.splitlines():
+            request = json.loads(raw)
+            line = {"id": f"batch_req_{uuid.uuid4().hex[:16]}", "custom_id": request["custom_id"], "response": None, "error": None}
+            try:
+                if self._fails(request["custom_id"]):
+                    raise RuntimeError("Simulated failure of the local stand-in")
+                body = request["body"]
+                content = self.responder(body)
+                prompt_tokens = estimate_message_tokens(body["messages"])
+                completion_tokens = estimate_tokens(content)
+                line["response"] = {
+                    "status_code": 200,
+                    "request_id": uuid.uuid4().hex,
+                    "body": {
+                        "id": f"chatcmpl-local-{uuid.uuid4().hex[:16]}",
+                        "object": "chat.completion",
+                        "model": body["model"],
+                        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                        "usage": {
+                            "prompt_tokens": prompt_tokens,
+                            "completion_tokens": completion_tokens,
+                            "total_tokens": prompt_tokens + completion_tokens,
+                        },
+                    },
+                }
+                outputs.append(line)
+            except Exception as e:
+                line["error"] = {"code": "server_error", "message": str(e)}
+                errors.append(line)
+        if outputs:
+            batch["output_file_id"] = self._write_file("".join(json.dumps(x) + "\n" for x in outputs).encode())
+        if errors:
+            batch["error_file_id"] = self._write_file("".join(json.dumps(x) + "\n" for x in errors).encode())
+        batch["request_counts"].update({"completed": len(outputs), "failed": len(errors)})
+        batch["status"] = "completed"
+
+    @staticmethod
+    def _as_batch(batch: Dict[str, Any]) -> SimpleNamespace:
+        return SimpleNamespace(**{**batch, "request_counts": SimpleNamespace(**batch["request_counts"])})
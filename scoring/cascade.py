@@ -0,0 +1,151 @@
+import json
+import logging
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from config import CASCADE_ESCALATE_MAX, CASCADE_ESCALATE_MIN, CASCADE_LARGE_MODEL, CASCADE_SMALL_MODEL
+from datamodels.models import JDScore, JobInfo, LLMCallUsage
+import instrumentation
+from .backends import get_backend
+
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+logger = logging.getLogger(__name__)
+
+DEFAULT_EVAL_DIR = Path.cwd() / "data/cache"
+
+
+class CascadeScorer:
+    """
+    Scores every job with a small model and re-scores only borderline jobs with a large one.
+
+    An instance is an async score function for the scoring engine. A job the small model
+    scores within [low, high], or fails to score, is escalated and takes the large model's
+    score. Scores outside the band are clear enough misses or matches to keep.
+
+    Args:
+        small_model (str, optional): First-tier model. Defaults to CASCADE_SMALL_MODEL.
+        large_model (str, optional): Model for escalated jobs. Defaults to CASCADE_LARGE_MODEL.
+        low (float, optional): Lowest first-tier score escalated. Defaults to CASCADE_ESCALATE_MIN.
+        high (float, optional): Highest first-tier score escalated. Defaults to CASCADE_ESCALATE_MAX.
+        backend (Any, optional): Provides async_score_resume with a model_name override. Defaults to get_backend().
+    """
+
+    def __init__(
+        self,
+        small_model: str = CASCADE_SMALL_MODEL,
+        large_model: str = CASCADE_LARGE_MODEL,
+        low: float = CASCADE_ESCALATE_MIN,
+        high: float = CASCADE_ESCALATE_MAX,
+        backend: Any = None,
+    ):
+        if low > high:
+            raise ValueError(f"The escalation band is empty: low {low} is above high {high}")
+        self.small_model = small_model
+        self.large_model = large_model
+        self.low = low
+        self.high = high
+        self.backend = backend or get_backend()
+        self.jobs = 0
+        self.escalated = 0
+
+    @property
+    def model(self) -> str:
+        """Identifies the cascade in the score cache, since its scores depend on both models and the band."""
+        return f"cascade:{self.small_model}>{self.large_model}@{self.low:g}-{self.high:g}"
+
+    def should_escalate(self, score: JDScore) -> bool:
+        return score.score < 0 or self.low <= score.score <= self.high
+
+    async def __call__(self, resume_text: str, job_description: str) -> JDScore:
+        self.jobs += 1
+        try:
+            first = await self.backend.async_score_resume(resume_text, job_description, model_name=self.small_model)
+            if not self.should_escalate(first):
+                return first
+        except Exception as e:
+            logger.warning(f"{self.small_model} failed to score, escalating to {self.large_model}: {e}")
+        self.escalated += 1
+        return await self.backend.async_score_resume(resume_text, job_description, model_name=self.large_model)
+
+    def summary(self, calls: Optional[List[LLMCallUsage]] = None) -> Dict[str, Any]:
+        """
+        Reports the share of jobs escalated and the requests, summed latency and estimated cost of each tier.
+
+        Args:
+            calls (List[LLMCallUsage], optional): The scoring requests to attribute. Defaults to the
+                "score" requests recorded since the last instrumentation reset.
+
+        Returns:
+            Dict[str, Any]: Job and escalation counts, the band, per-tier usage and the totals. A cost
+                is None when a model has no known price.
+        """
+        calls = instrumentation.llm_calls(stage="score") if calls is None else calls
+        tiers = {}
+        for tier, name in (("small", self.small_model), ("large", self.large_model)):
+            tier_calls = [x for x in calls if x.model == name]
+            costs = [instrumentation.estimate_cost(x) for x in tier_calls]
+            tiers[tier] = {
+                "model": name,
+                "requests": len(tier_calls),
+                "latency_s": round(sum(x.latency for x in tier_calls), 3),
+                "cost_usd": round(sum(costs), 6) if None not in costs else None,
+            }
+        costs = [x["cost_usd"] for x in tiers.values()]
+        return {
+            "jobs": self.jobs,
+            "escalated": self.escalated,
+            "escalation_rate": round(self.escalated / self.jobs, 3) if self.jobs else 0.0,
+            "band": [self.low, self.high],
+            "tiers": tiers,
+            "latency_s": round(sum(x["latency_s"] for x in tiers.values()), 3),
+            "cost_usd": round(sum(costs), 6) if None not in costs else None,
+        }
+
+
+def latest_baseline(model_name: str, directory: Path = DEFAULT_EVAL_DIR) -> Optional[Dict[str, Any]]:
+    """Returns the newest eval_cache result set scored with model_name, with its path, or None."""
+    for path in sorted(directory.glob("eval_results_*.json"), reverse=True):
+        with open(path) as f:
+            results = json.load(f)
+        if results.get("model") == model_name:
+            results["path"] = str(path)
+            return results
+    return None
+
+
+def baseline_agreement(jobs: List[JobInfo], baseline: Dict[str, Any], top_k: int = 5) -> Dict[str, Any]:
+    """
+    Compares scores with an eval_cache baseline, over the jobs both contain.
+
+    Args:
+        jobs (List[JobInfo]): Scored jobs, e.g. by a cascade.
+        baseline (Dict[str, Any]): An eval_results file, whose mean score per job is the reference.
+        top_k (int, optional): Size of the top lists compared. Defaults to 5.
+
+    Returns:
+        Dict[str, Any]: Jobs compared, mean and max absolute score difference, mean signed difference,
+            the share within one point, and the overlap of the top_k jobs by each score.
+    """
+    reference = {x["job_url"]: float(np.mean(x["new_scores"])) for x in baseline["jobs"] if x["new_scores"]}
+    common = [x for x in jobs if x.score >= 0 and x.job_url in reference]
+    if not common:
+        return {"jobs": 0}
+    diffs = np.array([x.score - reference[x.job_url] for x in common])
+    k = min(top_k, len(common))
+    top = {x.job_url for x in sorted(common, key=lambda x: x.score, reverse=True)[:k]}
+    top_reference = {x.job_url for x in sorted(common, key=lambda x: reference[x.job_url], reverse=True)[:k]}
+    return {
+        "jobs": len(common),
+        "mean_abs_diff": round(float(np.abs(diffs).mean()), 3),
+        "max_abs_diff": round(float(np.abs(diffs).max()), 3),
+        "mean_diff": round(float(diffs.mean()), 3),
+        "within_1": round(float(np.mean(np.abs(diffs) <= 1)), 3),
+        f"top_{k}_overlap": round(len(top & top_reference) / k, 3),
+    }
@@ -0,0 +1,187 @@
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+import logging
+import re
+from typing import Callable, Dict, List, Optional
+
+from datamodels.models import JobInfo
+from .tokens import estimate_tokens
+
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+logger = logging.getLogger(__name__)
+
+# Sections that say nothing about whether the resume fits the role
+DROP_HEADING_RE = re.compile(
+    r"benefit|perks|what we offer|why join|why work|why you.ll love|compensation|pay (range|transparency)|salary"
+    r"|equal (employment )?opportunit|\beeo\b|diversity|inclusion|accommodation|how to apply|application process"
+    r"|disclaimer|privacy|e-verify|legal notice|recruit(ment|ing) fraud"
+)
+# Sections reduced to their first sentence, which usually says what the company does
+SHORTEN_HEADING_RE = re.compile(
+    r"^about (us|the company|the organi[sz]ation)$|who we are|our (mission|story|culture|values|company)"
+    r"|company (overview|description)|life at "
+)
+# Sections never collapsed as company boilerplate, even when several postings share them
+CORE_HEADING_RE = re.compile(
+    r"responsib|requirement|qualification|what you.ll do|what you will do|what you bring|skills|experience"
+    r"|the role|duties|must have|nice to have|preferred|minimum|basic"
+)
+# Boilerplate sentences that appear anywhere, with or without a heading
+BOILERPLATE_RE = re.compile(
+    r"equal opportunity employer|without regard to|regardless of (race|age|gender|religion)"
+    r"|reasonable accommodation|protected veteran|e-verify|affirmative action|drug[- ]free workplace"
+    r"|background check|click apply|apply now|know your rights",
+    re.IGNORECASE,
+)
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9\"'(])")
+_SPACE_RE = re.compile(r"\s+")
+# Shorter lines, e.g. "Python" or "Bachelor's degree", are too generic to treat as shared boilerplate
+MIN_SHARED_CHARS = 60
+
+
+@dataclass
+class Section:
+    heading: Optional[str]
+    lines: List[str] = field(default_factory=list)
+
+
+def _heading_text(line: str) -> str:
+    return line.strip().rstrip(":").strip("*#").strip().lower()
+
+
+def _is_heading(line: str) -> bool:
+    text = _heading_text(line)
+    if not text or len(text) > 60 or len(text.split()) > 8 or text[-1] in ".!?,;":
+        return False
+    if line.startswith(("-", "•", "*")) and not line.startswith("**"):
+        return False
+    # A short line without a colon is only a heading if it names a section we know, so a list
+    # of skills one per line is not mistaken for a run of headings
+    if line.endswith(":"):
+        return True
+    return len(text.split()) <= 5 and (text.startswith("about ") or any(
+        x.search(text) for x in (DROP_HEADING_RE, SHORTEN_HEADING_RE, CORE_HEADING_RE)
+    ))
+
+
+def split_sections(text: str) -> List[Section]:
+    """Splits a description into sections at heading lines: short, and ending in a colon or naming a known section."""
+    sections = [Section(heading=None)]
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if _is_heading(line):
+            sections.append(Section(heading=line))
+        else:
+            sections[-1].lines.append(line)
+    return [x for x in sections if x.heading or x.lines]
+
+
+def split_sentences(text: str) -> List[str]:
+    return [x for x in _SENTENCE_RE.split(text) if x]
+
+
+def normalize(sentence: str) -> str:
+    return _SPACE_RE.sub(" ", sentence).strip().lower()
+
+
+def compact_description(
+    text: str, company: str = "", is_shared: Optional[Callable[[str], bool]] = None
+) -> str:
+    """
+    Shrinks a job description to the parts that matter for scoring it against a resume.
+
+    Benefits, EEO, application and legal sections are dropped, "about us" sections are cut to
+    their first sentence, boilerplate sentences are removed wherever they appear, and sentences
+    is_shared marks as company boilerplate are removed outside the requirements and
+    responsibilities sections.
+
+    Args:
+        text (str): The job description.
+        company (str, optional): The company name, to recognize "About <company>" headings.
+        is_shared (Callable[[str], bool], optional): Whether a sentence is shared with the company's other postings.
+
+    Returns:
+        str: The compacted description, or the original if compaction would leave nothing.
+    """
+    about_company = f"about {company.lower()}" if company else None
+    out = []
+    for section in split_sections(text):
+        heading = _heading_text(section.heading) if section.heading else ""
+        if heading and DROP_HEADING_RE.search(heading):
+            continue
+        lines = section.lines
+        if heading and (SHORTEN_HEADING_RE.search(heading) or heading == about_company):
+            sentences = split_sentences(" ".join(lines))
+            lines = sentences[:1]
+        core = bool(heading) and bool(CORE_HEADING_RE.search(heading))
+        kept_lines = []
+        for line in lines:
+            kept = [
+                s for s in split_sentences(line)
+                if not BOILERPLATE_RE.search(s)
+                and (core or is_shared is None or len(s) < MIN_SHARED_CHARS or not is_shared(s))
+            ]
+            if kept:
+                kept_lines.append(" ".join(kept))
+        if section.heading and (kept_lines or not lines):
+            out.append(section.heading)
+        out.extend(kept_lines)
+    return "\n".join(out) if out else text
+
+
+class Compactor:
+    """
+    Compacts job descriptions before scoring and reports the tokens saved.
+
+    Remembers the sentences of every posting it has observed, per company, so text repeated
+    across a company's postings (its blurb, culture statement or legal footer) is recognized
+    as boilerplate. Observe every posting before compacting any for the best result; when
+    postings arrive one at a time, each is compared with the ones observed before it.
+    """
+
+    def __init__(self):
+        self._seen: Dict[str, Counter] = defaultdict(Counter)
+        self._descriptions: set = set()
+        self.report: List[Dict[str, object]] = []
+
+    def observe(self, job: JobInfo) -> None:
+        # Exact copies of a posting would otherwise mark all of its text as shared
+        key = (job.company.lower(), normalize(job.description))
+        if key in self._descriptions:
+            return
+        self._descriptions.add(key)
+        sentences = {
+            normalize(s) for line in job.description.splitlines() for s in split_sentences(line)
+            if len(s) >= MIN_SHARED_CHARS
+        }
+        self._seen[job.company.lower()].update(sentences)
+
+    def compact(self, job: JobInfo) -> str:
+        counts = self._seen[job.company.lower()]
+        text = compact_description(job.description, job.company, lambda s: counts[normalize(s)] > 1)
+        before, after = estimate_tokens(job.description), estimate_tokens(text)
+        self.report.append({"job_url": job.job_url, "tokens_before": before, "tokens_after": after})
+        return text
+
+    def compact_all(self, jobs: List[JobInfo]) -> List[str]:
+        for job in jobs:
+            self.observe(job)
+        return [self.compact(x) for x in jobs]
+
+    def summary(self) -> Dict[str, object]:
+        before = sum(x["tokens_before"] for x in self.report)
+        after = sum(x["tokens_after"] for x in self.report)
+        return {
+            "jobs": len(self.report),
+            "tokens_before": before,
+            "tokens_after": after,
+            "reduction": round(1 - after / before, 3) if before else 0.0,
+            "per_job": self.report,
+        }
@@ -0,0 +1,205 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, List, Tuple
+
+from datamodels.models import BatchJDScores, JDScore
+from instrumentation import record_batch_split
+from .tokens import estimate_tokens
+
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+logger = logging.getLogger(__name__)
+
+ScoreFn = Callable[[str, str], Awaitable[JDScore]]
+BatchScoreFn = Callable[[str, List[str]], Awaitable[BatchJDScores]]
+
+# Prompt tokens of the scoring instructions and per-job framing, on top of the resume and descriptions
+PROMPT_OVERHEAD_TOKENS = 200
+JOB_OVERHEAD_TOKENS = 20
+
+
+async def _score_one(
+    i: int, total: int, resume: str, description: str, score_fn: ScoreFn, semaphore: asyncio.Semaphore
+) -> JDScore:
+    async with semaphore:
+        logger.info(f"Submitting job {i + 1} of {total}")
+        try:
+            return await score_fn(resume, description)
+        except Exception as e:
+            logger.error(f"Failed to score job {i + 1}: {e}")
+            return JDScore(score=-1, explanation="Comparison failed")
+
+
+async def score_concurrently(
+    resume: str, descriptions: List[str], score_fn: ScoreFn, max_concurrency: int = 8
+) -> List[JDScore]:
+    """
+    Scores job descriptions against a resume with at most max_concurrency requests in flight.
+
+    Each job is isolated: an exception raised by score_fn is logged and recorded as a
+    score of -1 for that job only, so one bad request never aborts the batch.
+
+    Args:
+        resume (str): The plain text content of the candidate's resume.
+        descriptions (List[str]): The job descriptions to score.
+        score_fn (ScoreFn): Async scorer, e.g. oa_models.async_score_resume.
+        max_concurrency (int, optional): Upper bound on concurrent requests. Defaults to 8.
+
+    Returns:
+        List[JDScore]: One score per description, in input order.
+    """
+    return await score_pairs([(resume, x) for x in descriptions], score_fn, max_concurrency)
+
+
+async def score_pairs(
+    pairs: List[Tuple[str, str]], score_fn: ScoreFn, max_concurrency: int = 8
+) -> List[JDScore]:
+    """
+    Scores (resume, job description) pairs, for any mix of resumes, under one concurrency limit.
+
+    Args:
+        pairs (List[Tuple[str, str]]): The resume and job description of each request.
+        score_fn (ScoreFn): Async scorer, e.g. oa_models.async_score_resume.
+        max_concurrency (int, optional): Upper bound on concurrent requests. Defaults to 8.
+
+    Returns:
+        List[JDScore]: One score per pair, in input order; failed pairs score -1.
+    """
+    if max_concurrency < 1:
+        raise ValueError(f"max_concurrency must be at least 1, got {max_concurrency}")
+    semaphore = asyncio.Semaphore(max_concurrency)
+    total = len(pairs)
+    tasks = [
+        _score_one(i, total, resume, description, score_fn, semaphore)
+        for i, (resume, description) in enumerate(pairs)
+    ]
+    return await asyncio.gather(*tasks)
+
+
+def pack_batches(resume: str, descriptions: List[str], token_budget: int, max_batch_size: int = 20) -> List[List[int]]:
+    """
+    Groups job descriptions into batches whose estimated prompt fits within token_budget.
+
+    The resume is counted once per batch. A description too large to share a batch still
+    gets a batch of its own.
+
+    Args:
+        resume (str): The plain text content of the candidate's resume.
+        descriptions (List[str]): The job descriptions to score.
+        token_budget (int): Maximum estimated prompt tokens per batched request.
+        max_batch_size (int, optional): Maximum number of jobs per batch. Defaults to 20.
+
+    Returns:
+        List[List[int]]: Indices into descriptions, one list per batch, in input order.
+    """
+    base = estimate_tokens(resume) + PROMPT_OVERHEAD_TOKENS
+    batches, current, used = [], [], base
+    for i, description in enumerate(descriptions):
+        cost = estimate_tokens(description) + JOB_OVERHEAD_TOKENS
+        if current and (used + cost > token_budget or len(current) >= max_batch_size):
+            batches.append(current)
+            current, used = [], base
+        current.append(i)
+        used += cost
+    if current:
+        batches.append(current)
+    return batches
+
+
+class BatchMismatchError(ValueError):
+    """Raised when a multi-job response does not score jobs 0 to n-1 exactly once."""
+
+
+def _unpack_batch(parsed: BatchJDScores, n: int) -> List[JDScore]:
+    # Compare the full list, not a dict of it, so a job scored twice is not hidden by the other copy
+    indices = sorted(x.job_index for x in parsed.scores)
+    if indices != list(range(n)):
+        raise BatchMismatchError(f"Expected scores for jobs 0-{n - 1} once each, got {indices}")
+    by_index = {x.job_index: x for x in parsed.scores}
+    return [JDScore(score=by_index[i].score, explanation=by_index[i].explanation) for i in range(n)]
+
+
+async def _score_batch(
+    resume: str, descriptions: List[str], batch_fn: BatchScoreFn, score_fn: ScoreFn, semaphore: asyncio.Semaphore
+) -> List[JDScore]:
+    if len(descriptions) == 1:
+        return [await _score_one(0, 1, resume, descriptions[0], score_fn, semaphore)]
+    async with semaphore:
+        logger.info(f"Submitting batch of {len(descriptions)} jobs")
+        try:
+            return _unpack_batch(await batch_fn(resume, descriptions), len(descriptions))
+        except Exception as e:
+            record_batch_split("mismatch" if isinstance(e, BatchMismatchError) else "error")
+            logger.warning(f"Batch of {len(descriptions)} jobs failed, splitting and retrying: {e}")
+    mid = len(descriptions) // 2
+    left, right = await asyncio.gather(
+        _score_batch(resume, descriptions[:mid], batch_fn, score_fn, semaphore),
+        _score_batch(resume, descriptions[mid:], batch_fn, score_fn, semaphore),
+    )
+    return left + right
+
+
+async def score_batched(
+    resume: str,
+    descriptions: List[str],
+    batch_fn: BatchScoreFn,
+    score_fn: ScoreFn,
+    token_budget: int,
+    max_concurrency: int = 8,
+) -> List[JDScore]:
+    """
+    Scores job descriptions in multi-job requests that send the resume once per batch.
+
+    Batch sizes adapt to token_budget. A batch that errors or does not return exactly one
+    score per job is split in half and retried; a single remaining job falls back to score_fn,
+    so failures end up isolated to individual jobs.
+
+    Args:
+        resume (str): The plain text content of the candidate's resume.
+        descriptions (List[str]): The job descriptions to score.
+        batch_fn (BatchScoreFn): Async batch scorer, e.g. oa_models.async_score_resume_batch.
+        score_fn (ScoreFn): Async single-job scorer used for batches of one.
+        token_budget (int): Maximum estimated prompt tokens per batched request.
+        max_concurrency (int, optional): Upper bound on concurrent requests. Defaults to 8.
+
+    Returns:
+        List[JDScore]: One score per description, in input order.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+    batches = pack_batches(resume, descriptions, token_budget)
+    logger.info(f"Packed {len(descriptions)} jobs into {len(batches)} batches of up to {token_budget} tokens")
+    results = await asyncio.gather(*[
+        _score_batch(resume, [descriptions[i] for i in batch], batch_fn, score_fn, semaphore)
+        for batch in batches
+    ])
+    return [score for batch_scores in results for score in batch_scores]
+
+
+def run_scoring(
+    resume: str, descriptions: List[str], score_fn: ScoreFn, max_concurrency: int = 8
+) -> List[JDScore]:
+    """Synchronous entry point for score_concurrently."""
+    return asyncio.run(score_concurrently(resume, descriptions, score_fn, max_concurrency))
+
+
+def run_pair_scoring(
+    pairs: List[Tuple[str, str]], score_fn: ScoreFn, max_concurrency: int = 8
+) -> List[JDScore]:
+    """Synchronous entry point for score_pairs."""
+    return asyncio.run(score_pairs(pairs, score_fn, max_concurrency))
+
+
+def run_batched_scoring(
+    resume: str,
+    descriptions: List[str],
+    batch_fn: BatchScoreFn,
+    score_fn: ScoreFn,
+    token_budget: int,
+    max_concurrency: int = 8,
+) -> List[JDScore]:
+    """Synchronous entry point for score_batched."""
+    return asyncio.run(score_batched(resume, descriptions, batch_fn, score_fn, token_budget, max_concurrency))
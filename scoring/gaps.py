@@ -0,0 +1,179 @@
+import asyncio
+from datetime import datetime, timezone
+import hashlib
+import json
+import logging
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from datamodels.models import JobInfo
+from job_boards.dedup import MISSING_URL, resume_key
+from .tokens import estimate_tokens
+
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+logger = logging.getLogger(__name__)
+
+GapFn = Callable[[List[str]], Awaitable[str]]
+
+DEFAULT_PROFILE_DIR = Path.cwd() / "data/cache/gap_profiles"
+# Prompt tokens of the gap instructions, and of the framing around each rationale or list
+PROMPT_OVERHEAD_TOKENS = 150
+ITEM_OVERHEAD_TOKENS = 8
+
+
+def chunk_by_tokens(texts: List[str], token_budget: int) -> List[List[str]]:
+    """
+    Splits texts, in order, into chunks whose estimated prompt fits within token_budget.
+
+    A text too large to share a chunk still gets a chunk of its own.
+    """
+    chunks: List[List[str]] = []
+    current: List[str] = []
+    used = PROMPT_OVERHEAD_TOKENS
+    for text in texts:
+        cost = estimate_tokens(text) + ITEM_OVERHEAD_TOKENS
+        if current and used + cost > token_budget:
+            chunks.append(current)
+            current, used = [], PROMPT_OVERHEAD_TOKENS
+        current.append(text)
+        used += cost
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+async def map_reduce_gaps(
+    explanations: List[str], summarize_fn: GapFn, merge_fn: GapFn, token_budget: int, max_concurrency: int = 8
+) -> str:
+    """
+    Summarizes resume gaps from any number of score explanations without overflowing the model context.
+
+    Map: explanations are chunked by token budget and each chunk is summarized concurrently.
+    Reduce: the chunk summaries are grouped by the same budget and merged concurrently, level by
+    level, until one summary is left. When every summary fills the budget on its own, they are
+    merged in pairs so the tree still shrinks. A small result set is a single summarize call.
+
+    Args:
+        explanations (List[str]): Score explanations of the jobs to analyze.
+        summarize_fn (GapFn): Async gap summarizer, e.g. oa_models.async_summarize_gaps.
+        merge_fn (GapFn): Async merger of gap summaries, e.g. oa_models.async_merge_gap_summaries.
+        token_budget (int): Maximum estimated prompt tokens per request.
+        max_concurrency (int, optional): Concurrent request limit. Defaults to 8.
+
+    Returns:
+        str: One bullet-point list of missing skills or experiences.
+
+    Raises:
+        RuntimeError: If every map request failed.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def call(fn: GapFn, texts: List[str]) -> Optional[str]:
+        async with semaphore:
+            try:
+                return await fn(texts)
+            except Exception as e:
+                logger.error(f"Gap summarization request over {len(texts)} items failed: {e}")
+                return None
+
+    chunks = chunk_by_tokens(explanations, token_budget)
+    logger.info(f"Summarizing gaps of {len(explanations)} jobs in {len(chunks)} chunks")
+    summaries = [x for x in await asyncio.gather(*[call(summarize_fn, c) for c in chunks]) if x]
+    if not summaries:
+        raise RuntimeError(f"All {len(chunks)} gap summarization requests failed")
+
+    level = 0
+    while len(summaries) > 1:
+        level += 1
+        groups = chunk_by_tokens(summaries, token_budget)
+        if len(groups) == len(summaries):
+            groups = [summaries[i:i + 2] for i in range(0, len(summaries), 2)]
+        merged = await asyncio.gather(*[call(merge_fn, g) for g in groups if len(g) > 1])
+        results = iter(merged)
+        next_summaries = []
+        for group in groups:
+            if len(group) == 1:
+                next_summaries.append(group[0])
+                continue
+            # A failed merge keeps its inputs side by side rather than losing them
+            next_summaries.append(next(results) or "\n".join(group))
+        logger.info(f"Gap reduce level {level}: {len(summaries)} summaries merged into {len(next_summaries)}")
+        summaries = next_summaries
+    return summaries[0]
+
+
+def job_key(job: JobInfo) -> str:
+    """Identifies a job across runs by its URL, or by its description when it has none."""
+    if job.job_url != MISSING_URL:
+        return job.job_url
+    return hashlib.sha256(job.description.encode()).hexdigest()
+
+
+class GapProfile:
+    """
+    Running gap summary for one resume, stored between runs.
+
+    Remembers which jobs it already covers, so later runs only summarize newly scored jobs
+    and merge the result into the stored summary.
+    """
+
+    def __init__(self, resume: str, directory: Path = DEFAULT_PROFILE_DIR):
+        self.path = directory / f"{resume_key(resume)[:24]}.json"
+        self.summary = ""
+        self.job_keys: set = set()
+        self.updated_at: Optional[str] = None
+        if self.path.exists():
+            with open(self.path) as f:
+                data = json.load(f)
+            self.summary = data["summary"]
+            self.job_keys = set(data["job_keys"])
+            self.updated_at = data["updated_at"]
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.updated_at = datetime.now(timezone.utc).isoformat()
+        data = {"summary": self.summary, "job_keys": sorted(self.job_keys), "updated_at": self.updated_at}
+        with open(self.path, "w") as f:
+            json.dump(data, f)
+
+
+async def fold_gaps(
+    profile: GapProfile,
+    jobs: List[JobInfo],
+    summarize_fn: GapFn,
+    merge_fn: GapFn,
+    token_budget: int,
+    max_concurrency: int = 8,
+) -> str:
+    """
+    Folds the gaps of jobs the profile has not seen yet into its stored summary.
+
+    Args:
+        profile (GapProfile): The resume's stored gap profile, updated and saved in place.
+        jobs (List[JobInfo]): Jobs above the gap threshold; ones already in the profile are skipped.
+        summarize_fn (GapFn): Async gap summarizer.
+        merge_fn (GapFn): Async merger of gap summaries.
+        token_budget (int): Maximum estimated prompt tokens per request.
+        max_concurrency (int, optional): Concurrent request limit. Defaults to 8.
+
+    Returns:
+        str: The updated gap summary.
+    """
+    new: Dict[str, str] = {}
+    for job in jobs:
+        key = job_key(job)
+        if key not in profile.job_keys:
+            new[key] = job.explanation
+    logger.info(f"Gap profile covers {len(profile.job_keys)} jobs, folding in {len(new)} new ones")
+    if not new:
+        return profile.summary
+    delta = await map_reduce_gaps(list(new.values()), summarize_fn, merge_fn, token_budget, max_concurrency)
+    profile.summary = await merge_fn([profile.summary, delta]) if profile.summary else delta
+    profile.job_keys.update(new)
+    profile.save()
+    return profile.summary
@@ -1,15 +1,25 @@
+import asyncio
 import logging
-from typing import List
+import time
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
 
-from config import AI_BACKEND
-if AI_BACKEND == "openai":
-    from .oa_models import score_resume, summarize_gaps
-elif AI_BACKEND == "ollama":
-    from .ollama_models import score_resume, summarize_gaps
-else:
-    raise ValueError(f"Unknown AI_BACKEND: {AI_BACKEND}. Must be 'ollama' or 'openai'.")
-
-from datamodels.models import JobInfo
+from config import (
+    AI_BACKEND,
+    GAP_CHUNK_TOKENS,
+    SCORE_CACHE_ENABLED,
+    SCORE_CACHE_MAX_AGE_DAYS,
+    SCORE_CACHE_MAX_ENTRIES,
+    SCORING_BATCH_TOKENS,
+    SCORING_CONCURRENCY,
+)
+from datamodels.models import JDScore, JobInfo
+from job_boards.dedup import Deduper
+from .backends import get_backend
+from .cascade import CascadeScorer
+from .compaction import Compactor
+from .gaps import GapProfile, fold_gaps, map_reduce_gaps
+from .engine import run_batched_scoring, run_pair_scoring, run_scoring
+from .score_cache import ScoreCache, make_key
 
 
 logging.basicConfig(
@@ -19,36 +29,382 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def score_job_posts(resume: str, job_postings: List[JobInfo]) -> List[JobInfo]:
+def score_fingerprint(
+    batch_tokens: Optional[int] = None, compactor: Optional[Compactor] = None, cascade: Optional[CascadeScorer] = None
+) -> Dict[str, Any]:
+    """
+    Describes how score_job_posts will score, so scores kept elsewhere, e.g. in the posting index,
+    are only reused when they were given the same way.
+
+    Args:
+        batch_tokens (int, optional): Prompt token budget per multi-job request. Defaults to SCORING_BATCH_TOKENS.
+        compactor (Compactor, optional): The compactor scoring will use. Defaults to no compaction.
+        cascade (CascadeScorer, optional): The cascade scoring will use. Defaults to the backend's model.
+
+    Returns:
+        Dict[str, Any]: The backend, model_id, prompt_version and whether descriptions are compacted.
+    """
+    backend = get_backend()
+    batch_tokens = SCORING_BATCH_TOKENS if batch_tokens is None else batch_tokens
+    if cascade is not None:
+        batch_tokens = 0
+    return {
+        "backend": AI_BACKEND,
+        "model_id": cascade.model if cascade is not None else backend.model,
+        "prompt_version": backend.BATCH_SCORE_PROMPT_VERSION if batch_tokens else backend.SCORE_PROMPT_VERSION,
+        "compacted": compactor is not None,
+    }
+
+
+def score_job_posts(
+    resume: str,
+    job_postings: List[JobInfo],
+    max_concurrency: Optional[int] = None,
+    batch_tokens: Optional[int] = None,
+    compactor: Optional[Compactor] = None,
+    cascade: Optional[CascadeScorer] = None,
+) -> List[JobInfo]:
     """
     Scores a list of job postings against a candidate's resume using an LLM.
 
-    For each job posting, this function evaluates how well the provided resume matches
-    the job description by calling the score_resume function. It updates each JobInfo object
-    with a suitability score and an explanation. If an error occurs during scoring, the job's
-    score is set to -1.
+    Job postings are scored concurrently, with at most max_concurrency requests in flight.
+    Postings already scored for this resume, backend, model and prompt version are served
+    from the persistent score cache without an LLM call. It updates each JobInfo object with
+    a suitability score and an explanation. If an error occurs while scoring a job, only that
+    job's score is set to -1 and it is not cached.
+
+    With a batch token budget, several job descriptions share one request and one copy of
+    the resume. Batched scores are cached separately from single-job scores.
+
+    With a compactor, the LLM sees each description with its boilerplate removed, and the
+    score cache is keyed on the compacted text.
+
+    With a cascade, jobs are scored by its small model and borderline ones by its large model,
+    one job per request, and cached under the cascade's configuration.
 
     Args:
         resume (str): The plain text content of the candidate's resume.
         job_postings (List[JobInfo]): A list of JobInfo objects representing job postings to score.
+        max_concurrency (int, optional): Concurrent request limit. Defaults to SCORING_CONCURRENCY.
+        batch_tokens (int, optional): Prompt token budget per multi-job request, 0 to disable batching.
+            Defaults to SCORING_BATCH_TOKENS.
+        compactor (Compactor, optional): Shrinks descriptions before scoring. Defaults to no compaction.
+        cascade (CascadeScorer, optional): Scores with a small model and escalates borderline jobs.
+            Defaults to the backend's model.
 
     Returns:
-        List[JobInfo]: The input list of JobInfo objects, each updated with a score and explanation.
+        List[JobInfo]: The input list of JobInfo objects, in order, each updated with a score and explanation.
     """
-    logger.info(f"Starting resume scorer. Submitting {len(job_postings)} jobs")
-    scores = []
-    for i, job in enumerate(job_postings):
-        logger.info(f"Submitting job {i + 1} of {len(job_postings)}")
-        job_score = score_resume(resume, job.description)
+    backend = get_backend()
+    max_concurrency = max_concurrency or SCORING_CONCURRENCY
+    batch_tokens = SCORING_BATCH_TOKENS if batch_tokens is None else batch_tokens
+    score_fn = backend.async_score_resume
+    if cascade is not None:
+        if batch_tokens:
+            logger.warning("Batched scoring is not used with a cascade, scoring one job per request")
+        batch_tokens = 0
+        score_fn = cascade
+    fingerprint = score_fingerprint(batch_tokens, compactor, cascade)
+    model_id = fingerprint["model_id"]
+    prompt_version = fingerprint["prompt_version"]
+    if compactor is not None:
+        texts = dict(zip(map(id, job_postings), compactor.compact_all(job_postings)))
+    else:
+        texts = {id(x): x.description for x in job_postings}
+    cache = None
+    pending = job_postings
+    if SCORE_CACHE_ENABLED:
+        cache = ScoreCache(max_entries=SCORE_CACHE_MAX_ENTRIES, max_age_days=SCORE_CACHE_MAX_AGE_DAYS)
+        keys = {}
+        pending = []
+        for job in job_postings:
+            key = make_key(resume, texts[id(job)], AI_BACKEND, model_id, prompt_version)
+            cached = cache.get(key)
+            if cached is None:
+                keys[id(job)] = key
+                pending.append(job)
+            else:
+                job.score = cached.score
+                job.explanation = cached.explanation
+
+    logger.info(f"Starting resume scorer. Submitting {len(pending)} jobs, {max_concurrency} requests at a time")
+    descriptions = [texts[id(x)] for x in pending]
+    if batch_tokens:
+        job_scores = run_batched_scoring(
+            resume, descriptions, backend.async_score_resume_batch, backend.async_score_resume, batch_tokens, max_concurrency
+        )
+    else:
+        job_scores = run_scoring(resume, descriptions, score_fn, max_concurrency)
+    for job, job_score in zip(pending, job_scores):
         job.score = job_score.score
         job.explanation = job_score.explanation
-        scores.append(job)
-    return scores
+        if cache is not None and job_score.score >= 0:
+            cache.put(keys[id(job)], job_score, AI_BACKEND, model_id, prompt_version)
+
+    if cache is not None:
+        cache.evict()
+        logger.info(f"Score cache: {cache.stats()}")
+        cache.close()
+    return job_postings
+
+
+def score_matrix(
+    resumes: Dict[str, str],
+    job_postings: List[JobInfo],
+    max_concurrency: Optional[int] = None,
+    compactor: Optional[Compactor] = None,
+) -> Tuple[Dict[str, List[JDScore]], Dict[str, int]]:
+    """
+    Scores every job posting against every resume through one scheduler and one score cache.
+
+    Descriptions are compacted once for all resumes. Pairs already in the score cache, and
+    repeats of a pair within the grid, cost no request; the remaining pairs share a single
+    concurrency limit, ordered resume by resume so each resume's prompt prefix stays warm in
+    the provider's cache.
+
+    Args:
+        resumes (Dict[str, str]): Resume texts by name.
+        job_postings (List[JobInfo]): The job postings to score. They are not modified.
+        max_concurrency (int, optional): Concurrent request limit. Defaults to SCORING_CONCURRENCY.
+        compactor (Compactor, optional): Shrinks descriptions before scoring. Defaults to no compaction.
+
+    Returns:
+        Tuple[Dict[str, List[JDScore]], Dict[str, int]]: Each resume's scores, in posting order,
+            and counts of grid pairs, cache hits and LLM requests.
+    """
+    backend = get_backend()
+    max_concurrency = max_concurrency or SCORING_CONCURRENCY
+    texts = compactor.compact_all(job_postings) if compactor is not None else [x.description for x in job_postings]
+    cache = None
+    if SCORE_CACHE_ENABLED:
+        cache = ScoreCache(max_entries=SCORE_CACHE_MAX_ENTRIES, max_age_days=SCORE_CACHE_MAX_AGE_DAYS)
+    grid: Dict[str, List[Optional[JDScore]]] = {name: [None] * len(job_postings) for name in resumes}
+    # Pairs to request, each with every grid cell it fills
+    pending: Dict[str, Tuple[str, str, List[Tuple[str, int]]]] = {}
+    from_cache = 0
+    for name, resume in resumes.items():
+        for i, text in enumerate(texts):
+            key = make_key(resume, text, AI_BACKEND, backend.model, backend.SCORE_PROMPT_VERSION)
+            if key in pending:
+                pending[key][2].append((name, i))
+                continue
+            cached = cache.get(key) if cache is not None else None
+            if cached is not None:
+                grid[name][i] = cached
+                from_cache += 1
+            else:
+                pending[key] = (resume, text, [(name, i)])
+
+    logger.info(
+        f"Scoring a {len(resumes)} x {len(job_postings)} matrix: {from_cache} pairs from cache, "
+        f"{len(pending)} requests, {max_concurrency} at a time"
+    )
+    results = run_pair_scoring([(r, t) for r, t, _ in pending.values()], backend.async_score_resume, max_concurrency)
+    for (key, (_, _, cells)), result in zip(pending.items(), results):
+        for name, i in cells:
+            grid[name][i] = result
+        if cache is not None and result.score >= 0:
+            cache.put(key, result, AI_BACKEND, backend.model, backend.SCORE_PROMPT_VERSION)
 
-def identify_resume_gaps(scores: List[JobInfo], score_threshold=7) -> str:
-    explanations = [x.explanation for x in scores if x.score > score_threshold]
-    if len(explanations) == 0:
+    if cache is not None:
+        cache.evict()
+        logger.info(f"Score cache: {cache.stats()}")
+        cache.close()
+    stats = {"pairs": len(resumes) * len(job_postings), "from_cache": from_cache, "llm_scored": len(pending)}
+    return grid, stats
+
+
+async def stream_score_posts(
+    resume: str,
+    job_stream: AsyncIterator[JobInfo],
+    on_result: Callable[[JobInfo], None],
+    max_concurrency: Optional[int] = None,
+    deduper: Optional[Deduper] = None,
+    compactor: Optional[Compactor] = None,
+    cache: Optional[ScoreCache] = None,
+    cascade: Optional[CascadeScorer] = None,
+) -> Dict[str, float]:
+    """
+    Scores job postings as they arrive and hands each one to on_result as soon as it is scored.
+
+    Postings are pulled from job_stream into a bounded queue drained by max_concurrency workers,
+    so fetching and scoring overlap and only a few postings are in flight at any time. Score cache
+    hits, reused scores and near duplicates of already scored postings skip the queue entirely.
+
+    Args:
+        resume (str): The plain text content of the candidate's resume.
+        job_stream (AsyncIterator[JobInfo]): Job postings, e.g. from job_boards.apify.stream_posts.
+        on_result (Callable[[JobInfo], None]): Called once for every scored or deduplicated posting.
+        max_concurrency (int, optional): Concurrent request limit. Defaults to SCORING_CONCURRENCY.
+        deduper (Deduper, optional): Drops duplicates and reposts before scoring. Defaults to no dedup.
+        compactor (Compactor, optional): Shrinks descriptions before scoring, comparing each with the
+            postings before it. Defaults to no compaction.
+        cache (ScoreCache, optional): A score cache shared with other runs, left open and uncommitted.
+            Defaults to opening the persistent score cache for this run, if enabled.
+        cascade (CascadeScorer, optional): Scores with a small model and escalates borderline jobs.
+            Defaults to the backend's model.
+
+    Returns:
+        Dict[str, float]: Counts of fetched, LLM-scored and cache-served postings, and the seconds
+            until the first result.
+    """
+    backend = get_backend()
+    max_concurrency = max_concurrency or SCORING_CONCURRENCY
+    model_id = cascade.model if cascade is not None else backend.model
+    score_fn = cascade or backend.async_score_resume
+    own_cache = cache is None
+    if own_cache and SCORE_CACHE_ENABLED:
+        cache = ScoreCache(max_entries=SCORE_CACHE_MAX_ENTRIES, max_age_days=SCORE_CACHE_MAX_AGE_DAYS)
+    queue: asyncio.Queue = asyncio.Queue(maxsize=max_concurrency * 2)
+    done = set()
+    stats = {"fetched": 0, "llm_scored": 0, "from_cache": 0, "time_to_first_result_s": None}
+    start = time.perf_counter()
+
+    def emit(job: JobInfo) -> None:
+        if stats["time_to_first_result_s"] is None:
+            stats["time_to_first_result_s"] = round(time.perf_counter() - start, 3)
+            logger.info(f"First result after {stats['time_to_first_result_s']}s")
+        on_result(job)
+
+    def complete(job: JobInfo) -> None:
+        done.add(id(job))
+        emit(job)
+        if deduper is not None:
+            for duplicate in deduper.duplicates_of(job):
+                duplicate.score = job.score
+                duplicate.explanation = job.explanation
+                emit(duplicate)
+
+    async def produce() -> None:
+        async for job in job_stream:
+            stats["fetched"] += 1
+            if deduper is not None:
+                status = deduper.admit(job)
+                if status == Deduper.EXACT:
+                    continue
+                if status == Deduper.NEAR:
+                    rep = deduper.representative_of(job)
+                    if id(rep) in done:
+                        job.score = rep.score
+                        job.explanation = rep.explanation
+                        emit(job)
+                    # Otherwise it is emitted when its representative finishes
+                    continue
+                if status == Deduper.REUSED:
+                    complete(job)
+                    continue
+            text = job.description
+            if compactor is not None:
+                compactor.observe(job)
+                text = compactor.compact(job)
+            key = None
+            if cache is not None:
+                key = make_key(resume, text, AI_BACKEND, model_id, backend.SCORE_PROMPT_VERSION)
+                cached = cache.get(key)
+                if cached is not None:
+                    job.score = cached.score
+                    job.explanation = cached.explanation
+                    stats["from_cache"] += 1
+                    complete(job)
+                    continue
+            await queue.put((job, text, key))
+        # Sentinels only follow a complete stream. If the stream fails, the error reaches the
+        # gather below, which cancels the workers instead.
+        for _ in range(max_concurrency):
+            await queue.put(None)
+
+    async def work() -> None:
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            job, text, key = item
+            try:
+                result = await score_fn(resume, text)
+            except Exception as e:
+                logger.error(f"Failed to score {job.job_url}: {e}")
+                result = JDScore(score=-1, explanation="Comparison failed")
+            job.score = result.score
+            job.explanation = result.explanation
+            stats["llm_scored"] += 1
+            if cache is not None and result.score >= 0:
+                cache.put(key, result, AI_BACKEND, model_id, backend.SCORE_PROMPT_VERSION)
+            if deduper is not None:
+                deduper.remember([job], save=False)
+            complete(job)
+
+    tasks = [asyncio.create_task(produce())] + [asyncio.create_task(work()) for _ in range(max_concurrency)]
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        # A worker that dies would otherwise leave the producer blocked on the full queue, and a
+        # failed producer would leave the workers waiting for postings: cancel whatever is left.
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if cache is not None and own_cache:
+            cache.evict()
+            logger.info(f"Score cache: {cache.stats()}")
+            cache.close()
+        if deduper is not None:
+            deduper.index.save()
+            deduper.log_summary()
+    return stats
+
+async def async_identify_resume_gaps(
+    scores: List[JobInfo],
+    score_threshold=7,
+    resume: Optional[str] = None,
+    token_budget: Optional[int] = None,
+    max_concurrency: Optional[int] = None,
+) -> str:
+    """
+    Summarizes what the resume is missing for the jobs it scored well on.
+
+    Explanations are summarized map-reduce style within token_budget per request, so any number
+    of jobs fits the model context. Given a resume, the summary is instead folded into that
+    resume's stored gap profile, summarizing only jobs the profile has not seen yet.
+
+    Args:
+        scores (List[JobInfo]): The scored jobs.
+        score_threshold (int, optional): Only jobs scored above this are analyzed. Defaults to 7.
+        resume (str, optional): Fold the gaps into this resume's stored profile. Defaults to None.
+        token_budget (int, optional): Maximum prompt tokens per request. Defaults to GAP_CHUNK_TOKENS.
+        max_concurrency (int, optional): Concurrent request limit. Defaults to SCORING_CONCURRENCY.
+
+    Returns:
+        str: A bullet-point list of missing skills or experiences.
+    """
+    token_budget = token_budget or GAP_CHUNK_TOKENS
+    max_concurrency = max_concurrency or SCORING_CONCURRENCY
+    above = [x for x in scores if x.score > score_threshold]
+    profile = GapProfile(resume) if resume is not None else None
+    if len(above) == 0 and not (profile and profile.summary):
         logger.info(f"No jobs scored above {score_threshold=}")
         return f"Unable to conduct gap analysis, no jobs scored above {score_threshold}"
-    logger.info(f"Submitting {len(explanations)} jobs above {score_threshold} to gap analysis")
-    return summarize_gaps(explanations)
\ No newline at end of file
+    logger.info(f"Submitting {len(above)} jobs above {score_threshold} to gap analysis")
+    backend = get_backend()
+    try:
+        if profile is not None:
+            return await fold_gaps(
+                profile, above, backend.async_summarize_gaps, backend.async_merge_gap_summaries,
+                token_budget, max_concurrency,
+            )
+        return await map_reduce_gaps(
+            [x.explanation for x in above], backend.async_summarize_gaps, backend.async_merge_gap_summaries,
+            token_budget, max_concurrency,
+        )
+    except Exception as e:
+        logger.error(f"Gap analysis failed: {e}")
+        return f"Unable to analyze gaps: {e}"
+
+
+def identify_resume_gaps(
+    scores: List[JobInfo],
+    score_threshold=7,
+    resume: Optional[str] = None,
+    token_budget: Optional[int] = None,
+    max_concurrency: Optional[int] = None,
+) -> str:
+    """Synchronous entry point for async_identify_resume_gaps."""
+    return asyncio.run(async_identify_resume_gaps(scores, score_threshold, resume, token_budget, max_concurrency))
@@ -0,0 +1,287 @@
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import asyncio
+import logging
+import random
+import threading
+import time
+from typing import Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+
+from config import (
+    AI_BACKEND,
+    CIRCUIT_BREAKER_COOLDOWN_S,
+    CIRCUIT_BREAKER_FAILURES,
+    LLM_MAX_RETRIES,
+    LLM_REQUESTS_PER_MIN,
+    LLM_TOKENS_PER_MIN,
+)
+from instrumentation import record_request_outcome
+
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+# Transport errors of openai and httpx, matched by name so neither SDK has to be imported here
+RETRYABLE_ERRORS = {
+    "APITimeoutError", "APIConnectionError", "ConnectError", "ConnectTimeout", "ReadTimeout",
+    "ReadError", "WriteTimeout", "PoolTimeout", "RemoteProtocolError",
+}
+# Seconds of traffic a full bucket allows in one burst
+BURST_SECONDS = 10
+# Completion tokens reserved per request until the response reports the real count
+COMPLETION_TOKENS_ESTIMATE = 200
+
+
+def is_retryable(e: BaseException) -> bool:
+    """Whether an error is transient: rate limited, overloaded, or a dropped connection."""
+    status = getattr(e, "status_code", None)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    return isinstance(e, (TimeoutError, ConnectionError)) or type(e).__name__ in RETRYABLE_ERRORS
+
+
+def retry_after(e: BaseException) -> Optional[float]:
+    """Returns the seconds the server asked to wait, from the Retry-After or retry-after-ms headers."""
+    headers = getattr(getattr(e, "response", None), "headers", None)
+    if not headers:
+        return None
+    if headers.get("retry-after-ms"):
+        try:
+            return float(headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled continuously at per_minute.
+
+    Callers reserve capacity up front and are told how long to wait for it, so reservations
+    are served in arrival order and the bucket never needs a lock held across a wait.
+    """
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        self.rate = per_minute / 60
+        self.capacity = capacity or max(1.0, self.rate * BURST_SECONDS)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float) -> float:
+        """Takes amount from the bucket and returns the seconds until it is actually available."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            # A request larger than the bucket waits for a full bucket rather than forever
+            self.tokens -= min(amount, self.capacity)
+            return max(0.0, -self.tokens / self.rate)
+
+    def adjust(self, amount: float) -> None:
+        """Charges (positive) or refunds (negative) the difference between a reservation and actual use."""
+        with self._lock:
+            self.tokens = min(self.capacity, self.tokens - amount)
+
+
+class CircuitBreaker:
+    """
+    Pauses every request after too many consecutive transient failures.
+
+    While open, callers wait for the cooldown to end instead of failing, then requests resume.
+    Each time the breaker opens again without a success in between, the cooldown doubles up to
+    max_cooldown.
+    """
+
+    def __init__(self, failure_threshold: int, cooldown: float, max_cooldown: float = 300):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.failures = 0
+        self.opens = 0
+        self.consecutive_opens = 0
+        self.open_until = 0.0
+        self._lock = threading.Lock()
+
+    def wait_time(self) -> float:
+        with self._lock:
+            return max(0.0, self.open_until - time.monotonic())
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.consecutive_opens = 0
+
+    def record_failure(self, name: str) -> None:
+        if self.failure_threshold <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            if now < self.open_until:
+                return
+            self.failures += 1
+            if self.failures < self.failure_threshold:
+                return
+            pause = min(self.max_cooldown, self.cooldown * 2 ** self.consecutive_opens)
+            self.open_until = now + pause
+            self.failures = 0
+            self.opens += 1
+            self.consecutive_opens += 1
+        logger.warning(f"{name}: {self.failure_threshold} transient failures in a row, pausing requests for {pause:.0f}s")
+
+
+class LLMLimiter:
+    """
+    Client-side rate limits, retries and circuit breaking shared by every request to one backend.
+
+    Before each attempt a request waits for an open circuit, a request slot and its estimated
+    tokens. Transient errors (429, 5xx, timeouts, dropped connections) are retried up to
+    max_retries times, waiting as long as Retry-After asks or else a jittered exponential
+    backoff. Other errors are raised at once. Every request ends as one of: ok, retried_ok, or
+    failed, recorded per stage in instrumentation.
+
+    Args:
+        name (str): The backend, for logs.
+        requests_per_min (float): Request rate limit, 0 for none.
+        tokens_per_min (float): Prompt plus completion token rate limit, 0 for none.
+        max_retries (int): Retries of a transient failure before giving up.
+        breaker (CircuitBreaker): Shared pause after repeated transient failures.
+        base_delay (float, optional): First backoff, in seconds. Defaults to 1.
+        max_delay (float, optional): Longest backoff, in seconds. Defaults to 60.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        requests_per_min: float,
+        tokens_per_min: float,
+        max_retries: int,
+        breaker: CircuitBreaker,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+    ):
+        self.name = name
+        self.requests = TokenBucket(requests_per_min) if requests_per_min > 0 else None
+        self.tokens = TokenBucket(tokens_per_min) if tokens_per_min > 0 else None
+        self.max_retries = max_retries
+        self.breaker = breaker
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def _admission_wait(self, tokens: int) -> float:
+        wait = 0.0
+        if self.requests is not None:
+            wait = max(wait, self.requests.reserve(1))
+        if self.tokens is not None:
+            wait = max(wait, self.tokens.reserve(tokens + COMPLETION_TOKENS_ESTIMATE))
+        return wait
+
+    def _settle(self, response, tokens: int) -> None:
+        if self.tokens is None:
+            return
+        usage = getattr(response, "usage", None)
+        actual = getattr(usage, "total_tokens", None)
+        if actual is None and getattr(response, "eval_count", None) is not None:
+            actual = (getattr(response, "prompt_eval_count", 0) or 0) + response.eval_count
+        if actual is not None:
+            self.tokens.adjust(actual - tokens - COMPLETION_TOKENS_ESTIMATE)
+
+    def _retry_delay(self, e: BaseException, attempt: int, stage: str) -> Optional[float]:
+        """Returns how long to wait before retrying, or None if the error should be raised."""
+        if not is_retryable(e) or attempt >= self.max_retries:
+            return None
+        self.breaker.record_failure(self.name)
+        backoff = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        server_wait = retry_after(e)
+        delay = server_wait + random.uniform(0, self.base_delay) if server_wait is not None else backoff
+        logger.warning(f"{self.name} {stage} request failed ({type(e).__name__}: {e}), retry {attempt + 1} of {self.max_retries} in {delay:.1f}s")
+        return delay
+
+    async def acall(self, fn: Callable[[], Awaitable[T]], stage: str, tokens: int = 0) -> Tuple[T, float]:
+        """
+        Runs an async request under the limits, retrying transient failures.
+
+        Args:
+            fn (Callable[[], Awaitable[T]]): Starts one attempt of the request.
+            stage (str): The workflow stage, for metrics.
+            tokens (int, optional): Estimated prompt tokens. Defaults to 0.
+
+        Returns:
+            Tuple[T, float]: The response and the seconds its successful attempt took.
+        """
+        attempt = 0
+        while True:
+            await asyncio.sleep(max(self.breaker.wait_time(), self._admission_wait(tokens)))
+            start = time.perf_counter()
+            try:
+                response = await fn()
+            except Exception as e:
+                delay = self._retry_delay(e, attempt, stage)
+                if delay is None:
+                    record_request_outcome(stage, "failed", attempt)
+                    raise
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+            latency = time.perf_counter() - start
+            self.breaker.record_success()
+            self._settle(response, tokens)
+            record_request_outcome(stage, "retried_ok" if attempt else "ok", attempt)
+            return response, latency
+
+    def call(self, fn: Callable[[], T], stage: str, tokens: int = 0) -> Tuple[T, float]:
+        """Synchronous counterpart of acall."""
+        attempt = 0
+        while True:
+            time.sleep(max(self.breaker.wait_time(), self._admission_wait(tokens)))
+            start = time.perf_counter()
+            try:
+                response = fn()
+            except Exception as e:
+                delay = self._retry_delay(e, attempt, stage)
+                if delay is None:
+                    record_request_outcome(stage, "failed", attempt)
+                    raise
+                attempt += 1
+                time.sleep(delay)
+                continue
+            latency = time.perf_counter() - start
+            self.breaker.record_success()
+            self._settle(response, tokens)
+            record_request_outcome(stage, "retried_ok" if attempt else "ok", attempt)
+            return response, latency
+
+
+_limiters: Dict[str, LLMLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(backend: str = AI_BACKEND) -> LLMLimiter:
+    """Returns the process-wide limiter of a backend, configured from LLM_* and CIRCUIT_BREAKER_* settings."""
+    with _limiters_lock:
+        if backend not in _limiters:
+            _limiters[backend] = LLMLimiter(
+                backend,
+                LLM_REQUESTS_PER_MIN,
+                LLM_TOKENS_PER_MIN,
+                LLM_MAX_RETRIES,
+                CircuitBreaker(CIRCUIT_BREAKER_FAILURES, CIRCUIT_BREAKER_COOLDOWN_S),
+            )
+        return _limiters[backend]
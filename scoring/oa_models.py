@@ -1,11 +1,18 @@
+import asyncio
+import hashlib
+import json
 import logging
-from typing import List
+from typing import Any, Callable, Dict, List, Optional, Type
+from weakref import WeakKeyDictionary
 
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 from pydantic import BaseModel, Field
 
-from config import OPENAI_API_KEY
-from datamodels.models import SearchExtract, WorkflowReqs
+from config import require_openai_key
+from datamodels.models import BatchJDScores, JDScore, SearchExtract, WorkflowReqs
+from instrumentation import record_llm_call
+from .limits import get_limiter
+from .tokens import estimate_message_tokens
 
 logging.basicConfig(
     level=logging.INFO,
@@ -18,7 +25,63 @@ logger = logging.getLogger(__name__)
 model = "gpt-4.1-mini-2025-04-14" #$0.40 per mil
 # model = "gpt-4.1-2025-04-14" #$2.00 per million
 
-client = OpenAI(api_key=OPENAI_API_KEY)
+_client: Optional[OpenAI] = None
+# httpx binds async connection pools to the event loop that first uses them,
+# so keep one async client per running loop.
+_async_clients: WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncOpenAI] = WeakKeyDictionary()
+
+
+def get_client() -> OpenAI:
+    global _client
+    if _client is None:
+        # Retries are left to the shared limiter, so the SDK does not retry on its own as well
+        _client = OpenAI(api_key=require_openai_key(), max_retries=0)
+    return _client
+
+
+def get_async_client() -> AsyncOpenAI:
+    loop = asyncio.get_running_loop()
+    if loop not in _async_clients:
+        _async_clients[loop] = AsyncOpenAI(api_key=require_openai_key(), max_retries=0)
+    return _async_clients[loop]
+
+
+def _record_usage(stage: str, response, latency: float, model_name: Optional[str] = None) -> None:
+    usage = response.usage
+    if usage is None:
+        return
+    details = usage.prompt_tokens_details
+    record_llm_call(
+        backend="openai",
+        model=model_name or model,
+        stage=stage,
+        latency=latency,
+        prompt_tokens=usage.prompt_tokens,
+        completion_tokens=usage.completion_tokens,
+        cached_tokens=(details.cached_tokens or 0) if details else 0,
+    )
+
+
+def _request(stage: str, create: Callable[..., Any], model_name: Optional[str] = None, **kwargs) -> Any:
+    """
+    Sends one request through the shared rate limiter, retrying transient errors, and records its usage.
+    model_name overrides the module's model for this request.
+    """
+    model_name = model_name or model
+    response, latency = get_limiter("openai").call(
+        lambda: create(model=model_name, **kwargs), stage, estimate_message_tokens(kwargs["messages"])
+    )
+    _record_usage(stage, response, latency, model_name)
+    return response
+
+
+async def _async_request(stage: str, create: Callable[..., Any], model_name: Optional[str] = None, **kwargs) -> Any:
+    model_name = model_name or model
+    response, latency = await get_limiter("openai").acall(
+        lambda: create(model=model_name, **kwargs), stage, estimate_message_tokens(kwargs["messages"])
+    )
+    _record_usage(stage, response, latency, model_name)
+    return response
 
 
 # TODO: Move pydtantic models out of here.
@@ -26,24 +89,34 @@ class ResumeDigest(BaseModel):
     """First LLM call: Summarize the resume"""
     summary: str = Field(description="Summary of the input resume")
 
-class JDScore(BaseModel):
-    """Second LLM call score the JD against the resume"""
-    score: float = Field(description="Resume suitability score")
-    explanation: str = Field(description="Explanation of suitability score")
+def _gate_messages(prompt: str) -> List[Dict[str, str]]:
+    return [
+        {
+            "role": "system",
+            "content": "Analyze if the text contains information for a job search query (keywords, city, optional limit, optional hybrid status)",
+        },
+        {"role": "user", "content": prompt},
+    ]
+
+
+def _extract_messages(prompt: str) -> List[Dict[str, str]]:
+    return [
+        {
+            "role": "system",
+            "content": "Extract keywords to search, the city to search in, and optional hybrid / limit parameters",
+        },
+        {"role": "user", "content": prompt},
+    ]
+
 
 def check_search_prompt(prompt: str) -> SearchExtract:
     logger.info("Checking prompt validity")
-    completion = client.beta.chat.completions.parse(
-            model=model,
-            messages=[
-                {
-                    "role": "system",
-                    "content": "Analyze if the text contains information for a job search query (keywords, city, optional limit, optional hybrid status)",
-                },
-                {"role": "user", "content": prompt},
-            ],
+    completion = _request(
+            "gate",
+            get_client().beta.chat.completions.parse,
+            messages=_gate_messages(prompt),
             response_format=SearchExtract,
-            temperature=1.0
+            temperature=0.0
         )
     result = completion.choices[0].message.parsed
     logger.info("Check complete!")
@@ -51,15 +124,10 @@ def check_search_prompt(prompt: str) -> SearchExtract:
 
 def extract_reqs(prompt: str) -> WorkflowReqs:
     logger.info("Starting prompt extraction")
-    completion = client.beta.chat.completions.parse(
-        model=model,
-        messages=[
-            {
-                "role": "system",
-                "content": "Extract keywords to search, the city to search in, and optional hybrid / limit parameters",
-            },
-            {"role": "user", "content": prompt},
-        ],
+    completion = _request(
+        "extract",
+        get_client().beta.chat.completions.parse,
+        messages=_extract_messages(prompt),
         response_format=WorkflowReqs,
         temperature=0.0
     )
@@ -69,6 +137,30 @@ def extract_reqs(prompt: str) -> WorkflowReqs:
     return result
 
 
+async def async_check_search_prompt(prompt: str) -> SearchExtract:
+    """Async counterpart of check_search_prompt, so the gate can run alongside the extraction."""
+    completion = await _async_request(
+        "gate",
+        get_async_client().beta.chat.completions.parse,
+        messages=_gate_messages(prompt),
+        response_format=SearchExtract,
+        temperature=0.0
+    )
+    return completion.choices[0].message.parsed
+
+
+async def async_extract_reqs(prompt: str) -> WorkflowReqs:
+    """Async counterpart of extract_reqs."""
+    completion = await _async_request(
+        "extract",
+        get_async_client().beta.chat.completions.parse,
+        messages=_extract_messages(prompt),
+        response_format=WorkflowReqs,
+        temperature=0.0
+    )
+    return completion.choices[0].message.parsed
+
+
 
 def resume_summarizer(resume: str) -> ResumeDigest:
     """
@@ -90,8 +182,9 @@ def resume_summarizer(resume: str) -> ResumeDigest:
     logger.info("Starting resume summarizer")
     
 
-    completion = client.beta.chat.completions.parse(
-        model=model,
+    completion = _request(
+        "summary",
+        get_client().beta.chat.completions.parse,
         messages=[
             {
                 "role": "system",
@@ -107,6 +200,32 @@ def resume_summarizer(resume: str) -> ResumeDigest:
     return result
 
 
+def _score_messages(resume_text: str, job_description: str) -> List[Dict[str, str]]:
+    system_prompt = (
+        "You are an expert resume evaluator. Your task is to score a resume's suitability "
+        "for a given job description on a scale of 0 to 10. "
+        "A score of 10 indicates a perfect fit, and 0 indicates no fit. "
+        "Consider all aspects: skills, experience, qualifications, and alignment with the role's responsibilities. "
+        "Provide the numerical score as an float and a short explanation."
+    )
+
+    # System prompt and resume come first and are identical for every job, so providers
+    # can serve them from their prefix cache; only the job description varies.
+    job_prompt = (
+        f"Job Description:\n---\n{job_description}\n---\n\n"
+        "Score this resume against the job description (0-10):"
+    )
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": f"Resume:\n---\n{resume_text}\n---"},
+        {"role": "user", "content": job_prompt}
+    ]
+
+
+# Changes whenever the scoring prompt changes, so cached scores from an older prompt are never reused
+SCORE_PROMPT_VERSION = hashlib.sha256(json.dumps(_score_messages("", "")).encode()).hexdigest()[:12]
+
+
 def score_resume(resume_text: str, job_description: str) -> JDScore:
     """
     Evaluates the suitability of a resume for a specific job description.
@@ -120,61 +239,153 @@ def score_resume(resume_text: str, job_description: str) -> JDScore:
         resume_text (str): The plain text content of the candidate's resume.
         job_description (str): The plain text content of the job description.
 
+    Returns:
+        JDScore: An object containing the suitability score and an explanation, or a score of -1
+            if the request failed for good, after any retries of rate limits and transient errors.
+    """
+    try:
+        response = _request(
+            "score",
+            get_client().beta.chat.completions.parse,
+            messages=_score_messages(resume_text, job_description),
+            temperature=0.0,
+            response_format=JDScore
+        )
+        logger.info("Resume scoring successful!")
+        result = response.choices[0].message.parsed
+    except Exception as e:
+        logger.error(f"Failed to score resume: {e}")
+        result = JDScore(score=-1, explanation="Comparison failed")
+    return result
+
+
+async def async_score_resume(resume_text: str, job_description: str, model_name: Optional[str] = None) -> JDScore:
+    """
+    Async counterpart of score_resume used by the concurrent scoring engine.
+
+    Unlike score_resume, errors are raised rather than converted into a failed score,
+    so the caller decides how to isolate them.
+
+    Args:
+        resume_text (str): The plain text content of the candidate's resume.
+        job_description (str): The plain text content of the job description.
+        model_name (str, optional): Score with this model instead of the module's model, e.g. for a cascade.
+
     Returns:
         JDScore: An object containing the suitability score and an explanation.
     """
+    response = await _async_request(
+        "score",
+        get_async_client().beta.chat.completions.parse,
+        model_name=model_name,
+        messages=_score_messages(resume_text, job_description),
+        temperature=0.0,
+        response_format=JDScore
+    )
+    return response.choices[0].message.parsed
+
 
+def _strict_schema(schema: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Returns a pydantic JSON schema in the form strict structured outputs require: every object
+    closed to extra properties and with all of its properties required, including nested ones.
+    """
+    schema = dict(schema)
+    if schema.get("type") == "object" and "properties" in schema:
+        schema["properties"] = {k: _strict_schema(v) for k, v in schema["properties"].items()}
+        schema["required"] = list(schema["properties"])
+        schema["additionalProperties"] = False
+    if "items" in schema:
+        schema["items"] = _strict_schema(schema["items"])
+    for key in ("$defs", "definitions"):
+        if key in schema:
+            schema[key] = {k: _strict_schema(v) for k, v in schema[key].items()}
+    for key in ("anyOf", "allOf"):
+        if key in schema:
+            schema[key] = [_strict_schema(x) for x in schema[key]]
+    return schema
+
+
+def response_format(response_model: Type[BaseModel]) -> Dict[str, Any]:
+    """The strict json_schema response format beta.chat.completions.parse sends for response_model."""
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": response_model.__name__,
+            "strict": True,
+            "schema": _strict_schema(response_model.model_json_schema()),
+        },
+    }
+
+
+def score_request_body(resume_text: str, job_description: str, model_name: Optional[str] = None) -> Dict[str, Any]:
+    """
+    The chat completions request body score_resume sends, for requests made outside the SDK,
+    such as lines of a Batch API input file. The response format is the same strict JSON schema
+    of JDScore that beta.chat.completions.parse sends, so both paths score identically.
+    """
+    return {
+        "model": model_name or model,
+        "messages": _score_messages(resume_text, job_description),
+        "temperature": 0.0,
+        "response_format": response_format(JDScore),
+    }
+
+
+def _batch_score_messages(resume_text: str, job_descriptions: List[str]) -> List[Dict[str, str]]:
     system_prompt = (
         "You are an expert resume evaluator. Your task is to score a resume's suitability "
-        "for a given job description on a scale of 0 to 10. "
+        "for each of several numbered job descriptions on a scale of 0 to 10. "
         "A score of 10 indicates a perfect fit, and 0 indicates no fit. "
+        "Score every job description independently of the others. "
         "Consider all aspects: skills, experience, qualifications, and alignment with the role's responsibilities. "
+        "For each job description, return its number as job_index. "
         "Provide the numerical score as an float and a short explanation."
     )
 
-    user_prompt = (
-        f"Resume:\n---\n{resume_text}\n---\n\n"
-        f"Job Description:\n---\n{job_description}\n---\n\n"
-        "Score this resume against the job description (0-10):"
+    jobs = "".join(
+        f"Job Description {i}:\n---\n{description}\n---\n\n" for i, description in enumerate(job_descriptions)
+    )
+    job_prompt = (
+        f"{jobs}"
+        f"Score this resume against each of the {len(job_descriptions)} job descriptions (0-10):"
     )
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": f"Resume:\n---\n{resume_text}\n---"},
+        {"role": "user", "content": job_prompt}
+    ]
 
-    try:
-        response = client.beta.chat.completions.parse(
-            model=model,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            temperature=0.0,
-            response_format=JDScore
-        )
-        logger.info("Resume scoring successful!")
-        result = response.choices[0].message.parsed
-    except Exception as e:
-        logger.error(f"Failed to score resume: {e}")
-        result = JDScore(score=-1, explanation="Comparison failed")
-    return result
 
+BATCH_SCORE_PROMPT_VERSION = hashlib.sha256(json.dumps(_batch_score_messages("", [])).encode()).hexdigest()[:12]
 
-def summarize_gaps(explanations: List[str]) -> str:
+
+async def async_score_resume_batch(resume_text: str, job_descriptions: List[str]) -> BatchJDScores:
     """
-    Analyzes a list of eplanations to extract missing skills or experiences.
+    Scores one resume against several job descriptions in a single request.
 
-    This function sends the provided list of explanations to an LLM, which returns
-    a concise bullet-point list of specific skills or experiences that are identified as missing
-    or could be improved upon for a higher suitability score. The output is intended to help
-    candidates understand what areas of their resume could be strengthened to better match job requirements.
+    The resume is sent once, followed by the numbered job descriptions, so the prompt cost of the
+    resume is shared across the batch. Errors are raised; the caller validates that every job got a score.
 
     Args:
-        explanations (List[str]): List of rationale strings, each describing aspects of a candidate's profile
-                                  in relation to a job description.
+        resume_text (str): The plain text content of the candidate's resume.
+        job_descriptions (List[str]): The plain text content of each job description.
 
     Returns:
-        str: A bullet-point list of missing skills or experiences, as identified by the LLM.
+        BatchJDScores: One score per job description, identified by job_index.
     """
-    logger.info("Starting gap summarizer")
-    
-    explanations = [f"Rationale {i}: {x}" for i, x in enumerate(explanations)]    
+    response = await _async_request(
+        "score",
+        get_async_client().beta.chat.completions.parse,
+        messages=_batch_score_messages(resume_text, job_descriptions),
+        temperature=0.0,
+        response_format=BatchJDScores
+    )
+    return response.choices[0].message.parsed
+
+
+def _gap_messages(explanations: List[str]) -> List[Dict[str, str]]:
+    explanations = [f"Rationale {i}: {x}" for i, x in enumerate(explanations)]
 
     system_prompt = (
         "You are an expert at identifying and articulating missing skills and experiences."
@@ -190,14 +401,55 @@ def summarize_gaps(explanations: List[str]) -> str:
         f"{'\n--\n'.join(explanations)}\n--\n\n"
         "List the identified gaps:"
     )
-    
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt}
+    ]
+
+
+def _merge_gap_messages(summaries: List[str]) -> List[Dict[str, str]]:
+    system_prompt = (
+        "You are an expert at identifying and articulating missing skills and experiences. "
+        "Your task is to merge several bullet-point lists of missing skills or experiences, each drawn from a different set of jobs, into one list. "
+        "Combine duplicates and near-duplicates into a single bullet, keep every distinct gap, and list the gaps that appear in the most lists first. "
+        "Provide your response as a concise list of bullet points, with each point clearly stating a missing skill or experience. "
+        "Do not include any introductory or concluding remarks, just the bullet points."
+    )
+
+    lists = [f"List {i}:\n{x}" for i, x in enumerate(summaries)]
+    user_prompt = (
+        f"Merge the following lists of missing skills or experiences:\n"
+        f"{'\n--\n'.join(lists)}\n--\n\n"
+        "List the merged gaps:"
+    )
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt}
+    ]
+
+
+def summarize_gaps(explanations: List[str]) -> str:
+    """
+    Analyzes a list of eplanations to extract missing skills or experiences.
+
+    This function sends the provided list of explanations to an LLM, which returns
+    a concise bullet-point list of specific skills or experiences that are identified as missing
+    or could be improved upon for a higher suitability score. The output is intended to help
+    candidates understand what areas of their resume could be strengthened to better match job requirements.
+
+    Args:
+        explanations (List[str]): List of rationale strings, each describing aspects of a candidate's profile
+                                  in relation to a job description.
+
+    Returns:
+        str: A bullet-point list of missing skills or experiences, as identified by the LLM.
+    """
+    logger.info("Starting gap summarizer")
     try:
-        response = client.chat.completions.create(
-            model=model,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
+        response = _request(
+            "gaps",
+            get_client().chat.completions.create,
+            messages=_gap_messages(explanations),
             temperature=0.0
         )
         logger.info("Gap summarizaton complete")
@@ -205,4 +457,39 @@ def summarize_gaps(explanations: List[str]) -> str:
     except Exception as e:
         logger.error(f"Failed to identify gaps resume: {e}")
         result = f"Unable to analyze gaps: {e}"
-    return result
\ No newline at end of file
+    return result
+
+
+async def _async_gap_completion(messages: List[Dict[str, str]]) -> str:
+    response = await _async_request(
+        "gaps", get_async_client().chat.completions.create, messages=messages, temperature=0.0
+    )
+    return response.choices[0].message.content
+
+
+async def async_summarize_gaps(explanations: List[str]) -> str:
+    """
+    Async counterpart of summarize_gaps, used for the map step of map-reduce gap summarization.
+
+    Errors are raised rather than returned as text, so the caller decides how to handle them.
+
+    Args:
+        explanations (List[str]): Rationale strings for the jobs in one chunk.
+
+    Returns:
+        str: A bullet-point list of missing skills or experiences.
+    """
+    return await _async_gap_completion(_gap_messages(explanations))
+
+
+async def async_merge_gap_summaries(summaries: List[str]) -> str:
+    """
+    Merges several gap bullet lists into one, combining duplicates. Used for the reduce step.
+
+    Args:
+        summaries (List[str]): Bullet-point lists returned by async_summarize_gaps or by earlier merges.
+
+    Returns:
+        str: One merged bullet-point list of missing skills or experiences.
+    """
+    return await _async_gap_completion(_merge_gap_messages(summaries))
@@ -1,10 +1,22 @@
+import asyncio
+import hashlib
+import json
 import logging
-from typing import List
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional
+from weakref import WeakKeyDictionary
 
-from ollama import chat
+from ollama import AsyncClient, chat
 from pydantic import BaseModel, Field
 
-from datamodels.models import SearchExtract, WorkflowReqs
+from config import OLLAMA_HOSTS, OLLAMA_KEEP_ALIVE, OLLAMA_MAX_CTX, OLLAMA_MIN_CTX, OLLAMA_THROUGHPUT
+from datamodels.models import BatchJDScores, JDScore, SearchExtract, WorkflowReqs
+from instrumentation import record_llm_call
+from .limits import get_limiter
+from .ollama_pool import OllamaPool
+from .tokens import estimate_message_tokens
 
 logging.basicConfig(
     level=logging.INFO,
@@ -15,28 +27,160 @@ logger = logging.getLogger(__name__)
 
 model = "gemma3:1b"
 
+# Ollama reads a bare number as seconds, and a negative one as "until the server stops"
+KEEP_ALIVE = float(OLLAMA_KEEP_ALIVE) if re.fullmatch(r"-?\d+(\.\d+)?", OLLAMA_KEEP_ALIVE) else OLLAMA_KEEP_ALIVE
+# Size each request's context window to its prompt (throughput mode)
+throughput = OLLAMA_THROUGHPUT
+# Completion tokens reserved in the context window per scored job, and for other requests
+SCORE_OUTPUT_TOKENS = 256
+DEFAULT_OUTPUT_TOKENS = 1024
+# Token estimates are rough, so leave headroom before a prompt would be cut off
+CTX_MARGIN = 1.2
+# Assumed job description length when the context window is sized before any posting is fetched
+TYPICAL_JD_TOKENS = 1500
+# Sampling seed sent with every pooled request, so a job scores the same whichever host serves it
+SEED = 0
+
+# httpx binds async connection pools to the event loop that first uses them,
+# so keep one async client per running loop.
+_async_clients: WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncClient] = WeakKeyDictionary()
+
+
+def get_async_client() -> AsyncClient:
+    loop = asyncio.get_running_loop()
+    if loop not in _async_clients:
+        _async_clients[loop] = AsyncClient()
+    return _async_clients[loop]
+
+
+_pool: Optional[OllamaPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> Optional[OllamaPool]:
+    """The pool of OLLAMA_HOSTS, created on first use, or None to send every request to the one server."""
+    global _pool
+    with _pool_lock:
+        if _pool is None and OLLAMA_HOSTS:
+            _pool = OllamaPool(OLLAMA_HOSTS)
+            logger.info(f"Spreading Ollama requests over {len(OLLAMA_HOSTS)} hosts: {', '.join(OLLAMA_HOSTS)}")
+        return _pool
+
+
+_num_ctx: Dict[str, int] = {}
+_num_ctx_lock = threading.Lock()
+
+
+def context_size(model_name: str, prompt_tokens: int, output_tokens: int = DEFAULT_OUTPUT_TOKENS) -> int:
+    """
+    Returns the num_ctx for a request: the smallest power of two from OLLAMA_MIN_CTX that holds the
+    prompt and the completion, capped at OLLAMA_MAX_CTX.
+
+    Ollama reloads a model whenever num_ctx changes, so within a process the size per model only
+    grows: a request that fits the window already in use keeps it instead of forcing a reload.
+    """
+    need = int((prompt_tokens + output_tokens) * CTX_MARGIN)
+    size = OLLAMA_MIN_CTX
+    while size < need and size < OLLAMA_MAX_CTX:
+        size *= 2
+    size = min(size, OLLAMA_MAX_CTX)
+    if need > size:
+        logger.warning(f"About {need} tokens do not fit OLLAMA_MAX_CTX={OLLAMA_MAX_CTX}, {model_name} will truncate the prompt")
+    with _num_ctx_lock:
+        size = _num_ctx[model_name] = max(size, _num_ctx.get(model_name, 0))
+    return size
+
+
+def _options(model_name: str, messages: List[Dict[str, str]], options: Optional[Dict[str, Any]], output_tokens: int) -> Dict[str, Any]:
+    options = dict(options or {})
+    if get_pool() is not None:
+        options.setdefault("seed", SEED)
+    if throughput:
+        options["num_ctx"] = context_size(model_name, estimate_message_tokens(messages), output_tokens)
+    return options
+
+
+def _record_usage(stage: str, response, latency: float, model_name: Optional[str] = None) -> None:
+    # Ollama does not report cache hits: prompt_eval_count only counts the tokens it evaluated,
+    # so the cached tokens are unknown rather than guessed from a character-based estimate.
+    record_llm_call(
+        backend="ollama",
+        model=model_name or model,
+        stage=stage,
+        latency=latency,
+        prompt_tokens=response.prompt_eval_count or 0,
+        completion_tokens=response.eval_count or 0,
+        cached_tokens=None,
+        prefill_seconds=(response.prompt_eval_duration or 0) / 1e9,
+    )
+
+
+def _chat(stage: str, messages: List[Dict[str, str]], output_tokens: int = DEFAULT_OUTPUT_TOKENS, **kwargs) -> Any:
+    """
+    Sends one chat request through the shared rate limiter, retrying transient errors, and records its usage.
+    The model is kept loaded for KEEP_ALIVE; in throughput mode the context window is sized to the
+    prompt plus output_tokens. With OLLAMA_HOSTS set, the request goes to the least loaded pooled host.
+    """
+    kwargs.setdefault("keep_alive", KEEP_ALIVE)
+    kwargs["options"] = _options(model, messages, kwargs.get("options"), output_tokens)
+    pool = get_pool()
+    send = pool.chat if pool is not None else chat
+    response, latency = get_limiter("ollama").call(
+        lambda: send(model=model, messages=messages, **kwargs), stage, estimate_message_tokens(messages)
+    )
+    _record_usage(stage, response, latency)
+    return response
+
+
+async def _async_chat(
+    stage: str,
+    messages: List[Dict[str, str]],
+    model_name: Optional[str] = None,
+    output_tokens: int = DEFAULT_OUTPUT_TOKENS,
+    **kwargs,
+) -> Any:
+    model_name = model_name or model
+    kwargs.setdefault("keep_alive", KEEP_ALIVE)
+    kwargs["options"] = _options(model_name, messages, kwargs.get("options"), output_tokens)
+    pool = get_pool()
+    send = pool.achat if pool is not None else get_async_client().chat
+    response, latency = await get_limiter("ollama").acall(
+        lambda: send(model=model_name, messages=messages, **kwargs), stage, estimate_message_tokens(messages)
+    )
+    _record_usage(stage, response, latency, model_name)
+    return response
+
 # TODO: Move pydtantic models out of here.
 class ResumeDigest(BaseModel):
     """First LLM call: Summarize the resume"""
     summary: str = Field(description="Summary of the input resume")
 
-class JDScore(BaseModel):
-    """Second LLM call score the JD against the resume"""
-    score: float = Field(description="Resume suitability score")
-    explanation: str = Field(description="Explanation of suitability score")
+def _gate_messages(prompt: str) -> List[Dict[str, str]]:
+    prompt = f"Does the following sentence include job search keywords (job title, city, number of results)?: {prompt}"
+    return [
+        {
+            "role": "system",
+            "content": "You are a helpful assistant designed to validate job search prompts for relevance and data quality.  Your task is to analyze the prompt to determine if it contains keywords indicative of a job search query, a city, and optionally a hybrid status. Respond with a boolean indicating the presence of these elements, a confidence score, and a concise explanation supporting the confidence score"
+        },
+        {"role": "user", "content": prompt},
+    ]
+
+
+def _extract_messages(prompt: str) -> List[Dict[str, str]]:
+    return [
+        {
+            "role": "system",
+            "content": "You are a helpful assistant designed to extract job search information from the prompt.  Your task is to analyze the prompt and extract: a job title, a city, optionally a limit on results and optionally a hybrid status. You are FORBIDDEN from filling in the resume field.",
+        },
+        {"role": "user", "content": prompt},
+    ]
+
 
 def check_search_prompt(prompt: str) -> SearchExtract:
     logger.info("Checking prompt validity")
-    prompt = f"Does the following sentence include job search keywords (job title, city, number of results)?: {prompt}"
-    completion = chat(
-            model=model,
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are a helpful assistant designed to validate job search prompts for relevance and data quality.  Your task is to analyze the prompt to determine if it contains keywords indicative of a job search query, a city, and optionally a hybrid status. Respond with a boolean indicating the presence of these elements, a confidence score, and a concise explanation supporting the confidence score"
-                },
-                {"role": "user", "content": prompt},
-            ],
+    completion = _chat(
+            "gate",
+            messages=_gate_messages(prompt),
             format=SearchExtract.model_json_schema(),
             options={"temperature": 0.0},
         )
@@ -46,15 +190,9 @@ def check_search_prompt(prompt: str) -> SearchExtract:
 
 def extract_reqs(prompt: str) -> WorkflowReqs:
     logger.info("Starting prompt extraction")
-    completion = chat(
-        model=model,
-        messages=[
-            {
-                "role": "system",
-                "content": "You are a helpful assistant designed to extract job search information from the prompt.  Your task is to analyze the prompt and extract: a job title, a city, optionally a limit on results and optionally a hybrid status. You are FORBIDDEN from filling in the resume field.",
-            },
-            {"role": "user", "content": prompt},
-        ],
+    completion = _chat(
+        "extract",
+        messages=_extract_messages(prompt),
         format=WorkflowReqs.model_json_schema(),
         options={"temperature": 0},
     )
@@ -64,6 +202,28 @@ def extract_reqs(prompt: str) -> WorkflowReqs:
     return result
 
 
+async def async_check_search_prompt(prompt: str) -> SearchExtract:
+    """Async counterpart of check_search_prompt, so the gate can run alongside the extraction."""
+    completion = await _async_chat(
+        "gate",
+        _gate_messages(prompt),
+        format=SearchExtract.model_json_schema(),
+        options={"temperature": 0.0},
+    )
+    return SearchExtract.model_validate_json(completion.message.content)
+
+
+async def async_extract_reqs(prompt: str) -> WorkflowReqs:
+    """Async counterpart of extract_reqs."""
+    completion = await _async_chat(
+        "extract",
+        _extract_messages(prompt),
+        format=WorkflowReqs.model_json_schema(),
+        options={"temperature": 0},
+    )
+    return WorkflowReqs.model_validate_json(completion.message.content)
+
+
 
 def resume_summarizer(resume: str) -> ResumeDigest:
     """
@@ -85,8 +245,8 @@ def resume_summarizer(resume: str) -> ResumeDigest:
     logger.info("Starting resume summarizer")
     
 
-    completion = chat(
-        model=model,
+    completion = _chat(
+        "summary",
         messages=[
             {
                 "role": "system",
@@ -102,6 +262,33 @@ def resume_summarizer(resume: str) -> ResumeDigest:
     return result
 
 
+def _score_messages(resume_text: str, job_description: str) -> List[Dict[str, str]]:
+    system_prompt = (
+        "You are an expert resume evaluator. Your task is to score a resume's suitability "
+        "for a given job description on a scale of 0 to 10. "
+        "A score of 10 indicates a perfect fit, and 0 indicates no fit. "
+        "Be harsh but fair. "
+        "Consider all aspects: skills, experience, qualifications, and alignment with the role's responsibilities. "
+        "Provide the numerical score as an float and a short explanation (<100 words)."
+    )
+
+    # System prompt and resume come first and are identical for every job, so providers
+    # can serve them from their prefix cache; only the job description varies.
+    job_prompt = (
+        f"Job Description:\n---\n{job_description}\n---\n\n"
+        "Score this resume against the job description (0-10)."
+    )
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": f"Resume:\n---\n{resume_text}\n---"},
+        {"role": "user", "content": job_prompt}
+    ]
+
+
+# Changes whenever the scoring prompt changes, so cached scores from an older prompt are never reused
+SCORE_PROMPT_VERSION = hashlib.sha256(json.dumps(_score_messages("", "")).encode()).hexdigest()[:12]
+
+
 def score_resume(resume_text: str, job_description: str) -> JDScore:
     """
     Evaluates the suitability of a resume for a specific job description.
@@ -115,61 +302,110 @@ def score_resume(resume_text: str, job_description: str) -> JDScore:
         resume_text (str): The plain text content of the candidate's resume.
         job_description (str): The plain text content of the job description.
 
+    Returns:
+        JDScore: An object containing the suitability score and an explanation, or a score of -1
+            if the request failed for good, after any retries of rate limits and transient errors.
+    """
+    try:
+        messages = _score_messages(resume_text, job_description)
+        response = _chat(
+            "score",
+            messages=messages,
+            options={"temperature": 0},
+            format=JDScore.model_json_schema(),
+            output_tokens=SCORE_OUTPUT_TOKENS,
+        )
+        logger.info("Resume scoring successful!")
+        result = JDScore.model_validate_json(response.message.content)
+    except Exception as e:
+        logger.error(f"Failed to score resume: {e}")
+        result = JDScore(score=-1, explanation="Comparison failed")
+    return result
+
+
+async def async_score_resume(resume_text: str, job_description: str, model_name: Optional[str] = None) -> JDScore:
+    """
+    Async counterpart of score_resume used by the concurrent scoring engine.
+
+    Unlike score_resume, errors are raised rather than converted into a failed score,
+    so the caller decides how to isolate them.
+
+    Args:
+        resume_text (str): The plain text content of the candidate's resume.
+        job_description (str): The plain text content of the job description.
+        model_name (str, optional): Score with this model instead of the module's model, e.g. for a cascade.
+
     Returns:
         JDScore: An object containing the suitability score and an explanation.
     """
+    messages = _score_messages(resume_text, job_description)
+    response = await _async_chat(
+        "score",
+        messages=messages,
+        model_name=model_name,
+        options={"temperature": 0},
+        format=JDScore.model_json_schema(),
+        output_tokens=SCORE_OUTPUT_TOKENS,
+    )
+    return JDScore.model_validate_json(response.message.content)
+
 
+def _batch_score_messages(resume_text: str, job_descriptions: List[str]) -> List[Dict[str, str]]:
     system_prompt = (
         "You are an expert resume evaluator. Your task is to score a resume's suitability "
-        "for a given job description on a scale of 0 to 10. "
+        "for each of several numbered job descriptions on a scale of 0 to 10. "
         "A score of 10 indicates a perfect fit, and 0 indicates no fit. "
         "Be harsh but fair. "
+        "Score every job description independently of the others. "
         "Consider all aspects: skills, experience, qualifications, and alignment with the role's responsibilities. "
+        "For each job description, return its number as job_index. "
         "Provide the numerical score as an float and a short explanation (<100 words)."
     )
 
-    user_prompt = (
-        f"Resume:\n---\n{resume_text}\n---\n\n"
-        f"Job Description:\n---\n{job_description}\n---\n\n"
-        "Score this resume against the job description (0-10)."
+    jobs = "".join(
+        f"Job Description {i}:\n---\n{description}\n---\n\n" for i, description in enumerate(job_descriptions)
     )
-    try:
-        response = chat(
-            model=model,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            options={"temperature": 0},
-            format=JDScore.model_json_schema()
-        )
-        logger.info("Resume scoring successful!")
-        result = JDScore.model_validate_json(response.message.content)
-    except Exception as e:
-        logger.error(f"Failed to score resume: {e}")
-        result = JDScore(score=-1, explanation="Comparison failed")
-    return result
+    job_prompt = (
+        f"{jobs}"
+        f"Score this resume against each of the {len(job_descriptions)} job descriptions (0-10):"
+    )
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": f"Resume:\n---\n{resume_text}\n---"},
+        {"role": "user", "content": job_prompt}
+    ]
 
 
-def summarize_gaps(explanations: List[str]) -> str:
+BATCH_SCORE_PROMPT_VERSION = hashlib.sha256(json.dumps(_batch_score_messages("", [])).encode()).hexdigest()[:12]
+
+
+async def async_score_resume_batch(resume_text: str, job_descriptions: List[str]) -> BatchJDScores:
     """
-    Analyzes a list of eplanations to extract missing skills or experiences.
+    Scores one resume against several job descriptions in a single request.
 
-    This function sends the provided list of explanations to an LLM, which returns
-    a concise bullet-point list of specific skills or experiences that are identified as missing
-    or could be improved upon for a higher suitability score. The output is intended to help
-    candidates understand what areas of their resume could be strengthened to better match job requirements.
+    The resume is sent once, followed by the numbered job descriptions, so the prompt cost of the
+    resume is shared across the batch. Errors are raised; the caller validates that every job got a score.
 
     Args:
-        explanations (List[str]): List of rationale strings, each describing aspects of a candidate's profile
-                                  in relation to a job description.
+        resume_text (str): The plain text content of the candidate's resume.
+        job_descriptions (List[str]): The plain text content of each job description.
 
     Returns:
-        str: A bullet-point list of missing skills or experiences, as identified by the LLM.
+        BatchJDScores: One score per job description, identified by job_index.
     """
-    logger.info("Starting gap summarizer")
-    
-    explanations = [f"Rationale {i}: {x}" for i, x in enumerate(explanations)]    
+    messages = _batch_score_messages(resume_text, job_descriptions)
+    response = await _async_chat(
+        "score",
+        messages=messages,
+        options={"temperature": 0},
+        format=BatchJDScores.model_json_schema(),
+        output_tokens=SCORE_OUTPUT_TOKENS * len(job_descriptions),
+    )
+    return BatchJDScores.model_validate_json(response.message.content)
+
+
+def _gap_messages(explanations: List[str]) -> List[Dict[str, str]]:
+    explanations = [f"Rationale {i}: {x}" for i, x in enumerate(explanations)]
 
     system_prompt = (
         "You are an expert at identifying and articulating missing skills and experiences."
@@ -185,14 +421,55 @@ def summarize_gaps(explanations: List[str]) -> str:
         f"{'\n--\n'.join(explanations)}\n--\n\n"
         "List the identified gaps:"
     )
-    
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt}
+    ]
+
+
+def _merge_gap_messages(summaries: List[str]) -> List[Dict[str, str]]:
+    system_prompt = (
+        "You are an expert at identifying and articulating missing skills and experiences. "
+        "Your task is to merge several bullet-point lists of missing skills or experiences, each drawn from a different set of jobs, into one list. "
+        "Combine duplicates and near-duplicates into a single bullet, keep every distinct gap, and list the gaps that appear in the most lists first. "
+        "Provide your response as a concise list of bullet points, with each point clearly stating a missing skill or experience. "
+        "Do not include any introductory or concluding remarks, just the bullet points."
+    )
+
+    lists = [f"List {i}:\n{x}" for i, x in enumerate(summaries)]
+    user_prompt = (
+        f"Merge the following lists of missing skills or experiences:\n"
+        f"{'\n--\n'.join(lists)}\n--\n\n"
+        "List the merged gaps:"
+    )
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt}
+    ]
+
+
+def summarize_gaps(explanations: List[str]) -> str:
+    """
+    Analyzes a list of eplanations to extract missing skills or experiences.
+
+    This function sends the provided list of explanations to an LLM, which returns
+    a concise bullet-point list of specific skills or experiences that are identified as missing
+    or could be improved upon for a higher suitability score. The output is intended to help
+    candidates understand what areas of their resume could be strengthened to better match job requirements.
+
+    Args:
+        explanations (List[str]): List of rationale strings, each describing aspects of a candidate's profile
+                                  in relation to a job description.
+
+    Returns:
+        str: A bullet-point list of missing skills or experiences, as identified by the LLM.
+    """
+    logger.info("Starting gap summarizer")
     try:
-        response = chat(
-            model=model,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
+        messages = _gap_messages(explanations)
+        response = _chat(
+            "gaps",
+            messages=messages,
             options={"temperature": 0},
         )
         logger.info("Gap summarizaton complete")
@@ -200,4 +477,78 @@ def summarize_gaps(explanations: List[str]) -> str:
     except Exception as e:
         logger.error(f"Failed to identify gaps resume: {e}")
         result = f"Unable to analyze gaps: {e}"
-    return result
\ No newline at end of file
+    return result
+
+
+async def _async_gap_completion(messages: List[Dict[str, str]]) -> str:
+    response = await _async_chat(
+        "gaps",
+        messages=messages,
+        options={"temperature": 0}
+    )
+    return response.message.content
+
+
+async def async_summarize_gaps(explanations: List[str]) -> str:
+    """
+    Async counterpart of summarize_gaps, used for the map step of map-reduce gap summarization.
+
+    Errors are raised rather than returned as text, so the caller decides how to handle them.
+
+    Args:
+        explanations (List[str]): Rationale strings for the jobs in one chunk.
+
+    Returns:
+        str: A bullet-point list of missing skills or experiences.
+    """
+    return await _async_gap_completion(_gap_messages(explanations))
+
+
+async def async_merge_gap_summaries(summaries: List[str]) -> str:
+    """
+    Merges several gap bullet lists into one, combining duplicates. Used for the reduce step.
+
+    Args:
+        summaries (List[str]): Bullet-point lists returned by async_summarize_gaps or by earlier merges.
+
+    Returns:
+        str: One merged bullet-point list of missing skills or experiences.
+    """
+    return await _async_gap_completion(_merge_gap_messages(summaries))
+
+
+def prewarm(model_names: Optional[List[str]] = None, prompt_tokens: int = 0) -> None:
+    """
+    Loads models into memory with the keep_alive and context window scoring will use, so the first
+    scores do not wait for the model to load, or for a reload to a larger window. With OLLAMA_HOSTS
+    set, every pooled host loads them.
+
+    Args:
+        model_names (List[str], optional): Models to load. Defaults to the module's model.
+        prompt_tokens (int, optional): Expected prompt size of a scoring request, to size the window.
+    """
+    pool = get_pool()
+    for name in model_names or [model]:
+        start = time.perf_counter()
+        options = {"num_ctx": context_size(name, prompt_tokens, SCORE_OUTPUT_TOKENS)} if throughput else None
+        try:
+            # A chat request without messages only loads the model
+            if pool is not None:
+                hosts = pool.load(name, keep_alive=KEEP_ALIVE, options=options)
+                logger.info(f"Loaded {name} on {len(hosts)} of {len(pool.hosts)} hosts in {time.perf_counter() - start:.1f}s")
+                continue
+            chat(model=name, messages=[], keep_alive=KEEP_ALIVE, options=options)
+            logger.info(f"Loaded {name} in {time.perf_counter() - start:.1f}s, keep_alive={KEEP_ALIVE}, options={options}")
+        except Exception as e:
+            logger.warning(f"Could not prewarm {name}: {e}")
+
+
+def start_prewarm(model_names: Optional[List[str]] = None, resume: str = "") -> threading.Thread:
+    """
+    Prewarms in a background thread, so loading the model overlaps the prompt check and the fetch.
+    The window is sized for the resume and a job description of TYPICAL_JD_TOKENS.
+    """
+    prompt_tokens = estimate_message_tokens(_score_messages(resume, "")) + TYPICAL_JD_TOKENS
+    thread = threading.Thread(target=prewarm, args=(model_names, prompt_tokens), name="ollama-prewarm", daemon=True)
+    thread.start()
+    return thread
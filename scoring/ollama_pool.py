@@ -0,0 +1,263 @@
+import asyncio
+from collections import Counter
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Set
+from weakref import WeakKeyDictionary
+
+from ollama import AsyncClient, Client
+
+from config import (
+    OLLAMA_HEALTH_INTERVAL_S,
+    OLLAMA_HOST_COOLDOWN_S,
+    OLLAMA_NUM_PARALLEL,
+    OLLAMA_REQUEST_TIMEOUT_S,
+)
+from instrumentation import record_host_request
+from .limits import is_retryable
+
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+logger = logging.getLogger(__name__)
+
+# Health checks only list the host's models, so they get a much shorter timeout than requests
+HEALTH_TIMEOUT_S = 5.0
+# A host whose average latency is this many times the fastest host's only gets requests
+# when no faster host has a free slot
+SLOW_FACTOR = 3.0
+# Weight of the newest request in a host's moving average latency
+LATENCY_ALPHA = 0.2
+
+
+def model_key(name: str) -> str:
+    """Ollama lists untagged models under their :latest tag."""
+    return name if ":" in name else f"{name}:latest"
+
+
+class OllamaHost:
+    """Routing state of one pooled Ollama server."""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.outstanding = 0
+        self.healthy = True
+        self.down_until = 0.0
+        self.latency: Optional[float] = None
+        # Model name -> digest of the weights the host serves, from the last health check
+        self.models: Dict[str, str] = {}
+
+    def available(self, now: float) -> bool:
+        return self.healthy or now >= self.down_until
+
+
+class OllamaPool:
+    """
+    Spreads Ollama requests over several servers.
+
+    Each request goes to the host with the fewest requests in flight, measured against its slots.
+    Ties go to the host that has answered fastest. A host that is refused, times out or returns
+    a 5xx pauses for a cooldown, and the request moves to the next host. Only when every host
+    has failed does the error reach the caller, i.e. the shared limiter, which backs off and
+    retries. A background thread checks every host periodically. A host that answers again
+    rejoins the pool; one that stops answering leaves it.
+
+    Ranked output matches a single host as long as every host serves the same weights. The
+    health check reads each host's model digests. A host whose digest for a model differs from
+    the majority gets no requests for that model. Requests carry the same options, including a
+    fixed seed, whichever host serves them.
+
+    Args:
+        hosts (List[str]): Base URLs of the Ollama servers.
+        slots (int, optional): Parallel slots of each server. Defaults to OLLAMA_NUM_PARALLEL.
+        request_timeout (float, optional): Seconds before a request is abandoned and retried on another host.
+            Defaults to OLLAMA_REQUEST_TIMEOUT_S.
+        cooldown (float, optional): Seconds a failed host gets no requests. Defaults to OLLAMA_HOST_COOLDOWN_S.
+        health_interval (float, optional): Seconds between health checks, 0 to check only once at startup.
+            Defaults to OLLAMA_HEALTH_INTERVAL_S.
+        client_factory (Callable, optional): Creates the synchronous client of a host. Defaults to ollama.Client.
+        async_client_factory (Callable, optional): Creates the async client of a host. Defaults to ollama.AsyncClient.
+    """
+
+    def __init__(
+        self,
+        hosts: List[str],
+        slots: int = OLLAMA_NUM_PARALLEL,
+        request_timeout: float = OLLAMA_REQUEST_TIMEOUT_S,
+        cooldown: float = OLLAMA_HOST_COOLDOWN_S,
+        health_interval: float = OLLAMA_HEALTH_INTERVAL_S,
+        client_factory: Callable[..., Any] = Client,
+        async_client_factory: Callable[..., Any] = AsyncClient,
+    ):
+        if not hosts:
+            raise ValueError("An Ollama pool needs at least one host")
+        self.hosts = [OllamaHost(x) for x in hosts]
+        self.slots = slots
+        self.request_timeout = request_timeout
+        self.cooldown = cooldown
+        self._client_factory = client_factory
+        self._async_client_factory = async_client_factory
+        self._clients = {x.url: client_factory(host=x.url, timeout=request_timeout) for x in self.hosts}
+        self._health_clients = {x.url: client_factory(host=x.url, timeout=HEALTH_TIMEOUT_S) for x in self.hosts}
+        # httpx binds async connection pools to the event loop that first uses them,
+        # so keep one set of async clients per running loop.
+        self._async_clients: WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, Any]] = WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self._digests: Dict[str, str] = {}
+        self._warned: Set[tuple] = set()
+        # The pool is usually created by the first request, on the event loop thread, so even the
+        # first health check runs in the background. Until it finishes every host is eligible.
+        self._stop = threading.Event()
+        thread = threading.Thread(target=self._health_loop, args=(health_interval,), name="ollama-health", daemon=True)
+        thread.start()
+
+    def _health_loop(self, interval: float) -> None:
+        self.check_health()
+        while interval > 0 and not self._stop.wait(interval):
+            self.check_health()
+
+    def close(self) -> None:
+        self._stop.set()
+
+    def check_health(self) -> None:
+        """Lists every host's models, marks unreachable hosts down, and settles the expected digest of each model."""
+        for host in self.hosts:
+            try:
+                listed = self._health_clients[host.url].list()
+                models = {model_key(x.model): x.digest for x in listed.models}
+            except Exception as e:
+                with self._lock:
+                    if host.healthy:
+                        logger.warning(f"Ollama host {host.url} failed its health check: {type(e).__name__}: {e}")
+                    host.healthy = False
+                    host.down_until = time.monotonic() + self.cooldown
+                continue
+            with self._lock:
+                if not host.healthy:
+                    logger.info(f"Ollama host {host.url} is back")
+                host.healthy = True
+                host.models = models
+        with self._lock:
+            names = {name for x in self.hosts for name in x.models}
+            for name in names:
+                digests = Counter(x.models[name] for x in self.hosts if name in x.models)
+                self._digests[name] = digests.most_common(1)[0][0]
+
+    def _serves(self, host: OllamaHost, model_name: str) -> bool:
+        """Whether the host has the model with the pool's expected weights, or has not been listed yet."""
+        if not host.models:
+            return True
+        key = model_key(model_name)
+        digest = host.models.get(key)
+        if digest is not None and digest == self._digests.get(key):
+            return True
+        if (host.url, key) not in self._warned:
+            self._warned.add((host.url, key))
+            reason = "does not have" if digest is None else "serves different weights for"
+            logger.warning(f"Ollama host {host.url} {reason} {model_name}, it gets no requests for it")
+        return False
+
+    def _acquire(self, model_name: str, tried: Set[str]) -> OllamaHost:
+        now = time.monotonic()
+        with self._lock:
+            candidates = [
+                x for x in self.hosts if x.url not in tried and x.available(now) and self._serves(x, model_name)
+            ]
+            if not candidates:
+                raise ConnectionError(f"No Ollama host left to serve {model_name}, tried {sorted(tried) or 'none'}")
+            fastest = min((x.latency for x in candidates if x.latency is not None), default=None)
+
+            def load(host: OllamaHost) -> tuple:
+                slow = fastest is not None and host.latency is not None and host.latency > SLOW_FACTOR * fastest
+                return host.outstanding >= self.slots, slow, host.outstanding, host.latency or 0.0
+
+            host = min(candidates, key=load)
+            host.outstanding += 1
+            return host
+
+    def _release(self, host: OllamaHost, latency: float, response: Any = None, error: Optional[BaseException] = None) -> None:
+        with self._lock:
+            host.outstanding -= 1
+            if error is None:
+                host.healthy = True
+                host.latency = latency if host.latency is None else (1 - LATENCY_ALPHA) * host.latency + LATENCY_ALPHA * latency
+            elif is_retryable(error):
+                host.healthy = False
+                host.down_until = time.monotonic() + self.cooldown
+        if error is None:
+            record_host_request(host.url, True, latency, getattr(response, "eval_count", 0) or 0)
+        elif is_retryable(error):
+            record_host_request(host.url, False, latency)
+            logger.warning(f"Ollama host {host.url} failed after {latency:.1f}s, moving the request: {type(error).__name__}: {error}")
+
+    def chat(self, model: str, **kwargs) -> Any:
+        """Sends a chat request to the least loaded host, moving it to another host if that one fails."""
+        tried: Set[str] = set()
+        while True:
+            host = self._acquire(model, tried)
+            start = time.perf_counter()
+            try:
+                response = self._clients[host.url].chat(model=model, **kwargs)
+            except Exception as e:
+                self._release(host, time.perf_counter() - start, error=e)
+                if not is_retryable(e):
+                    raise
+                tried.add(host.url)
+                continue
+            self._release(host, time.perf_counter() - start, response)
+            return response
+
+    async def achat(self, model: str, **kwargs) -> Any:
+        """Async counterpart of chat."""
+        loop = asyncio.get_running_loop()
+        if loop not in self._async_clients:
+            self._async_clients[loop] = {
+                x.url: self._async_client_factory(host=x.url, timeout=self.request_timeout) for x in self.hosts
+            }
+        clients = self._async_clients[loop]
+        tried: Set[str] = set()
+        while True:
+            host = self._acquire(model, tried)
+            start = time.perf_counter()
+            try:
+                response = await asyncio.wait_for(clients[host.url].chat(model=model, **kwargs), self.request_timeout)
+            except Exception as e:
+                self._release(host, time.perf_counter() - start, error=e)
+                if not is_retryable(e):
+                    raise
+                tried.add(host.url)
+                continue
+            self._release(host, time.perf_counter() - start, response)
+            return response
+
+    def load(self, model: str, **kwargs) -> List[str]:
+        """Loads a model on every available host, e.g. to prewarm them, and returns the hosts that loaded it."""
+        loaded = []
+        now = time.monotonic()
+        for host in self.hosts:
+            if not host.available(now) or not self._serves(host, model):
+                continue
+            try:
+                self._clients[host.url].chat(model=model, messages=[], **kwargs)
+                loaded.append(host.url)
+            except Exception as e:
+                logger.warning(f"Could not load {model} on {host.url}: {e}")
+        return loaded
+
+    def status(self) -> List[Dict[str, Any]]:
+        """Routing state of every host: health, requests in flight and average latency."""
+        now = time.monotonic()
+        with self._lock:
+            return [
+                {
+                    "host": x.url,
+                    "available": x.available(now),
+                    "outstanding": x.outstanding,
+                    "latency_s": round(x.latency, 3) if x.latency is not None else None,
+                }
+                for x in self.hosts
+            ]
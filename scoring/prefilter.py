@@ -0,0 +1,109 @@
+import logging
+import re
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from datamodels.models import JobInfo
+
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+logger = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9+#]*")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or our that the their this to was we "
+    "were will with you your they them who what when where which while also can all any more other such "
+    "not but if into than then there these those so about over under within across per via".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercases and splits text into word tokens, keeping terms like c++ and c#."""
+    return [t for t in TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+def bm25_scores(query: str, documents: List[str], k1: float = 1.5, b: float = 0.75) -> np.ndarray:
+    """
+    Scores documents against a query with Okapi BM25.
+
+    Only terms that occur in the query can contribute, so the term-frequency matrix is
+    built over the query vocabulary alone, which keeps it small and dense.
+
+    Args:
+        query (str): The query text, here the resume.
+        documents (List[str]): The documents to rank, here job descriptions.
+        k1 (float, optional): Term-frequency saturation. Defaults to 1.5.
+        b (float, optional): Length normalization strength. Defaults to 0.75.
+
+    Returns:
+        np.ndarray: One BM25 score per document.
+    """
+    n_docs = len(documents)
+    if n_docs == 0:
+        return np.zeros(0)
+    vocab = {term: i for i, term in enumerate(dict.fromkeys(tokenize(query)))}
+    doc_ids = []
+    term_ids = []
+    doc_lens = np.empty(n_docs)
+    for i, doc in enumerate(documents):
+        # Stopwords never appear in the query vocabulary, so they only count toward document length
+        tokens = TOKEN_RE.findall(doc.lower())
+        doc_lens[i] = len(tokens)
+        ids = [x for x in map(vocab.get, tokens) if x is not None]
+        term_ids.extend(ids)
+        doc_ids.extend([i] * len(ids))
+    if not term_ids:
+        return np.zeros(n_docs)
+
+    n_terms = len(vocab)
+    flat = np.asarray(doc_ids, dtype=np.int64) * n_terms + np.asarray(term_ids, dtype=np.int64)
+    tf = np.bincount(flat, minlength=n_docs * n_terms).reshape(n_docs, n_terms).astype(np.float32)
+    df = np.count_nonzero(tf, axis=0)
+    idf = np.log1p((n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+    avgdl = max(doc_lens.mean(), 1.0)
+    norm = (k1 * (1 - b + b * doc_lens / avgdl)).astype(np.float32)[:, None]
+    return (tf * (k1 + 1) / (tf + norm)) @ idf
+
+
+def prefilter_jobs(
+    resume: str, job_postings: List[JobInfo], top_k: Optional[int] = None, min_score: Optional[float] = None
+) -> Tuple[List[JobInfo], List[JobInfo]]:
+    """
+    Ranks job postings lexically against the resume and keeps only the most promising ones for the LLM.
+
+    Every posting gets a prefilter_score between 0 and 1, its BM25 score relative to the best
+    posting in this batch. A posting is kept if it is within the top_k and at or above min_score;
+    either limit may be omitted.
+
+    Args:
+        resume (str): The plain text content of the candidate's resume.
+        job_postings (List[JobInfo]): A list of JobInfo objects representing job postings.
+        top_k (int, optional): Keep at most this many postings. Defaults to no limit.
+        min_score (float, optional): Drop postings with a relative score below this cutoff. Defaults to no cutoff.
+
+    Returns:
+        Tuple[List[JobInfo], List[JobInfo]]: The kept and the dropped postings, each in input order.
+    """
+    scores = bm25_scores(resume, [x.description for x in job_postings])
+    best = scores.max() if len(scores) else 0.0
+    relative = scores / best if best > 0 else scores
+    keep = np.ones(len(job_postings), dtype=bool)
+    if top_k is not None and top_k < len(job_postings):
+        keep[:] = False
+        keep[np.argsort(-relative, kind="stable")[:top_k]] = True
+    if min_score is not None:
+        keep &= relative >= min_score
+
+    kept, dropped = [], []
+    for job, score, is_kept in zip(job_postings, relative, keep):
+        job.prefilter_score = round(float(score), 4)
+        (kept if is_kept else dropped).append(job)
+    logger.info(
+        f"Prefilter kept {len(kept)} of {len(job_postings)} postings, saving {len(dropped)} LLM calls"
+    )
+    return kept, dropped
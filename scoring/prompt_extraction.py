@@ -1,14 +1,12 @@
+import asyncio
 import logging
+import re
+from typing import List, Optional
 
-
-from config import AI_BACKEND
-if AI_BACKEND == "openai":
-    from .oa_models import check_search_prompt, extract_reqs 
-elif AI_BACKEND == "ollama":
-    from .ollama_models import check_search_prompt, extract_reqs 
-else:
-    raise ValueError(f"Unknown AI_BACKEND: {AI_BACKEND}. Must be 'ollama' or 'openai'.")
+from config import PROMPT_FAST_PATH
 from datamodels.models import WorkflowReqs
+import instrumentation
+from .backends import get_backend
 
 
 logging.basicConfig(
@@ -18,13 +16,206 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Grammar of the prompts parse_prompt understands without an LLM:
+#   [find|search for|show me ...] [N] <title> [or <title>...] jobs|roles|positions in <city>[, <state>]
+#   [and|or <city>[, <state>]...][, limit N | with a limit of N][, hybrid]
+_LEAD = re.compile(
+    r"^(?:please\s+)?(?:(?:find|search(?:\s+for)?|look(?:ing)?\s+for|show|get|give|list|fetch)(?:\s+me)?\s+)?"
+    r"(?:(?P<count>\d+)\s+)?(?:(?:some|any|all|open|the)\s+)?",
+    re.IGNORECASE,
+)
+_BODY = re.compile(
+    r"^(?P<title>.+?)\s+(?:jobs?|roles?|positions?|openings?|postings?|listings?)\s+(?:in|near|around|based\s+in)\s+(?P<rest>.+)$",
+    re.IGNORECASE,
+)
+_SEPARATOR = re.compile(r"\s*([,;]|\b(?:and|or)\b)\s*", re.IGNORECASE)
+_LIMIT_PATTERN = (
+    r"(?:(?:a|the)\s+)?(?:limit|max(?:imum)?|top|up\s+to|at\s+most)(?:\s+of)?\s*[:=]?\s*(?P<limit>\d+)"
+    r"(?:\s+(?:results|jobs|postings|posts|listings))?|(?P<count>\d+)\s+(?:results|jobs|postings|posts|listings)"
+)
+_HYBRID_PATTERN = r"(?:only\s+)?hybrid(?:\s+(?:jobs|roles|positions))?(?:\s+only)?"
+_LIMIT = re.compile(rf"^(?:{_LIMIT_PATTERN})$", re.IGNORECASE)
+_HYBRID = re.compile(rf"^{_HYBRID_PATTERN}$", re.IGNORECASE)
+# The limit and hybrid options anywhere in the locations, removed before looking for qualifiers
+_OPTION = re.compile(rf"\b(?:{_LIMIT_PATTERN}|{_HYBRID_PATTERN})\b", re.IGNORECASE)
+# "with" only separates when a limit follows, as in "San Francisco with a limit of 25"
+_WITH_LIMIT = re.compile(rf"\s+with\s+(?=(?:{_LIMIT_PATTERN})\b)", re.IGNORECASE)
+_WORD = re.compile(r"^[A-Za-z][A-Za-z0-9+#./&'-]*$")
+# Words that qualify a search beyond title, city, limit and hybrid; a prompt using them goes to the LLM
+_QUALIFIERS = {
+    "remote", "hybrid", "onsite", "on-site", "with", "without", "that", "which", "who", "not", "no", "except", "but",
+    "paying", "salary", "over", "under", "above", "below", "from", "for", "at", "near", "within", "area", "metro",
+    "region", "county", "anywhere", "everywhere", "country", "startup", "startups", "companies", "company",
+}
+_STATES = {
+    "al", "ak", "az", "ar", "ca", "co", "ct", "de", "dc", "fl", "ga", "hi", "id", "il", "in", "ia", "ks", "ky", "la",
+    "me", "md", "ma", "mi", "mn", "ms", "mo", "mt", "ne", "nv", "nh", "nj", "nm", "ny", "nc", "nd", "oh", "ok", "or",
+    "pa", "ri", "sc", "sd", "tn", "tx", "ut", "vt", "va", "wa", "wv", "wi", "wy", "us", "usa", "united states",
+    "alabama", "alaska", "arizona", "arkansas", "california", "colorado", "connecticut", "delaware", "florida",
+    "georgia", "hawaii", "idaho", "illinois", "indiana", "iowa", "kansas", "kentucky", "louisiana", "maine",
+    "maryland", "massachusetts", "michigan", "minnesota", "mississippi", "missouri", "montana", "nebraska", "nevada",
+    "new hampshire", "new jersey", "new mexico", "north carolina", "north dakota", "ohio", "oklahoma", "oregon",
+    "pennsylvania", "rhode island", "south carolina", "south dakota", "tennessee", "texas", "utah", "vermont",
+    "virginia", "washington", "west virginia", "wisconsin", "wyoming", "new york",
+}
+MAX_TITLE_WORDS = 6
+MAX_CITY_WORDS = 4
+MAX_LIMIT = 1000
+
 
-def check_and_extract(prompt: str) -> WorkflowReqs:
+class InvalidPromptError(ValueError):
+    """Raised when the prompt gate decides a prompt is not a job search."""
+
+
+def _phrase(text: str, max_words: int) -> Optional[List[str]]:
+    """Returns the words of a plain title or place name, or None if it is too long or qualifies the search."""
+    words = text.split()
+    if not 0 < len(words) <= max_words:
+        return None
+    if any(not _WORD.match(w) or w.lower() in _QUALIFIERS for w in words):
+        return None
+    return words
+
+
+def _ends_in_state(words: List[str]) -> bool:
+    """Whether a place name ends in a state without a comma, as in "Austin TX"."""
+    return any(len(words) > n and " ".join(words[-n:]).lower() in _STATES for n in (1, 2))
+
+
+def parse_prompt(prompt: str) -> Optional[WorkflowReqs]:
+    """
+    Parses common prompt shapes such as "Data Scientist jobs in Austin, TX, limit 50, hybrid"
+    without an LLM.
+
+    Only prompts the grammar consumes completely are parsed: one or more plain job titles joined
+    by "or", a jobs/roles/positions noun, one or more cities, and optionally a limit and a hybrid
+    flag. A state right after a city and a comma, as in "Seattle, Washington", is that city's
+    state and is dropped, as extract_reqs is asked to. Anything else, such as remote work,
+    salaries, equity, seniority qualifiers after the title or regions, returns None and is left
+    to the LLM. So does anything ambiguous: a state on its own ("jobs in New York"), a state
+    that does not follow a city, or a city ending in a state without a comma ("Austin TX").
+
+    Args:
+        prompt (str): The search prompt.
+
+    Returns:
+        Optional[WorkflowReqs]: The search, or None if the prompt is not a shape the parser is sure of.
+    """
+    text = " ".join(prompt.split()).rstrip(".!")
+    lead = _LEAD.match(text)
+    limit = int(lead.group("count")) if lead.group("count") else None
+    body = _BODY.match(text[lead.end():])
+    if body is None:
+        return None
+
+    titles = []
+    for title in re.split(r"\s+or\s+|\s*/\s*", body.group("title"), flags=re.IGNORECASE):
+        words = _phrase(title, MAX_TITLE_WORDS)
+        if words is None:
+            return None
+        titles.append(" ".join(words))
 
-    is_search_request = check_search_prompt(prompt)
-    print(is_search_request)
+    rest = _WITH_LIMIT.sub(", ", body.group("rest"))
+    if any(w.lower() in _QUALIFIERS for w in re.split(r"[\s,;]+", _OPTION.sub(" ", rest))):
+        return None
+
+    cities = []
+    hybrid = False
+    previous = None
+    parts = _SEPARATOR.split(rest)
+    for i in range(0, len(parts), 2):
+        part = parts[i]
+        separator = parts[i - 1].strip() if i else None
+        if not part:
+            continue
+        option = _LIMIT.match(part)
+        if option is not None:
+            if limit is not None:
+                return None
+            limit = int(option.group("limit") or option.group("count"))
+            previous = "option"
+        elif _HYBRID.match(part):
+            hybrid = True
+            previous = "option"
+        elif part.lower() in _STATES:
+            # Only "<city>, <state>" is certain; a state elsewhere may be a place of its own
+            if previous != "city" or separator != ",":
+                return None
+            previous = "state"
+        else:
+            words = _phrase(part, MAX_CITY_WORDS)
+            if words is None or _ends_in_state(words):
+                return None
+            cities.append(" ".join(w if w[0].isupper() else w.capitalize() for w in words))
+            previous = "city"
+    if not cities or limit is not None and not 0 < limit <= MAX_LIMIT:
+        return None
+    reqs = WorkflowReqs(resume=None, keywords=" OR ".join(titles), city="; ".join(cities), hybrid=hybrid)
+    if limit is not None:
+        reqs.limit = limit
+    return reqs
+
+
+async def _gate_and_extract(prompt: str) -> WorkflowReqs:
+    """
+    Runs the gate and the extraction concurrently, so a valid prompt costs one round trip instead
+    of two. The extraction is speculative: it is cancelled, or its result dropped, if the gate rejects.
+    """
+    backend = get_backend()
+
+    async def timed(stage: str, request):
+        with instrumentation.span(stage):
+            return await request(prompt)
+
+    extraction = asyncio.create_task(timed("extract", backend.async_extract_reqs))
+    try:
+        is_search_request = await timed("gate", backend.async_check_search_prompt)
+    except BaseException:
+        extraction.cancel()
+        raise
+    logger.info(f"Gate check: {is_search_request.model_dump()}")
     if not is_search_request.is_valid or is_search_request.confidence < 0.7:
-        logger.warning(f"Gate check failed, this is not a valid request. {is_search_request.model_dump()}. Exiting")
+        extraction.cancel()
+        raise InvalidPromptError(f"Gate check failed, this is not a valid request. {is_search_request.model_dump()}")
+    search_data = await extraction
+    logger.info(f"Extracted search: {search_data}")
+    return search_data
+
+
+async def async_extract_search(prompt: str, fast_path: bool = PROMPT_FAST_PATH) -> WorkflowReqs:
+    """
+    Checks that a prompt describes a job search and extracts its search parameters.
+
+    Prompts parse_prompt understands skip the LLM. Otherwise the gate and the extraction are
+    sent together and the extraction is only used if the gate accepts the prompt.
+
+    Args:
+        prompt (str): The search prompt.
+        fast_path (bool, optional): Try the local parser first. Defaults to PROMPT_FAST_PATH.
+
+    Returns:
+        WorkflowReqs: The keywords, city, limit and hybrid flag of the search.
+
+    Raises:
+        InvalidPromptError: If the gate rejects the prompt or is not confident enough.
+    """
+    if fast_path:
+        with instrumentation.span("parse"):
+            search_data = parse_prompt(prompt)
+        if search_data is not None:
+            logger.info(f"Parsed the prompt locally, no LLM needed: {search_data}")
+            return search_data
+    return await _gate_and_extract(prompt)
+
+
+def extract_search(prompt: str, fast_path: bool = PROMPT_FAST_PATH) -> WorkflowReqs:
+    """Synchronous async_extract_search, for callers without a running event loop."""
+    return asyncio.run(async_extract_search(prompt, fast_path))
+
+
+def check_and_extract(prompt: str) -> WorkflowReqs:
+    try:
+        return extract_search(prompt)
+    except InvalidPromptError as e:
+        logger.warning(f"{e}. Exiting")
         exit(1)
-    search_data = extract_reqs(prompt)
-    return search_data
\ No newline at end of file
@@ -0,0 +1,165 @@
+import argparse
+import hashlib
+import logging
+from pathlib import Path
+import re
+import sqlite3
+import time
+from typing import Dict, Optional
+
+from datamodels.models import JDScore
+
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = Path.cwd() / "data/cache/scores.sqlite"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS scores (
+    key TEXT PRIMARY KEY,
+    backend TEXT NOT NULL,
+    model TEXT NOT NULL,
+    prompt_version TEXT NOT NULL,
+    score REAL NOT NULL,
+    explanation TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_used_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_scores_last_used ON scores (last_used_at);
+CREATE INDEX IF NOT EXISTS idx_scores_prompt ON scores (backend, prompt_version);
+"""
+
+
+def normalize_text(text: str) -> str:
+    """Collapses whitespace so formatting-only edits do not change the cache key."""
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def make_key(resume: str, job_description: str, backend: str, model: str, prompt_version: str) -> str:
+    """
+    Builds the content address of a score.
+
+    Args:
+        resume (str): The plain text content of the candidate's resume.
+        job_description (str): The plain text content of the job description.
+        backend (str): The AI backend, "openai" or "ollama".
+        model (str): The model name used for scoring.
+        prompt_version (str): Fingerprint of the scoring prompt.
+
+    Returns:
+        str: A sha256 hex digest identifying this exact scoring request.
+    """
+    h = hashlib.sha256()
+    for part in (normalize_text(resume), normalize_text(job_description), backend, model, prompt_version):
+        h.update(part.encode())
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+class ScoreCache:
+    """
+    Persistent SQLite cache of score_resume results.
+
+    Entries older than max_age_days are ignored and evicted; beyond max_entries the least
+    recently used entries are evicted first. Failed scores (-1) should never be stored.
+    """
+
+    def __init__(self, path: Path = DEFAULT_CACHE_PATH, max_entries: int = 50_000, max_age_days: float = 30):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_days * 86400
+        self.hits = 0
+        self.misses = 0
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(_SCHEMA)
+
+    def get(self, key: str) -> Optional[JDScore]:
+        row = self.conn.execute(
+            "SELECT score, explanation FROM scores WHERE key = ? AND created_at >= ?",
+            (key, time.time() - self.max_age_seconds),
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.conn.execute("UPDATE scores SET last_used_at = ? WHERE key = ?", (time.time(), key))
+        return JDScore(score=row[0], explanation=row[1])
+
+    def put(self, key: str, result: JDScore, backend: str, model: str, prompt_version: str) -> None:
+        now = time.time()
+        self.conn.execute(
+            "INSERT OR REPLACE INTO scores VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (key, backend, model, prompt_version, result.score, result.explanation, now, now),
+        )
+
+    def evict(self) -> int:
+        """Drops expired entries, then the least recently used ones above max_entries."""
+        removed = self.conn.execute(
+            "DELETE FROM scores WHERE created_at < ?", (time.time() - self.max_age_seconds,)
+        ).rowcount
+        removed += self.conn.execute(
+            "DELETE FROM scores WHERE key IN ("
+            "SELECT key FROM scores ORDER BY last_used_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        ).rowcount
+        self.conn.commit()
+        return removed
+
+    def invalidate(self, backend: Optional[str] = None, keep_prompt_version: Optional[str] = None) -> int:
+        """
+        Deletes cached scores, e.g. after the scoring prompt changed.
+
+        Args:
+            backend (str, optional): Only touch entries from this backend. Defaults to all backends.
+            keep_prompt_version (str, optional): Keep entries scored with this prompt version.
+                Defaults to None, which deletes everything in scope.
+
+        Returns:
+            int: The number of deleted entries.
+        """
+        query = "DELETE FROM scores WHERE 1 = 1"
+        params = []
+        if backend is not None:
+            query += " AND backend = ?"
+            params.append(backend)
+        if keep_prompt_version is not None:
+            query += " AND prompt_version != ?"
+            params.append(keep_prompt_version)
+        removed = self.conn.execute(query, params).rowcount
+        self.conn.commit()
+        return removed
+
+    def stats(self) -> Dict[str, int]:
+        entries = self.conn.execute("SELECT COUNT(*) FROM scores").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "entries": entries}
+
+    def commit(self) -> None:
+        self.conn.commit()
+
+    def close(self) -> None:
+        self.conn.commit()
+        self.conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or maintain the persistent score cache")
+    parser.add_argument("--path", type=Path, default=DEFAULT_CACHE_PATH)
+    parser.add_argument("--evict", action="store_true", help="Drop expired and over-capacity entries")
+    parser.add_argument("--clear", action="store_true", help="Delete every cached score")
+    parser.add_argument("--backend", type=str, help="Restrict --clear to one backend")
+    parser.add_argument("--keep_prompt_version", type=str, help="With --clear, keep entries from this prompt version")
+    args = parser.parse_args()
+
+    cache = ScoreCache(args.path)
+    if args.clear:
+        logger.info(f"Removed {cache.invalidate(args.backend, args.keep_prompt_version)} entries")
+    if args.evict:
+        logger.info(f"Evicted {cache.evict()} entries")
+    print(cache.stats())
+    cache.close()
@@ -0,0 +1,15 @@
+import math
+from typing import Dict, List
+
+# Rough average for English prose across OpenAI and Gemma tokenizers
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimates the token count of a text without loading a tokenizer."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def estimate_message_tokens(messages: List[Dict[str, str]]) -> int:
+    """Estimates the prompt tokens of a chat request, including a few tokens of per-message overhead."""
+    return sum(estimate_tokens(m["content"]) + 4 for m in messages)
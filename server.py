@@ -0,0 +1,356 @@
+import argparse
+import asyncio
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import logging
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional
+import uuid
+
+from config import SCORE_CACHE_ENABLED, SCORE_CACHE_MAX_AGE_DAYS, SCORE_CACHE_MAX_ENTRIES
+from datamodels.models import JobInfo
+import instrumentation
+from job_boards import apify
+from job_boards.apify import expand_queries, stream_posts, stream_posts_multi
+from job_boards.dedup import Deduper, PostingIndex
+import main
+from scoring.backends import get_backend
+from scoring.compaction import Compactor
+from scoring.job_posts import async_identify_resume_gaps, score_fingerprint, stream_score_posts
+from scoring.prompt_extraction import InvalidPromptError, async_extract_search
+from scoring.score_cache import ScoreCache
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class QueueFullError(RuntimeError):
+    """Raised when a job is submitted while the queue is at capacity."""
+
+
+@dataclass
+class ServiceJob:
+    """
+    One search-and-score request and its results so far.
+
+    Results are appended from the service's event loop and read from HTTP handler threads,
+    so every access goes through the job's condition.
+    """
+    job_id: str
+    resume: str
+    prompt: str
+    dedup: bool = True
+    compact: bool = False
+    status: str = QUEUED
+    results: List[JobInfo] = field(default_factory=list)
+    gap_summary: Optional[str] = None
+    run_id: Optional[str] = None
+    error: Optional[str] = None
+    stats: Dict[str, Any] = field(default_factory=dict)
+    submitted_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    _cond: threading.Condition = field(default_factory=threading.Condition, repr=False)
+
+    def add_result(self, job: JobInfo) -> None:
+        with self._cond:
+            self.results.append(job)
+            self._cond.notify_all()
+
+    def set_status(self, status: str, error: Optional[str] = None) -> None:
+        with self._cond:
+            self.status = status
+            self.error = error
+            if status == RUNNING:
+                self.started_at = time.time()
+            elif status in (DONE, FAILED):
+                self.finished_at = time.time()
+            self._cond.notify_all()
+
+    def summary(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "job_id": self.job_id,
+                "status": self.status,
+                "results": len(self.results),
+                "run_id": self.run_id,
+                "error": self.error,
+                "stats": self.stats,
+                "queued_s": round(self.started_at - self.submitted_at, 3) if self.started_at else None,
+                "run_s": round(self.finished_at - self.started_at, 3) if self.finished_at and self.started_at else None,
+            }
+
+    def events(self, poll: float = 1.0) -> Iterator[Dict[str, Any]]:
+        """Yields each result as it is scored, then a final event with the gap summary and run_id."""
+        sent = 0
+        while True:
+            with self._cond:
+                while sent == len(self.results) and self.status in (QUEUED, RUNNING):
+                    self._cond.wait(poll)
+                new = self.results[sent:]
+                finished = self.status in (DONE, FAILED)
+            for job in new:
+                yield {"event": "result", "job": job.model_dump()}
+            sent += len(new)
+            if finished and sent == len(self.results):
+                yield {"event": self.status, "gap_summary": self.gap_summary, **self.summary()}
+                return
+
+
+class JobService:
+    """
+    Long-running search-and-score service.
+
+    A single event loop, on its own thread, owns the async LLM and Apify clients, so their
+    connection pools stay open between requests, and the near-duplicate index stays loaded.
+    Submitted jobs wait in a bounded queue and are run by a fixed pool of workers on that
+    loop; each worker streams postings from Apify and scores them as they arrive, exactly
+    like main.run_stream_workflow. Jobs share one score cache connection, committed after
+    every job.
+
+    Args:
+        workers (int, optional): Jobs run at once. Each job has up to SCORING_CONCURRENCY
+            scoring requests in flight. Defaults to 2.
+        max_queue (int, optional): Jobs waiting beyond the running ones before submissions
+            are refused. Defaults to 100.
+        max_jobs (int, optional): Finished jobs kept for GET /jobs/<id>. Defaults to 1000.
+    """
+
+    def __init__(self, workers: int = 2, max_queue: int = 100, max_jobs: int = 1000):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.max_jobs = max_jobs
+        self.jobs: Dict[str, ServiceJob] = {}
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="job-service", daemon=True)
+        self._lock = threading.Lock()
+        self._queue: Optional[asyncio.Queue] = None
+        self._index: Optional[PostingIndex] = None
+        self._cache: Optional[ScoreCache] = None
+
+    def start(self) -> None:
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._start(), self.loop).result()
+        logger.info(f"Job service started with {self.workers} workers")
+
+    def stop(self) -> None:
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout=5)
+
+    async def _start(self) -> None:
+        self._queue = asyncio.Queue()
+        self._index = PostingIndex()
+        # One connection for every job: each connection holds its write lock until it commits
+        if SCORE_CACHE_ENABLED:
+            self._cache = ScoreCache(max_entries=SCORE_CACHE_MAX_ENTRIES, max_age_days=SCORE_CACHE_MAX_AGE_DAYS)
+        self._warm()
+        for _ in range(self.workers):
+            self.loop.create_task(self._worker())
+
+    def _warm(self) -> None:
+        """Imports the scoring backend and creates the clients on the service loop ahead of the first job."""
+        backend = get_backend()
+        for client in (getattr(backend, "get_async_client", None), apify.get_async_client):
+            if client is None:
+                continue
+            try:
+                client()
+            except Exception as e:
+                # A missing key only matters for jobs that need the client, e.g. not in fetch replay mode
+                logger.warning(f"Could not create {client.__module__} client ahead of time: {e}")
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            statuses = [x.status for x in self.jobs.values()]
+        return {x: statuses.count(x) for x in (QUEUED, RUNNING, DONE, FAILED)}
+
+    def submit(self, resume: str, prompt: str, dedup: bool = True, compact: bool = False) -> ServiceJob:
+        """
+        Queues a search-and-score job.
+
+        Raises:
+            QueueFullError: If max_queue jobs are already waiting.
+        """
+        job = ServiceJob(job_id=uuid.uuid4().hex[:12], resume=resume, prompt=prompt, dedup=dedup, compact=compact)
+        with self._lock:
+            if sum(x.status == QUEUED for x in self.jobs.values()) >= self.max_queue:
+                raise QueueFullError(f"{self.max_queue} jobs already queued")
+            self.jobs[job.job_id] = job
+            finished = [k for k, v in self.jobs.items() if v.status in (DONE, FAILED)]
+            for key in finished[:max(0, len(self.jobs) - self.max_jobs)]:
+                del self.jobs[key]
+        self.loop.call_soon_threadsafe(self._queue.put_nowait, job)
+        return job
+
+    def get(self, job_id: str) -> Optional[ServiceJob]:
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            job.set_status(RUNNING)
+            try:
+                await self._run(job)
+                job.set_status(DONE)
+            except InvalidPromptError as e:
+                job.set_status(FAILED, str(e))
+            except Exception as e:
+                logger.error(f"Job {job.job_id} failed: {e}")
+                job.set_status(FAILED, f"{type(e).__name__}: {e}")
+            finally:
+                if self._cache is not None:
+                    self._cache.commit()
+                # Usage is not kept per job in service mode; drop it whenever the service is idle
+                if self.counts()[RUNNING] == 0:
+                    instrumentation.reset()
+
+    async def _run(self, job: ServiceJob) -> None:
+        search_data = await async_extract_search(job.prompt)
+        search_data.resume = job.resume
+        query_d = {
+            "keywords": search_data.keywords,
+            "city": search_data.city,
+            "hybrid": search_data.hybrid,
+            "service_job_id": job.job_id,
+        }
+        queries = expand_queries(search_data)
+        if len(queries) > 1:
+            query_d["queries"] = [{"keywords": q.keywords, "city": q.city} for q in queries]
+        job_stream = stream_posts(search_data) if len(queries) == 1 else stream_posts_multi(queries)
+        compactor = Compactor() if job.compact else None
+        deduper = Deduper(job.resume, self._index, score_fingerprint(0, compactor)) if job.dedup else None
+        job.stats = await stream_score_posts(
+            job.resume, job_stream, job.add_result, deduper=deduper, compactor=compactor, cache=self._cache
+        )
+        query_d["stream"] = job.stats
+        if compactor is not None:
+            query_d["compaction"] = compactor.summary()
+        job.gap_summary = await async_identify_resume_gaps(job.results)
+        job.run_id = await asyncio.to_thread(main.cache_data, query_d, list(job.results), job.gap_summary)
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    """
+    HTTP API of the job service.
+
+        POST /jobs              {"resume": ..., "prompt": ..., "dedup": true, "compact": false, "stream": false}
+        GET  /jobs/<id>         Status and results so far
+        GET  /jobs/<id>/stream  Results as JSON lines while they are scored, then a final status line
+        GET  /health            Worker and queue counts
+
+    POST with "stream": true answers with the stream of the new job directly.
+    """
+    server: "ServiceServer"
+
+    def log_message(self, format: str, *args) -> None:
+        logger.debug(f"{self.address_string()} {format % args}")
+
+    def _send_json(self, status: int, body: Dict[str, Any]) -> None:
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _stream(self, job: ServiceJob) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        self.wfile.write((json.dumps({"event": "queued", "job_id": job.job_id}) + "\n").encode())
+        try:
+            for event in job.events():
+                self.wfile.write((json.dumps(event) + "\n").encode())
+        except (BrokenPipeError, ConnectionResetError):
+            logger.info(f"Client stopped streaming job {job.job_id}, it keeps running")
+
+    def do_GET(self) -> None:
+        service = self.server.service
+        parts = [x for x in self.path.split("?")[0].split("/") if x]
+        if parts == ["health"]:
+            self._send_json(200, {"status": "ok", "workers": service.workers, **service.counts()})
+            return
+        if len(parts) in (2, 3) and parts[0] == "jobs":
+            job = service.get(parts[1])
+            if job is None:
+                self._send_json(404, {"error": f"No job {parts[1]}"})
+            elif len(parts) == 3 and parts[2] == "stream":
+                self._stream(job)
+            elif len(parts) == 2:
+                with job._cond:
+                    results = [x.model_dump() for x in job.results]
+                self._send_json(200, {**job.summary(), "gap_summary": job.gap_summary, "jobs": results})
+            else:
+                self._send_json(404, {"error": f"Unknown path {self.path}"})
+            return
+        self._send_json(404, {"error": f"Unknown path {self.path}"})
+
+    def do_POST(self) -> None:
+        if self.path.split("?")[0].rstrip("/") != "/jobs":
+            self._send_json(404, {"error": f"Unknown path {self.path}"})
+            return
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            resume, prompt = body["resume"], body["prompt"]
+        except (ValueError, KeyError) as e:
+            self._send_json(400, {"error": f"Expected a JSON body with resume and prompt: {e}"})
+            return
+        try:
+            job = self.server.service.submit(
+                resume, prompt, dedup=body.get("dedup", True), compact=body.get("compact", False)
+            )
+        except QueueFullError as e:
+            self._send_json(503, {"error": str(e)})
+            return
+        if body.get("stream"):
+            self._stream(job)
+        else:
+            self._send_json(202, {"job_id": job.job_id, "status": job.status})
+
+
+class ServiceServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, service: JobService):
+        super().__init__(address, ServiceHandler)
+        self.service = service
+
+
+def serve(host: str = "127.0.0.1", port: int = 8765, workers: int = 2, max_queue: int = 100) -> ServiceServer:
+    """Starts the job service and returns its HTTP server, which the caller runs with serve_forever."""
+    service = JobService(workers=workers, max_queue=max_queue)
+    service.start()
+    server = ServiceServer((host, port), service)
+    logger.info(f"Listening on http://{host}:{server.server_address[1]}")
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the job search as a long-running HTTP service")
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("-w", "--workers", type=int, default=2, help="Jobs run at once")
+    parser.add_argument("--max_queue", type=int, default=100, help="Queued jobs before submissions get a 503")
+    args = parser.parse_args()
+
+    main.prewarm_backend()
+    server = serve(args.host, args.port, args.workers, args.max_queue)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Shutting down")
+    finally:
+        server.server_close()
+        server.service.stop()